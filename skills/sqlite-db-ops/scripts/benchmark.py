@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+sqlite-db-ops 性能基准测试
+
+生成合成数据表（窄表 / 宽表，行数可配置），对 SQLiteDB 的常用路径计时：
+- insert 循环（在一个事务中逐行插入 / 默认的每次调用提交）
+- insert_many 批量插入
+- query 点查询（无索引 / 有索引）
+- update / delete 按条件修改
+- 命令行端到端调用（启动解释器 + 连接 + 查询 + 输出）
+
+结果以 JSON 输出，每个场景包含吞吐量（行/秒）、单次操作耗时的 p50/p99
+和峰值内存。每个场景在单独的子进程中运行，峰值内存只反映该场景本身；
+全部场景重复 --repeat 次（每次从同样的初始数据开始），结果取中位数。
+--compare 与保存的基线结果对比，超过阈值的退化返回非零退出码。
+
+示例:
+    python3 benchmark.py --rows 10000,1000000 --output baseline.json
+    python3 benchmark.py --rows 10000,1000000 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource  # 仅 Unix 可用，用于读取峰值内存
+except ImportError:
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from db_operations import SQLiteDB  # noqa: E402
+
+SCRIPT = Path(__file__).resolve().parent / 'db_operations.py'
+
+# 合成表结构：窄表 4 列，宽表 24 列（整数、浮点、文本混合）
+SHAPES = {
+    'narrow': {'id': 'INTEGER PRIMARY KEY', 'k': 'INTEGER', 'v': 'REAL', 's': 'TEXT'},
+    'wide': dict({'id': 'INTEGER PRIMARY KEY', 'k': 'INTEGER'},
+                 **{f"c{i:02d}": ('INTEGER', 'REAL', 'TEXT')[i % 3] for i in range(22)}),
+}
+
+# 按此顺序执行；查询和修改场景依次在同一个预先生成的数据库上运行
+SCENARIOS = ('insert_loop', 'insert_autocommit', 'insert_many', 'query_noindex', 'query_index',
+             'update', 'cli', 'delete')
+READ_SCENARIOS = ('query_noindex', 'query_index', 'update', 'cli', 'delete')
+
+# 各场景默认的操作次数（全表扫描和命令行调用代价高，次数少一些）
+DEFAULT_LOOP_ROWS = 10000
+DEFAULT_AUTOCOMMIT_ROWS = 500
+DEFAULT_INSERT_BATCH = 10000
+DEFAULT_POINT_QUERIES = 1000
+DEFAULT_SCAN_QUERIES = 20
+DEFAULT_WRITE_OPS = 200
+DEFAULT_CLI_RUNS = 20
+DEFAULT_REPEAT = 3
+
+# 每个场景开头不计入统计的预热操作数（最多为操作次数的 1/10）
+WARMUP_OPS = 50
+
+# 对比时低于这些绝对变化的 p99 和峰值内存差异视为噪声
+P99_FLOOR_MS = 0.05
+RSS_FLOOR_MB = 1.0
+
+# 多次重复取中位数的指标
+MEDIAN_METRICS = ('seconds', 'rows_per_sec', 'p50_ms', 'p99_ms', 'peak_rss_mb')
+
+# k 列的取值个数，点查询平均命中 rows / K_CARDINALITY 行
+K_CARDINALITY = 1000
+
+
+def make_rows(shape: str, count: int, seed: int, start: int = 0) -> List[Dict[str, Any]]:
+    """生成确定性的合成数据（同样的 seed 得到同样的数据）"""
+    rng = random.Random(seed + start)
+    columns = [name for name in SHAPES[shape] if name != 'id']
+    rows = []
+    for _ in range(count):
+        row = {}
+        for name in columns:
+            kind = SHAPES[shape][name]
+            if name == 'k':
+                row[name] = rng.randrange(K_CARDINALITY)
+            elif kind == 'INTEGER':
+                row[name] = rng.randrange(1 << 30)
+            elif kind == 'REAL':
+                row[name] = rng.random() * 1000
+            else:
+                row[name] = f"{rng.getrandbits(64):016x}"
+        rows.append(row)
+    return rows
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """已排序列表的分位数（最近秩）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """
+    当前进程（或已结束子进程）的峰值常驻内存（MB），不支持的平台返回 None
+
+    ru_maxrss 是整个进程的历史最高值，所以每个场景在单独的子进程中测量。
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux 上单位为 KB，macOS 上为字节
+    divisor = 1048576 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def measure(operations: int, func: Callable[..., int],
+            prepare: Optional[Callable[[int], Any]] = None) -> Dict[str, Any]:
+    """
+    执行 func(0..operations-1) 并统计耗时
+
+    前 WARMUP_OPS 次（最多为操作次数的 1/10）作为预热照常执行，但不计入统计，
+    避免语句编译、页缓存加载等一次性开销混入结果。
+
+    Args:
+        operations: 操作次数
+        func: 单次操作，返回涉及的行数
+        prepare: 每次操作前不计时的准备步骤，返回值作为 func 的第二个参数
+
+    Returns:
+        {'ops', 'rows', 'seconds', 'rows_per_sec', 'p50_ms', 'p99_ms'}
+    """
+    warmup = min(WARMUP_OPS, operations // 10)
+    latencies = []
+    rows = 0
+    for i in range(operations):
+        extra = (prepare(i),) if prepare else ()
+        t0 = time.perf_counter()
+        count = func(i, *extra)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if i >= warmup:
+            rows += count
+            latencies.append(elapsed)
+    seconds = sum(latencies) / 1000
+    latencies.sort()
+    return {
+        'ops': len(latencies),
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(latencies, 0.50), 4),
+        'p99_ms': round(percentile(latencies, 0.99), 4),
+    }
+
+
+def prepare_table(db_path: str, shape: str, rows: int, seed: int, profile: Optional[str]):
+    """建表并批量写入 rows 行（不计时），供查询、更新、删除场景使用"""
+    with SQLiteDB(db_path, profile=profile, reporter='silent') as db:
+        db.create_table('bench', SHAPES[shape])
+        for start in range(0, rows, DEFAULT_INSERT_BATCH):
+            count = min(DEFAULT_INSERT_BATCH, rows - start)
+            with db.transaction():
+                db.insert_many('bench', make_rows(shape, count, seed, start))
+
+
+def run_scenario(workdir: str, shape: str, rows: int, scenario: str,
+                 args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    在当前进程中运行一个场景（由 run_shape 在子进程中调用）
+
+    查询和修改场景使用 run_shape 预先生成的数据库，按 SCENARIOS 的顺序依次修改它。
+    """
+    children = False
+
+    # 写入场景使用独立的空数据库
+    if scenario in ('insert_loop', 'insert_autocommit'):
+        path = os.path.join(workdir, f"{shape}_{rows}_{scenario}.db")
+        remove_database(path)
+        limit = args.loop_rows if scenario == 'insert_loop' else args.autocommit_rows
+        data = make_rows(shape, min(rows, limit), args.seed)
+        with SQLiteDB(path, profile=args.profile, reporter='silent') as db:
+            db.create_table('bench', SHAPES[shape])
+
+            def insert_one(i):
+                db.insert('bench', data[i])
+                return 1
+
+            if scenario == 'insert_loop':
+                with db.transaction():
+                    metrics = measure(len(data), insert_one)
+            else:
+                # 默认的自动提交模式，每次调用一次提交
+                metrics = measure(len(data), insert_one)
+
+    elif scenario == 'insert_many':
+        path = os.path.join(workdir, f"{shape}_{rows}_many.db")
+        remove_database(path)
+        starts = list(range(0, rows, DEFAULT_INSERT_BATCH))
+        with SQLiteDB(path, profile=args.profile, reporter='silent') as db:
+            db.create_table('bench', SHAPES[shape])
+            # 每批数据在计时前生成
+            metrics = measure(
+                len(starts), lambda i, batch: db.insert_many('bench', batch),
+                lambda i: make_rows(shape, min(DEFAULT_INSERT_BATCH, rows - starts[i]),
+                                    args.seed, starts[i]))
+
+    else:
+        path = os.path.join(workdir, f"{shape}_{rows}.db")
+        rng = random.Random(args.seed)
+        keys = [rng.randrange(K_CARDINALITY) for _ in range(max(args.point_queries, args.write_ops))]
+        with SQLiteDB(path, profile=args.profile, reporter='silent', record_workload=False) as db:
+
+            def point_query(i):
+                return len(db.query('bench', where='k = ?', params=(keys[i],)))
+
+            if scenario != 'query_noindex':
+                db.create_index('bench', 'k')
+
+            if scenario == 'query_noindex':
+                metrics = measure(min(args.scan_queries, len(keys)), point_query)
+
+            elif scenario == 'query_index':
+                metrics = measure(args.point_queries, point_query)
+
+            elif scenario == 'update':
+                column = 'v' if shape == 'narrow' else 'c01'
+                metrics = measure(
+                    args.write_ops, lambda i: db.update('bench', {column: float(i)}, 'k = ?', (keys[i],)))
+
+            elif scenario == 'cli':
+                command = [sys.executable, str(SCRIPT), path, 'query', '--table', 'bench',
+                           '--where', 'id = ?', '--quiet', '--output-format', 'compact']
+
+                def run_cli(i):
+                    subprocess.run(command + ['--params', json.dumps([i + 1])],
+                                   stdout=subprocess.DEVNULL, check=True)
+                    return 1
+
+                metrics = measure(args.cli_runs, run_cli)
+                children = True
+
+            else:
+                # 每次删除一个不同的 k 值，避免后面的删除命中空集
+                distinct = list(dict.fromkeys(keys))[:args.write_ops]
+                metrics = measure(len(distinct), lambda i: db.delete('bench', 'k = ?', (distinct[i],)))
+
+    metrics.update(scenario=scenario, shape=shape, table_rows=rows, peak_rss_mb=peak_rss_mb(children))
+    return metrics
+
+
+def remove_database(path: str):
+    """删除数据库文件及其 WAL / 共享内存文件"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """多次重复的结果取各指标的中位数，spread 记录各指标在重复间的 [最小值, 最大值]"""
+    result = dict(runs[0], repeat=len(runs), spread={})
+    for name in MEDIAN_METRICS:
+        values = [run[name] for run in runs if run.get(name) is not None]
+        result[name] = round(statistics.median(values), 4) if values else None
+        result['spread'][name] = [min(values), max(values)] if values else None
+    return result
+
+
+def outside_spread(result: Dict[str, Any], old: Dict[str, Any], name: str, higher_is_worse: bool) -> bool:
+    """
+    本次的全部重复是否都比基线的全部重复差（两次结果的范围不重叠）
+
+    任一方没有 spread（旧格式或 --repeat 1）时无法判断，视为不重叠，只按阈值判断。
+    """
+    current = (result.get('spread') or {}).get(name)
+    baseline = (old.get('spread') or {}).get(name)
+    if not current or not baseline:
+        return True
+    return current[0] > baseline[1] if higher_is_worse else current[1] < baseline[0]
+
+
+def run_shape(workdir: str, shape: str, rows: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    在一种表结构和行数下运行选中的全部场景，每个场景一个子进程
+
+    查询和修改场景会修改数据库（建索引、更新、删除），每次重复前从预先生成的
+    原始数据库复制一份，保证每次重复的初始状态相同。
+    """
+    options = ['--profile', args.profile, '--seed', str(args.seed),
+               '--loop-rows', str(args.loop_rows), '--autocommit-rows', str(args.autocommit_rows),
+               '--point-queries', str(args.point_queries), '--scan-queries', str(args.scan_queries),
+               '--write-ops', str(args.write_ops), '--cli-runs', str(args.cli_runs)]
+    selected = [scenario for scenario in SCENARIOS if scenario in args.scenarios]
+    path = os.path.join(workdir, f"{shape}_{rows}.db")
+    pristine = os.path.join(workdir, f"{shape}_{rows}_base.db")
+    if set(selected) & set(READ_SCENARIOS):
+        remove_database(pristine)
+        prepare_table(pristine, shape, rows, args.seed, args.profile)
+
+    runs: Dict[str, List[Dict[str, Any]]] = {scenario: [] for scenario in selected}
+    for _ in range(args.repeat):
+        if os.path.exists(pristine):
+            remove_database(path)
+            shutil.copyfile(pristine, path)
+        for scenario in selected:
+            command = [sys.executable, str(Path(__file__).resolve()), '--worker', scenario,
+                       '--shapes', shape, '--rows', str(rows), '--dir', workdir] + options
+            completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+            runs[scenario].append(json.loads(completed.stdout))
+
+    results = []
+    for scenario in selected:
+        metrics = median_result(runs[scenario])
+        results.append(metrics)
+        print(f"  {shape:<7}{rows:>10}  {scenario:<18}{metrics['rows_per_sec'] or 0:>14,.0f} 行/秒"
+              f"  p50 {metrics['p50_ms']:.3f} ms  p99 {metrics['p99_ms']:.3f} ms"
+              f"  峰值内存 {metrics['peak_rss_mb'] or 0:.1f} MB", file=sys.stderr)
+    return results
+
+
+def result_key(result: Dict[str, Any]) -> tuple:
+    return (result['scenario'], result['shape'], result['table_rows'])
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    与基线对比，打印每个场景的变化
+
+    Args:
+        current: 本次结果
+        baseline: 基线结果（同样格式的 JSON）
+        threshold: 吞吐量下降、p99 或峰值内存上升超过该百分比视为退化。同时要求本次的
+                   全部重复都比基线的全部重复差（范围不重叠）；p99 和峰值内存的绝对
+                   变化还需超过 P99_FLOOR_MS / RSS_FLOOR_MB，吞吐量提高超过该百分比时
+                   不检查 p99
+
+    Returns:
+        退化的场景描述列表
+    """
+    base = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    print(f"{'场景':<18}{'表':<8}{'行数':>10}{'行/秒':>16}{'变化':>9}{'p99 ms':>12}{'变化':>9}"
+          f"{'内存 MB':>10}{'变化':>9}", file=sys.stderr)
+    for result in current['results']:
+        old = base.get(result_key(result))
+        if old is None or not old.get('rows_per_sec') or not result.get('rows_per_sec'):
+            continue
+        speed = (result['rows_per_sec'] / old['rows_per_sec'] - 1) * 100
+        p99 = (result['p99_ms'] / old['p99_ms'] - 1) * 100 if old['p99_ms'] else 0.0
+        rss = (result['peak_rss_mb'] / old['peak_rss_mb'] - 1) * 100 \
+            if old.get('peak_rss_mb') and result.get('peak_rss_mb') else 0.0
+        speed_worse = speed < -threshold and outside_spread(result, old, 'rows_per_sec', False)
+        p99_worse = (p99 > threshold and speed <= threshold
+                     and result['p99_ms'] - old['p99_ms'] >= P99_FLOOR_MS
+                     and outside_spread(result, old, 'p99_ms', True))
+        rss_worse = (rss > threshold and result['peak_rss_mb'] - old['peak_rss_mb'] >= RSS_FLOOR_MB
+                     and outside_spread(result, old, 'peak_rss_mb', True))
+        flag = ''
+        if speed_worse or p99_worse or rss_worse:
+            flag = '  ⚠ 退化'
+            regressions.append(f"{result['scenario']} {result['shape']} {result['table_rows']}: "
+                               f"吞吐 {speed:+.1f}%，p99 {p99:+.1f}%，峰值内存 {rss:+.1f}%")
+        print(f"{result['scenario']:<18}{result['shape']:<8}{result['table_rows']:>10}"
+              f"{result['rows_per_sec']:>16,.0f}{speed:>+8.1f}%{result['p99_ms']:>12.3f}{p99:>+8.1f}%"
+              f"{result.get('peak_rss_mb') or 0:>10.1f}{rss:>+8.1f}%{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='sqlite-db-ops 性能基准测试')
+    parser.add_argument('--rows', default='10000,100000',
+                       help='表的行数，逗号分隔多个（如 10000,1000000,10000000）')
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                       help=f"表结构，逗号分隔（可选 {', '.join(SHAPES)}）")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                       help=f"要运行的场景，逗号分隔（可选 {', '.join(SCENARIOS)}）")
+    parser.add_argument('--profile', default='balanced', help='SQLiteDB 的性能配置档')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据的随机种子')
+    parser.add_argument('--loop-rows', type=int, default=DEFAULT_LOOP_ROWS,
+                       help=f'insert_loop 逐行插入的行数（默认 {DEFAULT_LOOP_ROWS}）')
+    parser.add_argument('--autocommit-rows', type=int, default=DEFAULT_AUTOCOMMIT_ROWS,
+                       help=f'insert_autocommit 逐行插入并提交的行数（默认 {DEFAULT_AUTOCOMMIT_ROWS}）')
+    parser.add_argument('--point-queries', type=int, default=DEFAULT_POINT_QUERIES,
+                       help=f'query_index 的查询次数（默认 {DEFAULT_POINT_QUERIES}）')
+    parser.add_argument('--scan-queries', type=int, default=DEFAULT_SCAN_QUERIES,
+                       help=f'query_noindex 的查询次数（默认 {DEFAULT_SCAN_QUERIES}）')
+    parser.add_argument('--write-ops', type=int, default=DEFAULT_WRITE_OPS,
+                       help=f'update/delete 的操作次数（默认 {DEFAULT_WRITE_OPS}）')
+    parser.add_argument('--cli-runs', type=int, default=DEFAULT_CLI_RUNS,
+                       help=f'cli 场景调用命令行的次数（默认 {DEFAULT_CLI_RUNS}）')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                       help=f'每个场景重复运行的次数，结果取中位数（默认 {DEFAULT_REPEAT}）')
+    parser.add_argument('--dir', help='测试数据库的目录，默认使用临时目录（结束后删除）')
+    parser.add_argument('--output', help='结果 JSON 文件，默认输出到标准输出')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                       help='对比时吞吐量下降、p99 或峰值内存上升超过该百分比视为退化（默认 10）')
+    parser.add_argument('--worker', metavar='SCENARIO', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    try:
+        row_counts = [int(value) for value in args.rows.split(',') if value.strip()]
+    except ValueError:
+        print(f"错误：--rows 需要逗号分隔的整数：{args.rows}")
+        sys.exit(1)
+    shapes = [value.strip() for value in args.shapes.split(',') if value.strip()]
+    args.scenarios = [value.strip() for value in args.scenarios.split(',') if value.strip()]
+    unknown = [value for value in shapes if value not in SHAPES] + \
+              [value for value in args.scenarios if value not in SCENARIOS]
+    if unknown:
+        print(f"错误：未知的表结构或场景：{', '.join(unknown)}")
+        sys.exit(1)
+    if args.repeat < 1:
+        print("错误：--repeat 至少为 1")
+        sys.exit(1)
+
+    if args.worker:
+        # 子进程：运行一个场景，结果以 JSON 写到标准输出
+        print(json.dumps(run_scenario(args.dir, shapes[0], row_counts[0], args.worker, args)))
+        return
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'profile': args.profile,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='sqlite-bench-') as tmpdir:
+        workdir = args.dir or tmpdir
+        os.makedirs(workdir, exist_ok=True)
+        for rows in row_counts:
+            for shape in shapes:
+                report['results'].extend(run_shape(workdir, shape, rows, args))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+        print(f"✓ 结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"⚠ {len(regressions)} 个场景退化超过 {args.threshold}%：", file=sys.stderr)
+            for line in regressions:
+                print(f"  - {line}", file=sys.stderr)
+            sys.exit(1)
+        print("✓ 没有超过阈值的退化", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
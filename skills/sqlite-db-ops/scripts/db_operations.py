@@ -9,251 +9,5036 @@ SQLite 数据库操作工具
 - 更新数据
 - 删除数据
 - 执行自定义 SQL
+- 流式查询（按批读取，NDJSON 输出）
+- 事务批量提交（显式事务与按行数/时间的批量提交）
+- 从 CSV / NDJSON / JSON 文件流式批量导入
+- 连接性能配置档（WAL、synchronous、cache_size、mmap_size 等 PRAGMA）
+- 线程安全的连接池（多个只读连接并发查询，单个写连接串行写入）
+- SQL 语句缓存（重复的 CRUD 调用跳过字符串构建和语句解析）
+- 紧凑的结果格式（元组、列式数组、原始 sqlite3.Row）
+- 快速 JSON 输出（紧凑 / NDJSON 格式，分块写出，可选 orjson 加速）
+- 多格式导出（CSV / NDJSON / 列式二进制，分批写出，可按大小切分文件）
+- 键集分页（按排序键定位，每页代价与页码无关）
+- 索引管理与索引建议（记录查询形态，分析执行计划，发现全表扫描）
+- 语句耗时统计（每条语句的耗时、行数、执行计划，汇总表与 JSON 日志）
+- 查询结果缓存（LRU + 字节上限，按表失效，可选磁盘缓存文件）
+- 可替换的状态输出（打印、静默、logging、只计数汇总）
+- 分片并行查询（多个同结构数据库文件并发查询，流式合并、归并排序、全局 LIMIT）
+- 插入或更新（INSERT ... ON CONFLICT DO UPDATE，批量合并外部数据）
+- 按键批量更新和删除（键集写入临时表，一条集合语句完成）
+- 分组聚合（count/sum/avg/min/max/近似分位数，HAVING、Top N，在库内完成）
+- 物化视图（聚合结果保存为表，按水位列增量刷新，可全部重算）
+- 全文搜索（FTS5 外部内容索引，触发器同步或增量追加，bm25 排序、摘要、翻页）
+- 数据库维护（在线备份、VACUUM INTO 压缩副本、ANALYZE、PRAGMA optimize）
+- asyncio 接口（操作在专用线程中执行，WAL 模式下多个只读连接并发查询）
+- 常驻服务模式（Unix 套接字 JSON-RPC，复用热连接，命令行客户端模式）
+- 结构目录（表、列、索引、外键一次加载，按 schema_version 失效，构建 SQL 前校验表名和列名）
 """
 
 import sqlite3
+import csv
+import glob
+import heapq
 import json
+import logging
 import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import pickle
+import struct
 import sys
+import threading
+import time
+import unicodedata
+import queue
+import random
+import re
+import socket
+import socketserver
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterator, Iterable, TextIO
+
+try:
+    import orjson  # 可选依赖，安装后 JSON 输出更快
+except ImportError:
+    orjson = None
+
+
+# 流式查询默认每批读取的行数
+DEFAULT_BATCH_SIZE = 1000
+
+# 批量导入时每次 executemany 写入的行数，以及每个事务提交的行数
+DEFAULT_IMPORT_CHUNK_SIZE = 10000
+DEFAULT_IMPORT_COMMIT_ROWS = 200000
+
+# 导入时用于推断列类型的样本行数
+IMPORT_SAMPLE_SIZE = 1000
+
+# 连接性能配置档，按顺序执行 PRAGMA（busy_timeout 放在最前，切换日志模式时可等待锁）
+# cache_size 为负数时单位为 KiB
+PRAGMA_PROFILES = {
+    'safe': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16384,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    'balanced': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    'bulk-load': {
+        'busy_timeout': 30000,
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+    'read-heavy': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -131072,
+        'mmap_size': 1073741824,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# 查询结果的行格式：
+# dict - 每行一个字典（默认）
+# tuple - {'columns': [列名], 'rows': [元组]}
+# columnar - {'列名': 该列全部值}，纯整数列为 array('q')，纯数值列为 array('d')
+# row - 原始 sqlite3.Row 对象
+ROW_FORMATS = ('dict', 'tuple', 'columnar', 'row')
+
+# JSON 输出格式：pretty 缩进数组（默认），compact 单行数组，ndjson 每行一条记录
+OUTPUT_FORMATS = ('pretty', 'compact', 'ndjson')
+
+# 输出时每次写入文件的行数
+OUTPUT_CHUNK_ROWS = 1000
+
+# 构建好的 SQL 字符串缓存容量（每种操作各一个 LRU 缓存）
+SQL_CACHE_SIZE = 1024
+
+# 每个连接缓存的预编译语句数量（sqlite3 默认 128）
+DEFAULT_CACHED_STATEMENTS = 512
+
+# 导出时每批读取和写出的行数
+DEFAULT_EXPORT_BATCH_SIZE = 10000
+
+# 文件扩展名到导出格式的映射
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.sqlcol': 'columnar',
+}
+
+# 列式二进制格式的文件头标识
+COLUMNAR_MAGIC = b'SQLCOL1\n'
+
+# 键集分页默认每页行数
+DEFAULT_PAGE_SIZE = 100
+
+# 每个连接最多记录的查询形态数量（用于索引建议）
+WORKLOAD_MAX_SHAPES = 1000
+
+# 覆盖索引最多包含的列数
+COVERING_INDEX_MAX_COLUMNS = 8
+
+# aggregate 支持的聚合函数（pNN / median 另外处理，使用近似分位数）
+AGGREGATE_FUNCTIONS = {
+    'count': 'COUNT({})',
+    'count_distinct': 'COUNT(DISTINCT {})',
+    'sum': 'SUM({})',
+    'total': 'TOTAL({})',
+    'avg': 'AVG({})',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+}
+_PERCENTILE_RE = re.compile(r'^p(\d+(?:\.\d+)?)$')
+_GROUP_ALIAS_RE = re.compile(r'^\s*([A-Za-z_]\w*)\s*=(?!=)\s*(.+)$')
+
+# 可增量合并的聚合函数：已有结果 {old} 与新增行的结果 {new} 如何合并（NULL 表示没有值）
+AGGREGATE_MERGE_RULES = {
+    'count': '{old} + {new}',
+    'total': '{old} + {new}',
+    'sum': 'COALESCE({old} + {new}, {old}, {new})',
+    'min': 'COALESCE(MIN({old}, {new}), {old}, {new})',
+    'max': 'COALESCE(MAX({old}, {new}), {old}, {new})',
+}
+
+# 物化视图的元数据表
+MATVIEW_META_TABLE = '_db_ops_matviews'
+
+# 近似分位数每个分组最多保留的样本数
+PERCENTILE_SAMPLE_SIZE = 10000
+
+# 查询结果缓存默认的条目数和字节数上限
+DEFAULT_RESULT_CACHE_ENTRIES = 256
+DEFAULT_RESULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# 在线备份每步复制的页数、数据库被锁定时重试前等待的秒数、进度报告的最小间隔（秒）
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.25
+BACKUP_PROGRESS_INTERVAL = 1.0
+
+# 全文索引的元数据表、维护模式和搜索默认每页行数
+FTS_META_TABLE = '_db_ops_fts'
+FTS_INDEX_MODES = ('rebuild', 'append', 'optimize')
+DEFAULT_SEARCH_LIMIT = 20
+
+# 结构目录的加载语句，{tables} 为全部表和视图，或读取失败时逐表重试的单个表名
+SCHEMA_QUERIES = {
+    'columns': """
+        SELECT m.name AS table_name, c.* FROM {tables} AS m
+        JOIN pragma_table_xinfo(m.name) AS c ORDER BY m.name, c.cid
+    """,
+    'indexes': """
+        SELECT m.name AS table_name, il.name AS index_name, il."unique" AS is_unique,
+               il.origin AS origin, il.partial AS partial, ii.name AS column_name
+        FROM {tables} AS m
+        JOIN pragma_index_list(m.name) AS il
+        JOIN pragma_index_info(il.name) AS ii
+        ORDER BY m.name, il.name, ii.seqno
+    """,
+    'foreign_keys': """
+        SELECT m.name AS table_name, fk.* FROM {tables} AS m
+        JOIN pragma_foreign_key_list(m.name) AS fk ORDER BY m.name, fk.id, fk.seq
+    """,
+}
+SCHEMA_ALL_TABLES = "(SELECT name FROM sqlite_master WHERE type IN ('table', 'view'))"
+
+# 校验标识符时跳过的名称：rowid 别名和可以出现在列列表中的字面量关键字
+ROWID_ALIASES = frozenset({'rowid', 'oid', '_rowid_'})
+SQL_LITERAL_WORDS = frozenset({'null', 'true', 'false', 'current_date', 'current_time', 'current_timestamp'})
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_]\w*$')
+
+# 命令行和服务模式支持的操作
+OPERATIONS = ('create_table', 'insert', 'import', 'query', 'paginate', 'export', 'upsert', 'update',
+              'update_many', 'delete_many', 'delete', 'execute', 'list_tables', 'table_info', 'describe',
+              'create_index', 'list_indexes', 'advise_indexes', 'backup', 'vacuum_into', 'analyze',
+              'optimize', 'fts_create', 'fts_index', 'search', 'aggregate', 'create_matview', 'refresh',
+              'list_matviews', 'drop_matview')
+
+# 服务模式最多同时保持打开的数据库数量
+SERVER_MAX_DATABASES = 16
+
+# JSON-RPC 2.0 错误码
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_INTERNAL_ERROR = -32603
+RPC_DATABASE_ERROR = -32000
+
+# 文件扩展名到导入格式的映射
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'json',
+}
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_select_sql(table_name: str, columns: str = "*", where: Optional[str] = None,
+                     order_by: Optional[str] = None, limit: Optional[int] = None) -> str:
+    """
+    构建 SELECT 语句
+    
+    Args:
+        table_name: 表名
+        columns: 要查询的列
+        where: WHERE 子句（不包含 WHERE 关键字）
+        order_by: ORDER BY 子句（不包含 ORDER BY 关键字）
+        limit: 限制返回的行数
+    
+    Returns:
+        SQL 语句
+    """
+    sql = f"SELECT {columns} FROM {table_name}"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += f" LIMIT {limit}"
+    return sql
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_insert_sql(table_name: str, columns: tuple) -> str:
+    """
+    构建 INSERT 语句
+    
+    Args:
+        table_name: 表名
+        columns: 列名元组
+    
+    Returns:
+        SQL 语句
+    """
+    placeholders = ', '.join(['?' for _ in columns])
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_update_sql(table_name: str, columns: tuple, where: str) -> str:
+    """
+    构建 UPDATE 语句
+    
+    Args:
+        table_name: 表名
+        columns: 要更新的列名元组
+        where: WHERE 子句（不包含 WHERE 关键字）
+    
+    Returns:
+        SQL 语句
+    """
+    set_clause = ', '.join([f"{column} = ?" for column in columns])
+    return f"UPDATE {table_name} SET {set_clause} WHERE {where}"
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_delete_sql(table_name: str, where: str) -> str:
+    """
+    构建 DELETE 语句
+    
+    Args:
+        table_name: 表名
+        where: WHERE 子句（不包含 WHERE 关键字）
+    
+    Returns:
+        SQL 语句
+    """
+    return f"DELETE FROM {table_name} WHERE {where}"
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_upsert_sql(table_name: str, columns: tuple, conflict_columns: tuple,
+                     update_columns: Optional[tuple] = None,
+                     update_where: Optional[str] = None) -> str:
+    """
+    构建 INSERT ... ON CONFLICT 语句
+    
+    Args:
+        table_name: 表名
+        columns: 插入的列名元组
+        conflict_columns: 冲突目标列（需要有对应的主键或唯一约束）
+        update_columns: 冲突时更新的列，None 表示除冲突列以外的全部列，
+                        空元组表示冲突时忽略该行 (DO NOTHING)
+        update_where: 冲突时只在满足该条件时更新，如 "excluded.version > t.version"
+    
+    Returns:
+        SQL 语句
+    """
+    sql = build_insert_sql(table_name, columns) + f" ON CONFLICT ({', '.join(conflict_columns)})"
+    if update_columns is None:
+        update_columns = tuple(column for column in columns if column not in conflict_columns)
+    if not update_columns:
+        return sql + " DO NOTHING"
+    set_clause = ', '.join(f"{column} = excluded.{column}" for column in update_columns)
+    sql += f" DO UPDATE SET {set_clause}"
+    if update_where:
+        sql += f" WHERE {update_where}"
+    return sql
+
+
+def parse_aggregate_spec(spec: str) -> tuple:
+    """
+    解析聚合规格
+    
+    格式为 函数[:列]，可加 别名= 前缀，例如 "count"、"sum:amount"、
+    "p95:latency"、"median:latency"、"users=count_distinct:user_id"。
+    pNN 为近似分位数（NN 可带小数，如 p99.9）。
+    
+    Returns:
+        (别名, SQL 表达式)
+    """
+    alias, _, body = spec.strip().rpartition('=')
+    func, _, column = body.strip().partition(':')
+    func, column = func.strip().lower(), column.strip()
+    if func == 'median':
+        func = 'p50'
+    match = _PERCENTILE_RE.match(func)
+    if func == 'count' and column in ('', '*'):
+        expression = "COUNT(*)"
+    elif not column:
+        raise ValueError(f"聚合函数 {func} 需要指定列，如 {func}:amount")
+    elif match:
+        fraction = float(match.group(1)) / 100
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"分位数超出范围: {func}")
+        expression = f"percentile_approx({column}, {fraction!r})"
+    elif func in AGGREGATE_FUNCTIONS:
+        expression = AGGREGATE_FUNCTIONS[func].format(column)
+    else:
+        raise ValueError(f"未知的聚合函数: {func}，可选: {', '.join(AGGREGATE_FUNCTIONS)}、pNN、median")
+    alias = alias.strip() or re.sub(r'\W', '_', f"{func}_{column}" if column else func)
+    return alias, expression
+
+
+def parse_group_item(item: str) -> tuple:
+    """
+    解析分组项：列名，或 别名=表达式（如 "day=date(ts)"）
+    
+    Returns:
+        (结果列名, 分组表达式)
+    """
+    match = _GROUP_ALIAS_RE.match(item)
+    if match:
+        return match.group(1), match.group(2).strip()
+    return item.strip(), item.strip()
+
+
+def aggregate_merge_rule(spec: str) -> Optional[str]:
+    """
+    聚合结果的增量合并表达式模板（{old} 为已有值，{new} 为新增部分的值）
+    
+    count/sum/total/min/max 可以由旧结果和新增行的结果合并得到；
+    avg、count_distinct 和分位数不能，返回 None。
+    """
+    body = spec.strip().rpartition('=')[2]
+    return AGGREGATE_MERGE_RULES.get(body.partition(':')[0].strip().lower())
+
+
+@lru_cache(maxsize=SQL_CACHE_SIZE)
+def build_aggregate_sql(table_name: str, group_by: tuple, aggregates: tuple,
+                        where: Optional[str] = None, having: Optional[str] = None,
+                        order_by: Optional[str] = None, limit: Optional[int] = None) -> str:
+    """
+    构建 GROUP BY 聚合语句
+    
+    Args:
+        table_name: 表名
+        group_by: 分组列元组（可写作 别名=表达式），空元组表示对整张表聚合
+        aggregates: 聚合规格元组，见 parse_aggregate_spec
+        where: WHERE 子句（不包含 WHERE 关键字）
+        having: HAVING 子句，可以引用聚合的别名
+        order_by: ORDER BY 子句，可以引用聚合的别名
+        limit: 限制返回的分组数
+    
+    Returns:
+        SQL 语句
+    """
+    groups = [parse_group_item(item) for item in group_by]
+    selects = [expression if name == expression else f"{expression} AS {name}" for name, expression in groups]
+    selects += [f"{expression} AS {alias}" for alias, expression in map(parse_aggregate_spec, aggregates)]
+    sql = f"SELECT {', '.join(selects)} FROM {table_name}"
+    if where:
+        sql += f" WHERE {where}"
+    if groups:
+        sql += f" GROUP BY {', '.join(expression for _, expression in groups)}"
+    if having:
+        sql += f" HAVING {having}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += f" LIMIT {limit}"
+    return sql
+
+
+SQL_BUILDERS = {
+    'select': build_select_sql,
+    'insert': build_insert_sql,
+    'update': build_update_sql,
+    'delete': build_delete_sql,
+    'upsert': build_upsert_sql,
+    'aggregate': build_aggregate_sql,
+}
+
+
+def sql_cache_info() -> Dict[str, Dict[str, int]]:
+    """
+    获取 SQL 字符串缓存的命中统计
+    
+    Returns:
+        每种操作及合计的 {'hits', 'misses', 'size'} 字典
+    """
+    info = {}
+    total = {'hits': 0, 'misses': 0, 'size': 0}
+    for name, builder in SQL_BUILDERS.items():
+        stats = builder.cache_info()
+        info[name] = {'hits': stats.hits, 'misses': stats.misses, 'size': stats.currsize}
+        for key in total:
+            total[key] += info[name][key]
+    info['total'] = total
+    return info
+
+
+def clear_sql_cache():
+    """清空 SQL 字符串缓存及其统计"""
+    for builder in SQL_BUILDERS.values():
+        builder.cache_clear()
+
+
+def check_row_format(row_format: str, streaming: bool = False):
+    """
+    校验行格式参数
+    
+    Args:
+        row_format: 行格式
+        streaming: 是否用于流式读取（流式读取不支持 columnar）
+    
+    Raises:
+        ValueError: 行格式不支持
+    """
+    if row_format not in ROW_FORMATS or (streaming and row_format == 'columnar'):
+        allowed = [f for f in ROW_FORMATS if not (streaming and f == 'columnar')]
+        raise ValueError(f"不支持的行格式: {row_format}，可选: {', '.join(allowed)}")
+
+
+def open_cursor(conn: sqlite3.Connection, row_format: str = 'dict') -> sqlite3.Cursor:
+    """
+    创建游标，tuple / columnar 格式直接产出元组，省去 sqlite3.Row 的开销
+    
+    Args:
+        conn: 数据库连接
+        row_format: 行格式
+    
+    Returns:
+        游标
+    """
+    cursor = conn.cursor()
+    if row_format in ('tuple', 'columnar'):
+        cursor.row_factory = None
+    return cursor
+
+
+def _compact_column(values: List[Any]) -> Any:
+    """把一列值转换为紧凑表示：纯整数列用 array('q')，纯数值列用 array('d')"""
+    if not values:
+        return values
+    if all(type(value) is int for value in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return values
+    if all(type(value) in (int, float) for value in values):
+        return array('d', values)
+    return values
+
+
+def fetch_results(cursor: sqlite3.Cursor, row_format: str = 'dict',
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Any:
+    """
+    按行格式读取已执行游标的全部结果
+    
+    Args:
+        cursor: 由 open_cursor 创建并已执行 SELECT 的游标
+        row_format: 行格式，见 ROW_FORMATS
+        batch_size: columnar 格式下每批读取的行数
+    
+    Returns:
+        dict - 字典列表；row - sqlite3.Row 列表；
+        tuple - {'columns': [列名], 'rows': [元组]}；columnar - {'列名': 列值}
+    """
+    if row_format == 'dict':
+        return [dict(row) for row in cursor.fetchall()]
+    if row_format == 'row':
+        return cursor.fetchall()
+    
+    columns = [description[0] for description in cursor.description or ()]
+    if row_format == 'tuple':
+        return {'columns': columns, 'rows': cursor.fetchall()}
+    
+    data: List[List[Any]] = [[] for _ in columns]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for values, column_values in zip(data, zip(*rows)):
+            values.extend(column_values)
+    return {name: _compact_column(values) for name, values in zip(columns, data)}
+
+
+def result_count(result: Any, row_format: str = 'dict') -> int:
+    """计算 fetch_results 返回结果的行数"""
+    if row_format == 'tuple':
+        return len(result['rows'])
+    if row_format == 'columnar':
+        return len(next(iter(result.values()), ()))
+    return len(result)
+
+
+def iter_cursor_rows(cursor: sqlite3.Cursor, batch_size: int = DEFAULT_BATCH_SIZE,
+                     row_format: str = 'dict', header: bool = False) -> Iterator[Any]:
+    """
+    按批从已执行的游标读取结果
+    
+    Args:
+        cursor: 由 open_cursor 创建并已执行 SELECT 的游标
+        batch_size: 每批读取的行数
+        row_format: 行格式 (dict/tuple/row)
+        header: tuple 格式下先产出一个列名元组
+    
+    Yields:
+        每行数据（字典、元组或 sqlite3.Row）
+    """
+    if header and row_format == 'tuple':
+        yield tuple(description[0] for description in cursor.description or ())
+    as_dict = row_format == 'dict'
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if as_dict:
+            for row in rows:
+                yield dict(row)
+        else:
+            yield from rows
+
+
+def json_default(obj: Any) -> Any:
+    """JSON 序列化的 default 回调，处理列式结果中的 array 和 BLOB 列（转为 Base64）"""
+    if isinstance(obj, array):
+        return obj.tolist()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(obj)).decode('ascii')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj: Any, pretty: bool = False) -> str:
+    """
+    序列化为 JSON 字符串，安装了 orjson 时使用 orjson
+    
+    Args:
+        obj: 要序列化的对象
+        pretty: 是否缩进两格输出
+    
+    Returns:
+        JSON 字符串（非 ASCII 字符原样保留）
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, default=json_default, option=option).decode('utf-8')
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=json_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=json_default)
+
+
+def write_rows(rows: Iterable[Any], fp: TextIO, output_format: str = 'ndjson',
+               chunk_rows: int = OUTPUT_CHUNK_ROWS) -> int:
+    """
+    把行逐个序列化一次，按块写出，不在内存中拼出完整的结果字符串
+    
+    Args:
+        rows: 行迭代器
+        fp: 输出文件对象
+        output_format: pretty / compact 输出 JSON 数组，ndjson 每行一条记录
+        chunk_rows: 每次写入的行数
+    
+    Returns:
+        写出的行数
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {', '.join(OUTPUT_FORMATS)}")
+    pretty = output_format == 'pretty'
+    if output_format == 'ndjson':
+        opening, separator, closing, empty = '', '\n', '\n', ''
+    elif pretty:
+        opening, separator, closing, empty = '[\n  ', ',\n  ', '\n]', '[]'
+    else:
+        opening, separator, closing, empty = '[', ',', ']', '[]'
+    
+    count = 0
+    buffer: List[str] = []
+    for row in rows:
+        text = json_dumps(row, pretty)
+        if pretty:
+            # 数组元素整体缩进两格，与 json.dumps(indent=2) 的输出一致
+            text = text.replace('\n', '\n  ')
+        buffer.append(text)
+        if len(buffer) >= chunk_rows:
+            fp.write(separator if count else opening)
+            fp.write(separator.join(buffer))
+            count += len(buffer)
+            buffer.clear()
+    if buffer:
+        fp.write(separator if count else opening)
+        fp.write(separator.join(buffer))
+        count += len(buffer)
+    fp.write(closing if count else empty)
+    return count
+
+
+def write_result(result: Any, fp: TextIO, output_format: str = 'pretty') -> int:
+    """
+    按输出格式写出一次查询的完整结果
+    
+    行列表逐行分块写出；tuple 格式在 ndjson 下先写列名再逐行写出；
+    其他结果（如 columnar）整体序列化一次。
+    
+    Returns:
+        写出的行数
+    """
+    if isinstance(result, list):
+        return write_rows(result, fp, output_format)
+    if output_format == 'ndjson' and isinstance(result, dict) and set(result) == {'columns', 'rows'}:
+        return write_rows(chain([result['columns']], result['rows']), fp, output_format) - 1
+    fp.write(json_dumps(result, output_format == 'pretty'))
+    if output_format == 'ndjson':
+        fp.write('\n')
+    return 1
+
+
+def iter_csv_rows(fp: TextIO, delimiter: str = ',') -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取 CSV 文件，首行为列名
+    
+    Args:
+        fp: 文件对象
+        delimiter: 分隔符
+    
+    Yields:
+        每行数据字典（值均为字符串）
+    """
+    yield from csv.DictReader(fp, delimiter=delimiter)
+
+
+def iter_ndjson_rows(fp: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取 NDJSON 文件（每行一个 JSON 对象），忽略空行
+    
+    Args:
+        fp: 文件对象
+    
+    Yields:
+        每行数据字典
+    """
+    for line_no, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"NDJSON 第 {line_no} 行不是 JSON 对象")
+        yield row
+
+
+def iter_json_array_rows(fp: TextIO, read_size: int = 65536) -> Iterator[Dict[str, Any]]:
+    """
+    增量解析 JSON 对象数组，无需把整个文件读入内存
+    
+    Args:
+        fp: 文件对象
+        read_size: 每次读取的字符数
+    
+    Yields:
+        数组中的每个对象
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    started = False
+    eof = False
+    
+    while True:
+        # 跳过空白（数组开始后还要跳过元素之间的逗号）
+        skip = ' \t\r\n,' if started else ' \t\r\n'
+        while True:
+            while pos < len(buf) and buf[pos] in skip:
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = fp.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        
+        if pos >= len(buf):
+            raise ValueError("JSON 数组未正常结束")
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError("JSON 文件必须是对象数组")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+        
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # 对象跨越了缓冲区边界，继续读取
+            if eof:
+                raise
+            chunk = fp.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        
+        if not isinstance(obj, dict):
+            raise ValueError("JSON 数组的元素必须是对象")
+        yield obj
+        pos = end
+
+
+def iter_file_rows(path: str, file_format: Optional[str] = None,
+                   delimiter: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取 CSV、TSV、NDJSON 或 JSON 数组文件
+    
+    格式在调用时检查，文件在迭代时打开、迭代结束时关闭。
+    
+    Args:
+        path: 文件路径，"-" 表示标准输入
+        file_format: 文件格式 (csv/tsv/ndjson/json)，默认按扩展名判断
+        delimiter: CSV 分隔符，默认 csv 为 ","，tsv 为制表符
+    
+    Returns:
+        行字典迭代器
+    """
+    if file_format is None:
+        file_format = IMPORT_FORMATS.get(Path(path).suffix.lower())
+        if file_format is None:
+            raise ValueError(f"无法根据扩展名判断文件格式，请指定格式: {path}")
+    if file_format not in ('csv', 'tsv', 'ndjson', 'json'):
+        raise ValueError(f"不支持的导入格式: {file_format}")
+    
+    def generate():
+        if path == '-':
+            fp = sys.stdin
+        else:
+            fp = open(path, 'r', encoding='utf-8-sig', newline='')
+        try:
+            if file_format in ('csv', 'tsv'):
+                yield from iter_csv_rows(fp, delimiter or (',' if file_format == 'csv' else '\t'))
+            elif file_format == 'ndjson':
+                yield from iter_ndjson_rows(fp)
+            else:
+                yield from iter_json_array_rows(fp)
+        finally:
+            if fp is not sys.stdin:
+                fp.close()
+    return generate()
+
+
+def _is_zero_padded(value: str) -> bool:
+    """判断是否为带前导零的数字串（如邮编 "007"），这类值应保留为文本"""
+    digits = value.lstrip('+-')
+    return len(digits) > 1 and digits[0] == '0' and digits[1] not in '.eE'
+
+
+def _parse_int(value: str) -> Optional[int]:
+    """把字符串解析为整数，带前导零的不视为整数"""
+    if _is_zero_padded(value):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _parse_float(value: str) -> Optional[float]:
+    """把字符串解析为浮点数，带前导零的不视为浮点数"""
+    if _is_zero_padded(value):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def infer_column_types(rows: List[Dict[str, Any]], columns: List[str]) -> Dict[str, str]:
+    """
+    根据样本行推断列的 SQLite 类型
+    
+    字符串值（CSV）按内容判断能否解析为整数或浮点数；JSON 值按 Python 类型判断。
+    
+    Args:
+        rows: 样本行
+        columns: 列名列表
+    
+    Returns:
+        列类型字典，格式 {'列名': 'INTEGER' | 'REAL' | 'TEXT'}
+    """
+    types = {}
+    for column in columns:
+        kind = None
+        for row in rows:
+            value = row.get(column)
+            if value is None or value == '':
+                continue
+            if isinstance(value, str):
+                if _parse_int(value) is not None:
+                    value_kind = 'INTEGER'
+                elif _parse_float(value) is not None:
+                    value_kind = 'REAL'
+                else:
+                    value_kind = 'TEXT'
+            elif isinstance(value, (bool, int)):
+                value_kind = 'INTEGER'
+            elif isinstance(value, float):
+                value_kind = 'REAL'
+            else:
+                value_kind = 'TEXT'
+            
+            if kind is None or kind == value_kind:
+                kind = value_kind
+            elif {kind, value_kind} == {'INTEGER', 'REAL'}:
+                kind = 'REAL'
+            else:
+                kind = 'TEXT'
+                break
+        types[column] = kind or 'TEXT'
+    return types
+
+
+def _make_converter(column_type: str):
+    """
+    生成把导入值转换为目标列类型的函数
+    
+    空字符串转为 NULL，嵌套的 JSON 值序列化为文本，无法转换的值原样写入。
+    """
+    column_type = column_type.upper()
+    
+    def convert(value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(value, str):
+            if 'INT' in column_type:
+                parsed = _parse_int(value)
+                return value if parsed is None else parsed
+            if 'REAL' in column_type or 'FLOA' in column_type or 'DOUB' in column_type:
+                parsed = _parse_float(value)
+                return value if parsed is None else parsed
+        return value
+    
+    return convert
+
+
+class CsvExportWriter:
+    """CSV / TSV 导出写入器，首行为列名，BLOB 值写为 Base64"""
+    
+    def __init__(self, path: str, columns: List[str], delimiter: str = ','):
+        self.fp = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.fp, delimiter=delimiter)
+        self.writer.writerow(columns)
+    
+    def write_batch(self, rows: List[tuple]):
+        """写出一批行"""
+        if any(type(value) is bytes for row in rows for value in row):
+            rows = [[json_default(value) if type(value) is bytes else value for value in row]
+                    for row in rows]
+        self.writer.writerows(rows)
+    
+    def tell(self) -> int:
+        """已写出的字节数"""
+        return 0 if self.fp is sys.stdout else self.fp.tell()
+    
+    def close(self) -> int:
+        """关闭文件，返回文件字节数"""
+        size = self.tell()
+        if self.fp is sys.stdout:
+            self.fp.flush()
+        else:
+            self.fp.close()
+        return size
+
+
+class TsvExportWriter(CsvExportWriter):
+    """TSV 导出写入器"""
+    
+    def __init__(self, path: str, columns: List[str]):
+        super().__init__(path, columns, delimiter='\t')
+
+
+class NdjsonExportWriter(CsvExportWriter):
+    """NDJSON 导出写入器，每行一个 JSON 对象"""
+    
+    def __init__(self, path: str, columns: List[str]):
+        self.fp = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        self.columns = columns
+    
+    def write_batch(self, rows: List[tuple]):
+        """写出一批行"""
+        columns = self.columns
+        self.fp.write(''.join(json_dumps(dict(zip(columns, row))) + '\n' for row in rows))
+
+
+class ColumnarExportWriter:
+    """
+    列式二进制导出写入器
+    
+    文件结构（整数均为小端序）:
+        COLUMNAR_MAGIC
+        u32 头部长度 + 头部 JSON {"version": 1, "columns": [列名]}
+        若干行组，每个行组:
+            b'RG' + u32 行数
+            每列: u8 编码 + u32 数据长度 + zlib 压缩的数据
+    列编码: b'q' 为 int64 数组，b'd' 为 float64 数组，
+           b'j' 为 JSON 数组（含 NULL、文本或混合类型的列，BLOB 为 Base64）
+    用 read_columnar() 读取。
+    """
+    
+    def __init__(self, path: str, columns: List[str], compress_level: int = 1):
+        if path == '-':
+            raise ValueError("列式格式不支持输出到标准输出，请指定 --output 文件")
+        self.fp = open(path, 'wb')
+        self.columns = columns
+        self.compress_level = compress_level
+        header = json.dumps({'version': 1, 'columns': columns}).encode('utf-8')
+        self.fp.write(COLUMNAR_MAGIC + struct.pack('<I', len(header)) + header)
+    
+    def _encode_column(self, values: tuple) -> tuple:
+        """编码一列值，返回 (编码, 未压缩数据)"""
+        compact = _compact_column(list(values))
+        if isinstance(compact, array):
+            if sys.byteorder == 'big':
+                compact.byteswap()
+            return compact.typecode.encode('ascii'), compact.tobytes()
+        return b'j', json_dumps(compact).encode('utf-8')
+    
+    def write_batch(self, rows: List[tuple]):
+        """写出一个行组"""
+        parts = [b'RG', struct.pack('<I', len(rows))]
+        for values in zip(*rows):
+            tag, payload = self._encode_column(values)
+            payload = zlib.compress(payload, self.compress_level)
+            parts.append(tag + struct.pack('<I', len(payload)))
+            parts.append(payload)
+        self.fp.write(b''.join(parts))
+    
+    def tell(self) -> int:
+        """已写出的字节数"""
+        return self.fp.tell()
+    
+    def close(self) -> int:
+        """关闭文件，返回文件字节数"""
+        size = self.fp.tell()
+        self.fp.close()
+        return size
+
+
+EXPORT_WRITERS = {
+    'csv': CsvExportWriter,
+    'tsv': TsvExportWriter,
+    'ndjson': NdjsonExportWriter,
+    'columnar': ColumnarExportWriter,
+}
+
+
+def read_columnar(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    读取列式二进制导出文件
+    
+    Args:
+        path: 文件路径
+    
+    Yields:
+        每个行组的 {'列名': 列值}，数值列为 array，其他列为 list
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"不是列式导出文件: {path}")
+        (header_size,) = struct.unpack('<I', f.read(4))
+        columns = json.loads(f.read(header_size))['columns']
+        while True:
+            marker = f.read(2)
+            if not marker:
+                return
+            if marker != b'RG':
+                raise ValueError(f"列式文件已损坏: {path}")
+            f.read(4)  # 行数，各列长度已足以还原数据
+            group = {}
+            for name in columns:
+                tag = f.read(1)
+                (size,) = struct.unpack('<I', f.read(4))
+                payload = zlib.decompress(f.read(size))
+                if tag == b'j':
+                    group[name] = json.loads(payload)
+                else:
+                    values = array(tag.decode('ascii'))
+                    values.frombytes(payload)
+                    if sys.byteorder == 'big':
+                        values.byteswap()
+                    group[name] = values
+            yield group
+
+
+_ORDER_TERM_RE = re.compile(r'^\s*([A-Za-z_][\w.]*|"[^"]+"|`[^`]+`|\[[^\]]+\])\s*(ASC|DESC)?\s*$', re.IGNORECASE)
+
+
+def parse_order_by(order_by: str) -> List[tuple]:
+    """
+    解析键集分页的排序列
+    
+    Args:
+        order_by: ORDER BY 子句，如 "created_at DESC, id DESC"，只允许列名和方向
+    
+    Returns:
+        [(列名, 是否降序), ...]
+    
+    Raises:
+        ValueError: 子句包含列名和方向以外的内容
+    """
+    keys = []
+    for term in order_by.split(','):
+        match = _ORDER_TERM_RE.match(term)
+        if not match:
+            raise ValueError(f"分页排序列只能是列名加可选的 ASC/DESC: {term.strip()}")
+        keys.append((match.group(1), (match.group(2) or 'ASC').upper() == 'DESC'))
+    return keys
+
+
+def build_seek_predicate(keys: List[tuple]) -> str:
+    """
+    构建键集分页的定位条件（取排序在上一页最后一行之后的行）
+    
+    所有排序列方向相同时使用行值比较 (a, b) > (?, ?)，可以直接利用复合索引；
+    方向混合时展开为 a > ? OR (a = ? AND b < ?) ... 的形式。
+    
+    Returns:
+        WHERE 条件；参数按 build_seek_params 的顺序绑定
+    """
+    directions = {desc for _, desc in keys}
+    if len(directions) == 1:
+        op = '<' if keys[0][1] else '>'
+        if len(keys) == 1:
+            return f"{keys[0][0]} {op} ?"
+        names = ', '.join(name for name, _ in keys)
+        placeholders = ', '.join('?' for _ in keys)
+        return f"({names}) {op} ({placeholders})"
+    
+    terms = []
+    for i, (name, desc) in enumerate(keys):
+        equals = [f"{prev} = ?" for prev, _ in keys[:i]]
+        terms.append('(' + ' AND '.join(equals + [f"{name} {'<' if desc else '>'} ?"]) + ')')
+    return ' OR '.join(terms)
+
+
+def build_seek_params(keys: List[tuple], values: List[Any]) -> List[Any]:
+    """按 build_seek_predicate 生成的占位符顺序展开上一页最后一行的键值"""
+    if len({desc for _, desc in keys}) == 1:
+        return list(values)
+    params = []
+    for i in range(len(keys)):
+        params.extend(values[:i + 1])
+    return params
+
+
+def encode_page_token(order_by: List[tuple], values: List[Any]) -> str:
+    """把排序列和上一页最后一行的键值编码为不透明的分页令牌"""
+    payload = json.dumps({'o': [[name, desc] for name, desc in order_by], 'k': list(values)},
+                         ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_page_token(token: str, order_by: List[tuple]) -> List[Any]:
+    """
+    解码分页令牌
+    
+    Raises:
+        ValueError: 令牌无效或与排序列不匹配
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        token_order = [tuple(item) for item in payload['o']]
+        values = payload['k']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("无效的分页令牌")
+    if token_order != [tuple(item) for item in order_by] or len(values) != len(order_by):
+        raise ValueError("分页令牌与排序列不匹配")
+    return values
+
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_EQUALITY_RE = re.compile(r'([A-Za-z_][\w.]*)\s*(?:==?|\bIS\b|\bIN\b)', re.IGNORECASE)
+_RANGE_RE = re.compile(r'([A-Za-z_][\w.]*)\s*(?:<=?|>=?|\bBETWEEN\b|\bLIKE\b|\bGLOB\b)', re.IGNORECASE)
+_FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?\S+$')
+
+
+def plan_issues(plan: List[str]) -> List[str]:
+    """
+    从 EXPLAIN QUERY PLAN 的输出中找出全表扫描和临时排序
+    
+    Args:
+        plan: 执行计划每一步的描述
+    
+    Returns:
+        有问题的步骤
+    """
+    return [detail for detail in plan
+            if _FULL_SCAN_RE.match(detail) or 'USE TEMP B-TREE FOR ORDER BY' in detail]
+
+
+def suggest_index_columns(where: Optional[str], order_by: Optional[str],
+                          table_columns: List[str]) -> List[str]:
+    """
+    根据 WHERE 和 ORDER BY 推断索引列
+    
+    等值条件列在前；有排序时接排序列（避免临时排序），否则接第一个范围条件列。
+    只保留表中真实存在的列。
+    
+    Args:
+        where: WHERE 子句
+        order_by: ORDER BY 子句
+        table_columns: 表的列名
+    
+    Returns:
+        建议的索引列
+    """
+    known = {column.lower(): column for column in table_columns}
+    
+    def resolve(names):
+        resolved = []
+        for name in names:
+            column = known.get(name.split('.')[-1].lower())
+            if column and column not in resolved:
+                resolved.append(column)
+        return resolved
+    
+    text = _STRING_LITERAL_RE.sub("''", where or '')
+    equality = resolve(_EQUALITY_RE.findall(text))
+    columns = list(equality)
+    if order_by:
+        order_terms = [term.split()[0] for term in order_by.split(',') if term.strip()]
+        trailing = resolve(order_terms)
+    else:
+        trailing = resolve(_RANGE_RE.findall(text))[:1]
+    for column in trailing:
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def _column_tuple(columns: Any) -> Optional[tuple]:
+    """把列名列表或逗号分隔的字符串转为元组，None 保持为 None"""
+    if columns is None:
+        return None
+    if isinstance(columns, str):
+        return tuple(column.strip() for column in columns.split(',') if column.strip())
+    return tuple(columns)
+
+
+_QUOTED_IDENTIFIER_RE = re.compile(r'^(?:"((?:[^"]|"")*)"|`((?:[^`]|``)*)`|\[([^\]]*)\])$')
+
+
+def unquote_identifier(name: str) -> Optional[str]:
+    """
+    去掉标识符的引号（"..."、`...`、[...]），返回 SQLite 中实际的名称
+    
+    Returns:
+        简单标识符原样返回，带引号的返回去掉引号后的名称，其他（表达式、带库名等）返回 None
+    """
+    name = name.strip()
+    if _IDENTIFIER_RE.match(name):
+        return name
+    match = _QUOTED_IDENTIFIER_RE.match(name)
+    if match is None:
+        return None
+    double, backtick, bracket = match.groups()
+    if double is not None:
+        return double.replace('""', '"')
+    if backtick is not None:
+        return backtick.replace('``', '`')
+    return bracket
+
+
+def index_name_for(table_name: str, columns: List[str]) -> str:
+    """生成索引名，如 idx_users_email_age"""
+    return re.sub(r'\W', '_', f"idx_{table_name}_{'_'.join(columns)}")[:120]
+
+
+def format_stats(stats: List[Dict[str, Any]], top: Optional[int] = 20) -> str:
+    """
+    把 get_stats() 的结果格式化为文本汇总表
+    
+    Args:
+        stats: 语句统计列表（按总耗时降序）
+        top: 最多显示的语句数量，None 表示全部
+    
+    Returns:
+        汇总表文本
+    """
+    if not stats:
+        return "（没有统计到语句）"
+    shown = stats[:top] if top else stats
+    total_ms = sum(item['total_ms'] for item in stats) or 1.0
+    
+    def pad(text: str, width: int) -> str:
+        # 中文字符占两列，按显示宽度右对齐
+        wide = sum(1 for ch in text if unicodedata.east_asian_width(ch) in 'WF')
+        return ' ' * max(width - len(text) - wide, 0) + text
+    
+    lines = ['操作' + ' ' * 8 + ''.join(pad(title, width) for title, width in
+                                        (('次数', 8), ('总耗时ms', 12), ('平均ms', 10),
+                                         ('最大ms', 10), ('行数', 10), ('占比', 8))) + '  SQL']
+    for item in shown:
+        sql = ' '.join(item['sql'].split())
+        if len(sql) > 80:
+            sql = sql[:77] + '...'
+        lines.append(f"{item['operation']:<12}{item['count']:>8}{item['total_ms']:>12.2f}"
+                     f"{item['avg_ms']:>10.3f}{item['max_ms']:>10.3f}{item['rows']:>10}"
+                     f"{item['total_ms'] / total_ms:>8.1%}  {sql}")
+        for step in item.get('plan') or []:
+            lines.append(f"{'':<12}  └ {step}")
+    if len(stats) > len(shown):
+        lines.append(f"... 另有 {len(stats) - len(shown)} 种语句未显示")
+    return '\n'.join(lines)
+
+
+def part_path(output: str, part: int) -> str:
+    """生成切分文件的路径，如 out.csv -> out.part0001.csv"""
+    path = Path(output)
+    return str(path.with_name(f"{path.stem}.part{part:04d}{path.suffix}"))
+
+
+def file_fingerprint(db_path: str) -> Optional[str]:
+    """
+    数据库文件（及 WAL 文件）的大小和修改时间，任何提交都会改变它
+    
+    Returns:
+        指纹字符串，内存数据库或 URI 路径返回 None
+    """
+    if db_path == ':memory:' or db_path.startswith('file:'):
+        return None
+    parts = []
+    for suffix in ('', '-wal'):
+        try:
+            st = os.stat(db_path + suffix)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+class ResultCache:
+    """
+    查询结果缓存
+    
+    结果以 pickle 字节保存（命中时反序列化出新对象，调用方修改结果不会
+    影响缓存），按 LRU 顺序在条目数或总字节数超过上限时淘汰。每个条目
+    附带写入时的数据状态，状态不一致即视为失效，由 SQLiteDB 负责计算。
+    
+    指定 path 时同时写入一个 SQLite 磁盘缓存文件，以数据库文件指纹
+    （大小和修改时间）判断有效性，供之后的进程复用。多个数据库可以共用
+    同一个缓存文件，条目按数据库路径分开保存和失效。
+    """
+    
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_ENTRIES,
+                 max_bytes: int = DEFAULT_RESULT_CACHE_BYTES, path: Optional[str] = None):
+        """
+        Args:
+            max_entries: 内存中最多缓存的结果数
+            max_bytes: 内存和磁盘缓存各自的字节数上限，超过上限的单个结果不缓存
+            path: 磁盘缓存文件路径，默认只缓存在内存中
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.bytes = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                       'evictions': 0, 'invalidations': 0}
+        self._disk: Optional[sqlite3.Connection] = None
+        if path:
+            self._disk = sqlite3.connect(path)
+            columns = [row[1] for row in self._disk.execute("PRAGMA table_info(results)")]
+            if columns and 'database' not in columns:
+                # 旧版本的缓存文件不区分数据库，直接丢弃
+                self._disk.execute("DROP TABLE results")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY, database TEXT, fingerprint TEXT, value BLOB,
+                    size INTEGER, accessed REAL)
+            """)
+            self._disk.execute("CREATE INDEX IF NOT EXISTS results_database ON results (database)")
+            self._disk.commit()
+    
+    @staticmethod
+    def _digest(key: tuple) -> str:
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    
+    def get(self, key: tuple, stamp: tuple, fingerprint: Optional[str] = None) -> Optional[bytes]:
+        """
+        查找缓存
+        
+        Args:
+            key: 缓存键
+            stamp: 当前数据状态，与条目保存的状态不同则条目失效
+            fingerprint: 数据库文件指纹，提供时才查找磁盘缓存
+        
+        Returns:
+            pickle 字节，未命中返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._remove(key)
+            self._stats['invalidations'] += 1
+        if self._disk is not None and fingerprint is not None:
+            digest = self._digest(key)
+            row = self._disk.execute("SELECT value FROM results WHERE key = ? AND fingerprint = ?",
+                                     (digest, fingerprint)).fetchone()
+            if row is not None:
+                self._disk.execute("UPDATE results SET accessed = ? WHERE key = ?",
+                                   (time.time(), digest))
+                self._disk.commit()
+                self._stats['hits'] += 1
+                self._stats['disk_hits'] += 1
+                self._store(key, stamp, row[0])
+                return row[0]
+        self._stats['misses'] += 1
+        return None
+    
+    def put(self, key: tuple, stamp: tuple, blob: bytes, fingerprint: Optional[str] = None,
+            database: Optional[str] = None):
+        """
+        写入缓存
+        
+        Args:
+            key: 缓存键，需包含数据库路径，不同数据库的条目才不会互相覆盖
+            stamp: 写入时的数据状态
+            blob: pickle 字节
+            fingerprint: 数据库文件指纹，提供时同时写入磁盘缓存
+            database: 数据库路径，写入磁盘缓存时只清理该数据库指纹过期的条目
+        """
+        if len(blob) > self.max_bytes:
+            return
+        self._stats['stores'] += 1
+        self._store(key, stamp, blob)
+        if self._disk is not None and fingerprint is not None:
+            self._disk.execute("DELETE FROM results WHERE database IS ? AND fingerprint != ?",
+                               (database, fingerprint))
+            self._disk.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                               (self._digest(key), database, fingerprint, blob, len(blob), time.time()))
+            total = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = self._disk.execute(
+                    "SELECT key, size FROM results ORDER BY accessed LIMIT 1").fetchone()
+                self._disk.execute("DELETE FROM results WHERE key = ?", (oldest[0],))
+                total -= oldest[1]
+            self._disk.commit()
+    
+    def _store(self, key: tuple, stamp: tuple, blob: bytes):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (stamp, blob)
+        self.bytes += len(blob)
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+    
+    def _remove(self, key: tuple):
+        _, blob = self._entries.pop(key)
+        self.bytes -= len(blob)
+    
+    def clear(self):
+        """清空内存和磁盘缓存"""
+        self._entries.clear()
+        self.bytes = 0
+        if self._disk is not None:
+            self._disk.execute("DELETE FROM results")
+            self._disk.commit()
+    
+    def stats(self) -> Dict[str, int]:
+        """命中、未命中、淘汰、失效次数，以及当前条目数和字节数"""
+        return dict(self._stats, entries=len(self._entries), bytes=self.bytes)
+    
+    def close(self):
+        """关闭磁盘缓存文件"""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+# 状态信息模板，按事件名索引，字段由调用方提供
+STATUS_MESSAGES = {
+    'create_table': "✓ 表 '{table}' 创建成功",
+    'insert': "✓ 插入成功，行 ID: {row_id}",
+    'insert_many': "✓ 批量插入成功，共 {rows} 条记录",
+    'insert_empty': "⚠ 没有数据需要插入",
+    'upsert': "✓ 插入或更新成功，影响 {rows} 条记录",
+    'upsert_many': "✓ 批量插入或更新成功，共 {count} 条数据，影响 {rows} 条记录",
+    'update_many': "✓ 批量更新成功，共 {keys} 个键，影响 {rows} 条记录",
+    'delete_many': "✓ 批量删除成功，共 {keys} 个键，影响 {rows} 条记录",
+    'import': "✓ 导入成功，共 {rows} 条记录，用时 {seconds:.2f} 秒（{rate:,.0f} 行/秒）",
+    'import_empty': "⚠ 没有数据需要导入",
+    'import_progress': "… 已导入 {total} 条记录",
+    'query': "✓ 查询成功，返回 {rows} 条记录",
+    'query_cached': "✓ 查询成功，返回 {rows} 条记录（缓存）",
+    'paginate': "✓ 分页查询成功，返回 {rows} 条记录",
+    'export': "✓ 导出成功，共 {rows} 条记录，{files} 个文件，{mb:.1f} MB，用时 {seconds:.2f} 秒",
+    'update': "✓ 更新成功，影响 {rows} 条记录",
+    'delete': "✓ 删除成功，影响 {rows} 条记录",
+    'execute': "✓ SQL 执行成功，返回 {rows} 条记录",
+    'execute_cached': "✓ SQL 执行成功，返回 {rows} 条记录（缓存）",
+    'execute_write': "✓ SQL 执行成功，影响 {rows} 条记录",
+    'create_index': "✓ 索引 '{index}' 创建成功",
+    'advise_indexes': "✓ 分析了 {shapes} 种查询形态，建议创建 {suggestions} 个索引",
+    'stream': "✓ 流式查询完成，共 {rows} 条记录",
+    'saved': "✓ 结果已保存到 {path}",
+    'backup': "✓ 备份完成：{path}，{mb:.1f} MB，{pages} 页，用时 {seconds:.2f} 秒",
+    'backup_progress': "… 已备份 {copied}/{total} 页",
+    'vacuum_into': "✓ 压缩副本已写入 {path}：{source_mb:.1f} MB → {mb:.1f} MB，用时 {seconds:.2f} 秒",
+    'analyze': "✓ 已更新{target}的统计信息，用时 {seconds:.2f} 秒",
+    'optimize': "✓ PRAGMA optimize 完成，用时 {seconds:.2f} 秒",
+    'fts_create': "✓ 全文索引 '{fts}' 创建成功（{table}: {columns}）",
+    'fts_index': "✓ 全文索引 '{fts}' {mode} 完成，索引 {rows} 条记录，用时 {seconds:.2f} 秒",
+    'search': "✓ 搜索完成，返回 {rows} 条记录",
+    'aggregate': "✓ 聚合完成，返回 {rows} 个分组",
+    'create_matview': "✓ 物化视图 '{view}' 创建成功",
+    'refresh_matview': "✓ 物化视图 '{view}' 刷新完成（{mode}），{groups} 个分组，用时 {seconds:.2f} 秒",
+    'drop_matview': "✓ 物化视图 '{view}' 已删除",
+    'serve_start': "✓ 服务已启动，监听 {socket}（PID {pid}）",
+    'serve_stop': "✓ 服务已停止，共处理 {requests} 个请求，{errors} 个错误",
+    'remote': "✓ {operation} 已由服务端执行，用时 {ms:.1f} 毫秒",
+}
+
+
+def format_status(event: str, fields: Dict[str, Any]) -> str:
+    """按 STATUS_MESSAGES 模板生成状态信息，未知事件输出事件名和字段"""
+    template = STATUS_MESSAGES.get(event)
+    if template is None:
+        return f"{event} {fields}"
+    return template.format(**fields)
+
+
+class Reporter:
+    """
+    状态输出的基类，同时也是静默实现
+    
+    SQLiteDB 在每个操作完成后调用 report(事件名, 字段...)，由具体实现决定
+    打印、记录日志还是只计数。字段中的 rows 表示本次操作涉及的行数。
+    """
+    
+    def report(self, event: str, level: int = logging.INFO, **fields):
+        """
+        报告一个事件
+        
+        Args:
+            event: 事件名，见 STATUS_MESSAGES
+            level: logging 级别，警告类事件为 WARNING
+            **fields: 消息字段
+        """
+    
+    def summary(self) -> Optional[str]:
+        """汇总信息，只有计数模式返回内容"""
+        return None
+
+
+class SilentReporter(Reporter):
+    """不输出任何状态信息"""
+
+
+class PrintReporter(Reporter):
+    """
+    把状态信息打印到标准输出（默认行为）
+    
+    进度信息，以及数据写到标准输出时（output 字段为 "-"）的状态信息
+    打印到标准错误，避免混入数据。
+    """
+    
+    STDERR_EVENTS = frozenset({'import_progress', 'backup_progress'})
+    
+    def report(self, event: str, level: int = logging.INFO, **fields):
+        to_stderr = event in self.STDERR_EVENTS or fields.get('output') == '-'
+        print(format_status(event, fields), file=sys.stderr if to_stderr else sys.stdout)
+
+
+class LoggingReporter(Reporter):
+    """
+    通过 logging 输出状态信息
+    
+    事件名和字段放在日志记录的 event、fields 属性中，可配合 JsonLogFormatter
+    输出结构化日志。日志级别未启用时不格式化消息。
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('db_operations')
+    
+    def report(self, event: str, level: int = logging.INFO, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, format_status(event, fields),
+                        extra={'event': event, 'fields': fields})
+
+
+class CounterReporter(Reporter):
+    """
+    只累计每种事件的次数和行数，由 summary() 输出一条汇总
+    
+    适合循环中大量调用 insert 等操作的场景；可以在多个线程间共享。
+    """
+    
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def report(self, event: str, level: int = logging.INFO, **fields):
+        with self._lock:
+            counter = self.counts.get(event)
+            if counter is None:
+                counter = self.counts[event] = {'count': 0, 'rows': 0}
+            counter['count'] += 1
+            rows = fields.get('rows')
+            if rows and rows > 0:
+                counter['rows'] += rows
+    
+    def summary(self) -> str:
+        with self._lock:
+            if not self.counts:
+                return "✓ 没有执行任何操作"
+            parts = [f"{event} {counter['count']} 次（{counter['rows']} 行）"
+                     for event, counter in self.counts.items()]
+        return "✓ 操作汇总：" + "，".join(parts)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON，包含 LoggingReporter 附加的事件名和字段"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'ts': record.created, 'level': record.levelname, 'logger': record.name,
+                 'event': getattr(record, 'event', None), 'message': record.getMessage()}
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json_dumps(entry)
+
+
+REPORTERS = {
+    'print': PrintReporter,
+    'silent': SilentReporter,
+    'logging': LoggingReporter,
+    'counter': CounterReporter,
+}
+
+
+def make_reporter(reporter: Any = None) -> Reporter:
+    """
+    创建状态输出对象
+    
+    Args:
+        reporter: None（打印）、REPORTERS 中的名称，或 Reporter 实例
+    """
+    if reporter is None:
+        return PrintReporter()
+    if isinstance(reporter, str):
+        if reporter not in REPORTERS:
+            raise ValueError(f"未知的状态输出方式: {reporter}，可选: {', '.join(REPORTERS)}")
+        return REPORTERS[reporter]()
+    return reporter
+
+
+class ApproxPercentile:
+    """
+    近似分位数聚合函数，注册为 percentile_approx(值, 分位)
+    
+    用蓄水池抽样保留最多 PERCENTILE_SAMPLE_SIZE 个值，内存占用与分组行数无关；
+    行数不超过样本大小时结果是精确的（线性插值）。NULL 和非数值被忽略。
+    """
+    
+    def __init__(self):
+        self.sample: List[float] = []
+        self.count = 0
+        self.fraction = 0.5
+        self._random = random.Random(0)  # 固定种子，同样的数据得到同样的结果
+    
+    def step(self, value, fraction):
+        if not isinstance(value, (int, float)):
+            return
+        self.fraction = fraction
+        self.count += 1
+        if len(self.sample) < PERCENTILE_SAMPLE_SIZE:
+            self.sample.append(value)
+        else:
+            index = self._random.randrange(self.count)
+            if index < PERCENTILE_SAMPLE_SIZE:
+                self.sample[index] = value
+    
+    def finalize(self):
+        if not self.sample:
+            return None
+        self.sample.sort()
+        position = self.fraction * (len(self.sample) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(self.sample) - 1)
+        return self.sample[lower] + (self.sample[upper] - self.sample[lower]) * (position - lower)
 
 
 class SQLiteDB:
     """SQLite 数据库操作类"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, autocommit: bool = True,
+                 commit_every: Optional[int] = None,
+                 commit_interval: Optional[float] = None,
+                 profile: Optional[str] = None,
+                 pragmas: Optional[Dict[str, Any]] = None,
+                 check_same_thread: bool = True,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+                 record_workload: bool = True, workload_log: Optional[str] = None,
+                 instrument: bool = False, explain_plans: bool = False,
+                 stats_log: Optional[str] = None, result_cache: Any = None,
+                 reporter: Any = None):
+        """
+        初始化数据库连接
+        
+        Args:
+            db_path: 数据库文件路径
+            autocommit: 是否每次写操作后立即提交。设为 False 时写操作
+                        累积在同一事务中，按 commit_every / commit_interval
+                        批量提交，或由调用方显式调用 commit()
+            commit_every: 非自动提交模式下，累计写入多少行后提交一次
+            commit_interval: 非自动提交模式下，距上次提交多少秒后提交一次
+            profile: 性能配置档名称，见 PRAGMA_PROFILES
+                     (safe/balanced/bulk-load/read-heavy)，默认不调整
+            pragmas: 额外的 PRAGMA 设置，在配置档之后执行，可覆盖配置档中的值
+            check_same_thread: 是否禁止在创建连接以外的线程中使用连接。
+                               设为 False 时需由调用方自行加锁串行访问
+            cached_statements: 连接缓存的预编译语句数量，重复执行的语句无需重新解析
+            record_workload: 是否记录 query/update/delete 的查询形态，供 advise_indexes 使用
+            workload_log: 查询形态记录文件（JSON），连接时加载、关闭时保存，
+                          让多次运行的形态累积起来
+            instrument: 是否统计 query/insert/insert_many/update/delete/execute_sql
+                        每条语句的耗时和行数，见 get_stats()
+            explain_plans: 统计时是否同时记录每种语句的 EXPLAIN QUERY PLAN（隐含 instrument）
+            stats_log: 每条语句执行后以 JSON 行追加写入的日志文件（隐含 instrument）
+            result_cache: 缓存 query 和 SELECT 类 execute_sql 的结果。True 使用默认
+                          大小的内存缓存，也可以传入 ResultCache 实例（可带磁盘缓存文件）
+            reporter: 状态信息的输出方式：print（默认）、silent、logging、counter，
+                      或 Reporter 实例
+        """
+        if profile is not None and profile not in PRAGMA_PROFILES:
+            raise ValueError(f"未知的配置档: {profile}，可选: {', '.join(PRAGMA_PROFILES)}")
+        self.db_path = db_path
+        self.profile = profile
+        self.pragmas: Dict[str, Any] = dict(PRAGMA_PROFILES.get(profile, {}))
+        self.pragmas.update(pragmas or {})
+        self.check_same_thread = check_same_thread
+        self.cached_statements = cached_statements
+        self.record_workload = record_workload
+        self.workload: Dict[tuple, Dict[str, Any]] = {}
+        self.workload_log = workload_log
+        self.explain_plans = explain_plans
+        self.stats_log = stats_log
+        self.instrument = instrument or explain_plans or stats_log is not None
+        self._stats: Dict[tuple, Dict[str, Any]] = {}
+        self._stats_fp: Optional[TextIO] = None
+        self.reporter = make_reporter(reporter)
+        self.result_cache: Optional[ResultCache] = ResultCache() if result_cache is True else (result_cache or None)
+        # 缓存键中的数据库标识，共用一个 ResultCache 的不同数据库互不干扰
+        self._cache_database = db_path if db_path == ':memory:' else os.path.abspath(db_path)
+        self._table_versions: Dict[str, int] = {}
+        self._schema: Optional[Dict[str, Any]] = None
+        self._schema_names: Dict[str, tuple] = {}
+        self._sql_tables: Dict[str, tuple] = {}
+        self._cache_epoch = 0
+        self._bulk_serial = 0
+        self._seen_changes = 0
+        self.conn: Optional[sqlite3.Connection] = None
+        self.cursor: Optional[sqlite3.Cursor] = None
+        self.autocommit = autocommit
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._tx_depth = 0
+        self._pending_rows = 0
+        self._last_commit = time.monotonic()
+    
+    def connect(self) -> "SQLiteDB":
+        """连接到数据库"""
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=self.check_same_thread,
+                                    cached_statements=self.cached_statements)
+        self.conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+        self.cursor = self.conn.cursor()
+        self._plain_cursor = open_cursor(self.conn, 'tuple')
+        self.conn.create_aggregate('percentile_approx', 2, ApproxPercentile)
+        self._apply_pragmas()
+        if self.workload_log and Path(self.workload_log).exists():
+            self.load_workload(self.workload_log)
+        if self.stats_log:
+            self._stats_fp = open(self.stats_log, 'a', encoding='utf-8')
+        return self
+    
+    def _apply_pragmas(self):
+        """按顺序执行配置档和自定义的 PRAGMA 设置"""
+        for name, value in self.pragmas.items():
+            self.conn.execute(f"PRAGMA {name} = {value}").fetchall()
+    
+    def get_pragmas(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        读取 PRAGMA 当前值
+        
+        Args:
+            names: PRAGMA 名称列表，默认为配置档涉及的全部 PRAGMA
+        
+        Returns:
+            PRAGMA 值字典
+        """
+        names = list(names or PRAGMA_PROFILES['balanced'])
+        return {name: self.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+    
+    def close(self):
+        """关闭数据库连接"""
+        if self.workload_log and self.workload:
+            self.save_workload(self.workload_log)
+        if self._stats_fp:
+            self._stats_fp.close()
+            self._stats_fp = None
+        if self.result_cache is not None:
+            self.result_cache.close()
+        if self.conn:
+            self.conn.commit()
+            self.conn.close()
+    
+    def __enter__(self):
+        """上下文管理器入口"""
+        return self.connect()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """上下文管理器退出"""
+        self.close()
+    
+    def commit(self):
+        """提交当前事务中累积的写操作"""
+        self.conn.commit()
+        self._pending_rows = 0
+        self._last_commit = time.monotonic()
+    
+    def rollback(self):
+        """回滚当前事务中未提交的写操作"""
+        self.conn.rollback()
+        self._cache_epoch += 1
+        self._pending_rows = 0
+        self._last_commit = time.monotonic()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        显式事务上下文管理器
+        
+        块内的所有写操作在退出时一次性提交，发生异常则全部回滚。
+        可以嵌套使用，内层事务通过 SAVEPOINT 实现，异常只回滚内层的修改。
+        
+        示例:
+            with db.transaction():
+                for row in rows:
+                    db.insert('users', row)
+        """
+        if self._tx_depth == 0:
+            # 先提交批量模式下累积的写操作，避免被本事务的回滚波及
+            if self.conn.in_transaction:
+                self.commit()
+            self.conn.execute("BEGIN")
+        savepoint = f"sp_{self._tx_depth}"
+        if self._tx_depth > 0:
+            self.conn.execute(f"SAVEPOINT {savepoint}")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.rollback()
+            else:
+                self.conn.execute(f"ROLLBACK TO {savepoint}")
+                self.conn.execute(f"RELEASE {savepoint}")
+                self._cache_epoch += 1
+            raise
+        else:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.commit()
+            else:
+                self.conn.execute(f"RELEASE {savepoint}")
+    
+    def _after_write(self, rows: int = 0):
+        """
+        写操作完成后按提交策略决定是否提交
+        
+        Args:
+            rows: 本次写操作影响的行数
+        """
+        if self._tx_depth:
+            return
+        if self.autocommit:
+            self.commit()
+            return
+        self._pending_rows += max(rows, 0)
+        if self.commit_every and self._pending_rows >= self.commit_every:
+            self.commit()
+        elif self.commit_interval and time.monotonic() - self._last_commit >= self.commit_interval:
+            self.commit()
+    
+    def create_table(self, table_name: str, columns: Dict[str, str]):
+        """
+        创建表
+        
+        Args:
+            table_name: 表名
+            columns: 列定义字典，格式 {'列名': '类型和约束'}
+                    例如: {'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+                           'name': 'TEXT NOT NULL',
+                           'age': 'INTEGER'}
+        """
+        column_defs = ', '.join([f"{name} {definition}" for name, definition in columns.items()])
+        sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({column_defs})"
+        self.cursor.execute(sql)
+        self._after_write()
+        self.reporter.report('create_table', table=table_name)
+    
+    def insert(self, table_name: str, data: Dict[str, Any]) -> int:
+        """
+        插入单条数据
+        
+        Args:
+            table_name: 表名
+            data: 数据字典，格式 {'列名': 值}
+        
+        Returns:
+            插入数据的行 ID
+        """
+        started = time.perf_counter()
+        self._check_identifiers(table_name, data)
+        sql = build_insert_sql(table_name, tuple(data))
+        self.cursor.execute(sql, list(data.values()))
+        row_id = self.cursor.lastrowid
+        self._touch_table(table_name, 1)
+        self._after_write(1)
+        self._record_statement('insert', sql, None, started, 1)
+        self.reporter.report('insert', table=table_name, rows=1, row_id=row_id)
+        return row_id
+    
+    def insert_many(self, table_name: str, data_list: List[Dict[str, Any]]) -> int:
+        """
+        批量插入数据
+        
+        Args:
+            table_name: 表名
+            data_list: 数据字典列表
+        
+        Returns:
+            插入的行数
+        """
+        if not data_list:
+            self.reporter.report('insert_empty', logging.WARNING, table=table_name)
+            return 0
+        
+        started = time.perf_counter()
+        self._check_identifiers(table_name, data_list[0])
+        sql = build_insert_sql(table_name, tuple(data_list[0]))
+        
+        values_list = [list(data.values()) for data in data_list]
+        self.cursor.executemany(sql, values_list)
+        count = self.cursor.rowcount
+        self._touch_table(table_name, count)
+        self._after_write(count)
+        self._record_statement('insert_many', sql, None, started, count)
+        self.reporter.report('insert_many', table=table_name, rows=count)
+        return count
+    
+    def upsert(self, table_name: str, data: Dict[str, Any], conflict_columns: Any,
+               update_columns: Any = None, update_where: Optional[str] = None) -> int:
+        """
+        插入一条数据，与已有行冲突时更新该行
+        
+        Args:
+            table_name: 表名
+            data: 数据字典，格式 {'列名': 值}
+            conflict_columns: 冲突目标列，列表或逗号分隔的字符串，需要有对应的主键或唯一约束
+            update_columns: 冲突时更新的列，默认为 data 中除冲突列以外的全部列；
+                            空列表表示冲突时保留原行 (DO NOTHING)
+            update_where: 冲突时只在满足该条件时更新，可用 excluded.列名 引用新值
+        
+        Returns:
+            受影响的行数（冲突且未更新时为 0）
+        """
+        started = time.perf_counter()
+        conflict = _column_tuple(conflict_columns)
+        update = _column_tuple(update_columns)
+        self._check_identifiers(table_name, chain(data, conflict or (), update or ()))
+        sql = build_upsert_sql(table_name, tuple(data), conflict, update, update_where)
+        self.cursor.execute(sql, list(data.values()))
+        count = self.cursor.rowcount
+        self._touch_table(table_name, count)
+        self._after_write(count)
+        self._record_statement('upsert', sql, None, started, count)
+        self.reporter.report('upsert', table=table_name, rows=count)
+        return count
+    
+    def upsert_many(self, table_name: str, data_list: Iterable[Dict[str, Any]], conflict_columns: Any,
+                    update_columns: Any = None, update_where: Optional[str] = None,
+                    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE) -> int:
+        """
+        批量插入或更新数据，全部数据在一个事务中通过 executemany 分块写入
+        
+        列集合相同的连续行共用一条语句；不同的行可以只包含部分列，
+        冲突时只更新该行提供的列（除非指定了 update_columns）。
+        
+        Args:
+            table_name: 表名
+            data_list: 数据字典列表或迭代器
+            conflict_columns: 冲突目标列，列表或逗号分隔的字符串
+            update_columns: 冲突时更新的列，含义同 upsert
+            update_where: 冲突时只在满足该条件时更新
+            chunk_size: 每次 executemany 写入的行数
+        
+        Returns:
+            受影响的行数（插入和更新的行，忽略的冲突行不计）
+        """
+        conflict = _column_tuple(conflict_columns)
+        update = _column_tuple(update_columns)
+        total = 0
+        count = 0
+        
+        def flush(columns: tuple, values_list: List[list]) -> int:
+            started = time.perf_counter()
+            self._check_identifiers(table_name, chain(columns, conflict or (), update or ()))
+            sql = build_upsert_sql(table_name, columns, conflict, update, update_where)
+            self.cursor.executemany(sql, values_list)
+            rows = self.cursor.rowcount
+            self._touch_table(table_name, rows)
+            self._record_statement('upsert_many', sql, None, started, rows)
+            return rows
+        
+        with self.transaction():
+            columns: Optional[tuple] = None
+            values_list: List[list] = []
+            for data in data_list:
+                keys = tuple(data)
+                if keys != columns or len(values_list) >= chunk_size:
+                    if values_list:
+                        count += flush(columns, values_list)
+                    columns, values_list = keys, []
+                values_list.append(list(data.values()))
+                total += 1
+            if values_list:
+                count += flush(columns, values_list)
+        
+        if not total:
+            self.reporter.report('insert_empty', logging.WARNING, table=table_name)
+            return 0
+        self.reporter.report('upsert_many', table=table_name, count=total, rows=count)
+        return count
+    
+    def import_rows(self, table_name: str, rows: Iterable[Dict[str, Any]],
+                    column_types: Optional[Dict[str, str]] = None,
+                    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE,
+                    commit_rows: int = DEFAULT_IMPORT_COMMIT_ROWS,
+                    conflict_columns: Any = None, update_columns: Any = None) -> int:
+        """
+        流式批量导入数据
+        
+        先读取少量样本推断列类型（表不存在时按推断结果建表），之后按
+        chunk_size 分块通过 executemany 写入，每 commit_rows 行提交一次。
+        在 transaction() 中调用时不会自行提交。
+        
+        Args:
+            table_name: 表名
+            rows: 行迭代器
+            column_types: 指定列类型，覆盖推断结果，格式 {'列名': '类型'}
+            chunk_size: 每次 executemany 写入的行数
+            commit_rows: 每个事务提交的行数
+            conflict_columns: 指定后以插入或更新的方式导入（同 upsert），
+                              表不存在时会在这些列上建立唯一索引
+            update_columns: 冲突时更新的列，含义同 upsert
+        
+        Returns:
+            导入的行数
+        """
+        rows = iter(rows)
+        sample = list(islice(rows, IMPORT_SAMPLE_SIZE))
+        if not sample:
+            self.reporter.report('import_empty', logging.WARNING, table=table_name)
+            return 0
+        
+        columns = list(dict.fromkeys(key for row in sample for key in row))
+        types = infer_column_types(sample, columns)
+        types.update(column_types or {})
+        conflict = _column_tuple(conflict_columns)
+        if table_name not in self.get_tables():
+            self.create_table(table_name, {column: types[column] for column in columns})
+            if conflict:
+                self.create_index(table_name, list(conflict), unique=True)
+        
+        column_set = set(columns)
+        converters = [(column, _make_converter(types[column])) for column in columns]
+        if conflict:
+            sql = build_upsert_sql(table_name, tuple(columns), conflict, _column_tuple(update_columns))
+        else:
+            sql = build_insert_sql(table_name, tuple(columns))
+        
+        own_tx = self._tx_depth == 0
+        total = 0
+        uncommitted = 0
+        start = time.perf_counter()
+        all_rows = chain(sample, rows)
+        try:
+            while True:
+                chunk = list(islice(all_rows, chunk_size))
+                if not chunk:
+                    break
+                values_list = []
+                for row in chunk:
+                    total += 1
+                    if row.keys() - column_set:
+                        unknown = ', '.join(str(key) for key in row.keys() - column_set)
+                        raise ValueError(f"第 {total} 行包含未知列: {unknown}")
+                    values_list.append([convert(row.get(column)) for column, convert in converters])
+                
+                if own_tx and not self.conn.in_transaction:
+                    self.conn.execute("BEGIN")
+                self.cursor.executemany(sql, values_list)
+                self._touch_table(table_name, len(values_list))
+                uncommitted += len(values_list)
+                if own_tx and uncommitted >= commit_rows:
+                    self.commit()
+                    uncommitted = 0
+                    self.reporter.report('import_progress', table=table_name, total=total)
+            if own_tx:
+                self.commit()
+        except BaseException:
+            if own_tx:
+                self.rollback()
+            raise
+        
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed > 0 else float(total)
+        self.reporter.report('import', table=table_name, rows=total, seconds=elapsed, rate=rate)
+        return total
+    
+    def import_file(self, table_name: str, path: str, file_format: Optional[str] = None,
+                    column_types: Optional[Dict[str, str]] = None,
+                    delimiter: Optional[str] = None,
+                    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE,
+                    commit_rows: int = DEFAULT_IMPORT_COMMIT_ROWS,
+                    conflict_columns: Any = None, update_columns: Any = None) -> int:
+        """
+        从 CSV、TSV、NDJSON 或 JSON 数组文件导入数据
+        
+        Args:
+            table_name: 表名
+            path: 文件路径，"-" 表示标准输入
+            file_format: 文件格式 (csv/tsv/ndjson/json)，默认按扩展名判断
+            column_types: 指定列类型，覆盖推断结果
+            delimiter: CSV 分隔符，默认 csv 为 ","，tsv 为制表符
+            chunk_size: 每次 executemany 写入的行数
+            commit_rows: 每个事务提交的行数
+            conflict_columns: 指定后以插入或更新的方式导入，见 import_rows
+            update_columns: 冲突时更新的列
+        
+        Returns:
+            导入的行数
+        """
+        rows = iter_file_rows(path, file_format, delimiter)
+        try:
+            return self.import_rows(table_name, rows, column_types, chunk_size, commit_rows,
+                                    conflict_columns, update_columns)
+        finally:
+            rows.close()
+    
+    def query(self, table_name: str, columns: str = "*", 
+              where: Optional[str] = None, params: Optional[tuple] = None,
+              order_by: Optional[str] = None, limit: Optional[int] = None,
+              row_format: str = 'dict') -> Any:
+        """
+        查询数据
+        
+        Args:
+            table_name: 表名
+            columns: 要查询的列，默认 "*"
+            where: WHERE 子句（不包含 WHERE 关键字）
+            params: WHERE 子句的参数
+            order_by: ORDER BY 子句（不包含 ORDER BY 关键字）
+            limit: 限制返回的行数
+            row_format: 行格式 (dict/tuple/columnar/row)，见 ROW_FORMATS
+        
+        Returns:
+            查询结果，默认为字典列表，其他格式见 fetch_results
+        """
+        check_row_format(row_format)
+        started = time.perf_counter()
+        self._check_identifiers(table_name, self._selected_columns(columns))
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        self._record_shape('query', table_name, columns, where, order_by, params)
+        key, stamp, results = self._cache_lookup(sql, params, row_format)
+        if results is not None:
+            count = result_count(results, row_format)
+            self._record_statement('query', sql, params, started, count)
+            self.reporter.report('query_cached', table=table_name, rows=count)
+            return results
+        cursor = self._cursor_for(row_format)
+        
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        
+        results = fetch_results(cursor, row_format)
+        self._cache_store(key, stamp, results)
+        count = result_count(results, row_format)
+        self._record_statement('query', sql, params, started, count)
+        self.reporter.report('query', table=table_name, rows=count)
+        return results
+    
+    def aggregate(self, table_name: str, group_by: Any = None, aggregates: Any = ('count',),
+                  where: Optional[str] = None, params: Optional[tuple] = None,
+                  having: Optional[str] = None, order_by: Optional[str] = None,
+                  top: Optional[int] = None, row_format: str = 'dict') -> Any:
+        """
+        在数据库内分组聚合，只把聚合后的结果读入 Python
+        
+        Args:
+            table_name: 表名
+            group_by: 分组列，列表或逗号分隔的字符串，默认对整张表聚合
+            aggregates: 聚合规格，列表或逗号分隔的字符串，如
+                        ["count", "sum:amount", "avg:amount", "p95:latency"]，见 parse_aggregate_spec
+            where: 聚合前的过滤条件（不包含 WHERE 关键字）
+            params: where 和 having 中占位符的参数（按出现顺序）
+            having: 聚合后的过滤条件，可以引用聚合的别名，如 "count > 10"
+            order_by: 排序，可以引用聚合的别名
+            top: 只返回前 N 个分组；未指定 order_by 时按第一个聚合降序
+            row_format: 行格式，同 query
+        
+        Returns:
+            聚合结果，每个分组一行，列为分组列加各聚合的别名
+        """
+        check_row_format(row_format)
+        started = time.perf_counter()
+        group_by = _column_tuple(group_by) or ()
+        if isinstance(aggregates, str):
+            aggregates = [spec for spec in aggregates.split(',') if spec.strip()]
+        aggregates = tuple(aggregates)
+        if not aggregates:
+            raise ValueError("aggregate 需要至少一个聚合函数")
+        if top and not order_by:
+            order_by = f"{parse_aggregate_spec(aggregates[0])[0]} DESC"
+        sql = build_aggregate_sql(table_name, group_by, aggregates, where, having, order_by, top)
+        key, stamp, results = self._cache_lookup(sql, params, row_format)
+        if results is None:
+            cursor = self._cursor_for(row_format)
+            cursor.execute(sql, params or ())
+            results = fetch_results(cursor, row_format)
+            self._cache_store(key, stamp, results)
+        count = result_count(results, row_format)
+        self._record_statement('aggregate', sql, params, started, count)
+        self.reporter.report('aggregate', table=table_name, rows=count)
+        return results
+    
+    def iter_query(self, table_name: str, columns: str = "*",
+                   where: Optional[str] = None, params: Optional[tuple] = None,
+                   order_by: Optional[str] = None, limit: Optional[int] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE, row_format: str = 'dict',
+                   header: bool = False) -> Iterator[Any]:
+        """
+        流式查询数据，按批读取，内存占用与结果集大小无关
+        
+        Args:
+            table_name: 表名
+            columns: 要查询的列，默认 "*"
+            where: WHERE 子句（不包含 WHERE 关键字）
+            params: WHERE 子句的参数
+            order_by: ORDER BY 子句（不包含 ORDER BY 关键字）
+            limit: 限制返回的行数
+            batch_size: 每批读取的行数
+            row_format: 行格式 (dict/tuple/row)
+            header: tuple 格式下先产出一个列名元组
+        
+        Yields:
+            每行数据（默认为字典）
+        """
+        self._check_identifiers(table_name, self._selected_columns(columns))
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        self._record_shape('query', table_name, columns, where, order_by, params)
+        yield from self.iter_sql(sql, params, batch_size, row_format, header)
+    
+    def iter_sql(self, sql: str, params: Optional[tuple] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, row_format: str = 'dict',
+                 header: bool = False) -> Iterator[Any]:
+        """
+        流式执行 SELECT 语句，按批读取结果
+        
+        使用独立游标，迭代过程中仍可调用其他方法。
+        
+        Args:
+            sql: SELECT 语句
+            params: SQL 参数
+            batch_size: 每批读取的行数
+            row_format: 行格式 (dict/tuple/row)
+            header: tuple 格式下先产出一个列名元组
+        
+        Yields:
+            每行数据（默认为字典）
+        """
+        check_row_format(row_format, streaming=True)
+        cursor = open_cursor(self.conn, row_format)
+        try:
+            cursor.execute(sql, params or ())
+            yield from iter_cursor_rows(cursor, batch_size, row_format, header)
+        finally:
+            cursor.close()
+    
+    def _cursor_for(self, row_format: str) -> sqlite3.Cursor:
+        """按行格式选择共享游标"""
+        return self._plain_cursor if row_format in ('tuple', 'columnar') else self.cursor
+    
+    def export(self, output: str, table_name: Optional[str] = None, columns: str = "*",
+               where: Optional[str] = None, params: Optional[tuple] = None,
+               order_by: Optional[str] = None, limit: Optional[int] = None,
+               sql: Optional[str] = None, export_format: Optional[str] = None,
+               batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+               max_part_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        把整张表或任意 SELECT 的结果流式导出为 CSV、TSV、NDJSON 或列式二进制文件
+        
+        结果按批读取、按批写出，内存占用与结果集大小无关。
+        
+        Args:
+            output: 输出文件路径，"-" 表示标准输出（列式格式不支持）
+            table_name: 要导出的表名，与 sql 二选一
+            columns / where / params / order_by / limit: 同 query，导出表时使用
+            sql: 要导出的 SELECT 语句，与 table_name 二选一
+            export_format: 导出格式 (csv/tsv/ndjson/columnar)，默认按扩展名判断
+            batch_size: 每批读取和写出的行数（列式格式下即行组大小）
+            max_part_bytes: 单个文件的大致字节上限，超过后切分为
+                            out.part0001.csv、out.part0002.csv ...，
+                            每个文件可能超出上限不到一批的数据
+        
+        Returns:
+            导出摘要 {'rows', 'files', 'bytes', 'seconds'}
+        """
+        if (table_name is None) == (sql is None):
+            raise ValueError("export 需要指定 table_name 或 sql 之一")
+        if export_format is None:
+            export_format = EXPORT_FORMATS.get(Path(output).suffix.lower())
+            if export_format is None:
+                raise ValueError(f"无法根据扩展名判断导出格式，请指定格式: {output}")
+        if export_format not in EXPORT_WRITERS:
+            raise ValueError(f"不支持的导出格式: {export_format}，可选: {', '.join(EXPORT_WRITERS)}")
+        if output == '-':
+            max_part_bytes = None
+        if sql is None:
+            sql = build_select_sql(table_name, columns, where, order_by, limit)
+        
+        start = time.perf_counter()
+        cursor = open_cursor(self.conn, 'tuple')
+        writer_class = EXPORT_WRITERS[export_format]
+        files: List[str] = []
+        total_rows = 0
+        total_bytes = 0
+        writer = None
+        try:
+            cursor.execute(sql, params or ())
+            names = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if writer is None:
+                    path = part_path(output, len(files) + 1) if max_part_bytes else output
+                    writer = writer_class(path, names)
+                    files.append(path)
+                writer.write_batch(rows)
+                total_rows += len(rows)
+                if max_part_bytes and writer.tell() >= max_part_bytes:
+                    total_bytes += writer.close()
+                    writer = None
+            if not files:
+                # 结果为空时也写出一个只有表头的文件
+                path = part_path(output, 1) if max_part_bytes else output
+                writer = writer_class(path, names)
+                files.append(path)
+        finally:
+            cursor.close()
+            if writer is not None:
+                total_bytes += writer.close()
+        
+        elapsed = time.perf_counter() - start
+        summary = {'rows': total_rows, 'files': files, 'bytes': total_bytes,
+                   'seconds': round(elapsed, 3)}
+        self.reporter.report('export', rows=total_rows, files=len(files), mb=total_bytes / 1048576,
+                             seconds=elapsed, output=output)
+        return summary
+    
+    def paginate(self, table_name: str, order_by: str, page_size: int = DEFAULT_PAGE_SIZE,
+                 after: Optional[str] = None, columns: str = "*",
+                 where: Optional[str] = None, params: Optional[tuple] = None,
+                 row_format: str = 'dict') -> Dict[str, Any]:
+        """
+        键集（seek）分页查询
+        
+        不使用 OFFSET，而是从上一页最后一行的排序键之后继续读取，
+        排序列上有索引时每页的代价与页码无关。排序列应为非空且组合唯一，
+        通常在末尾加上主键，如 "created_at DESC, id DESC"。
+        
+        Args:
+            table_name: 表名
+            order_by: 排序列，只允许列名和可选的 ASC/DESC
+            page_size: 每页行数
+            after: 上一页返回的 next 令牌，为空时返回第一页
+            columns: 要查询的列，默认 "*"
+            where: WHERE 子句（不包含 WHERE 关键字）
+            params: WHERE 子句的参数
+            row_format: 行格式 (dict/tuple)
+        
+        Returns:
+            {'rows': 本页数据, 'next': 下一页令牌（已到末尾时为 None）}，
+            tuple 格式额外包含 'columns'
+        """
+        if row_format not in ('dict', 'tuple'):
+            raise ValueError(f"分页只支持 dict 和 tuple 行格式: {row_format}")
+        keys = parse_order_by(order_by)
+        self._record_shape('paginate', table_name, columns, where, order_by, params)
+        conditions = []
+        all_params: List[Any] = []
+        if where:
+            conditions.append(f"({where})")
+            all_params.extend(params or ())
+        if after:
+            conditions.append(f"({build_seek_predicate(keys)})")
+            all_params.extend(build_seek_params(keys, decode_page_token(after, keys)))
+        
+        # 排序键追加在所选列之后，用来生成下一页令牌，返回前去掉
+        key_names = ', '.join(name for name, _ in keys)
+        order_clause = ', '.join(f"{name} {'DESC' if desc else 'ASC'}" for name, desc in keys)
+        sql = build_select_sql(table_name, f"{columns}, {key_names}",
+                               ' AND '.join(conditions) or None, order_clause, page_size + 1)
+        
+        cursor = self._cursor_for('tuple')
+        cursor.execute(sql, all_params)
+        rows = cursor.fetchall()
+        key_count = len(keys)
+        names = [description[0] for description in cursor.description][:-key_count]
+        
+        next_token = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_token = encode_page_token(keys, list(rows[-1][-key_count:]))
+        if row_format == 'dict':
+            page_rows: List[Any] = [dict(zip(names, row)) for row in rows]
+        else:
+            page_rows = [row[:-key_count] for row in rows]
+        
+        self.reporter.report('paginate', table=table_name, rows=len(page_rows))
+        page: Dict[str, Any] = {'rows': page_rows, 'next': next_token}
+        if row_format == 'tuple':
+            page['columns'] = names
+        return page
+    
+    def update(self, table_name: str, data: Dict[str, Any], 
+               where: str, params: Optional[tuple] = None) -> int:
+        """
+        更新数据
+        
+        Args:
+            table_name: 表名
+            data: 要更新的数据字典
+            where: WHERE 子句（不包含 WHERE 关键字）
+            params: WHERE 子句的参数
+        
+        Returns:
+            受影响的行数
+        """
+        started = time.perf_counter()
+        self._check_identifiers(table_name, data)
+        sql = build_update_sql(table_name, tuple(data), where)
+        self._record_shape('update', table_name, None, where, None, params)
+        
+        # 合并 SET 和 WHERE 的参数
+        all_params = list(data.values())
+        if params:
+            all_params.extend(params)
+        
+        self.cursor.execute(sql, all_params)
+        count = self.cursor.rowcount
+        self._touch_table(table_name, count)
+        self._after_write(count)
+        self._record_statement('update', sql, all_params, started, count)
+        self.reporter.report('update', table=table_name, rows=count)
+        return count
+    
+    def delete(self, table_name: str, where: str, params: Optional[tuple] = None) -> int:
+        """
+        删除数据
+        
+        Args:
+            table_name: 表名
+            where: WHERE 子句（不包含 WHERE 关键字）
+            params: WHERE 子句的参数
+        
+        Returns:
+            删除的行数
+        """
+        started = time.perf_counter()
+        self._check_identifiers(table_name)
+        sql = build_delete_sql(table_name, where)
+        self._record_shape('delete', table_name, None, where, None, params)
+        
+        if params:
+            self.cursor.execute(sql, params)
+        else:
+            self.cursor.execute(sql)
+        
+        count = self.cursor.rowcount
+        self._touch_table(table_name, count)
+        self._after_write(count)
+        self._record_statement('delete', sql, params, started, count)
+        self.reporter.report('delete', table=table_name, rows=count)
+        return count
+    
+    def execute_sql(self, sql: str, params: Optional[tuple] = None,
+                    row_format: str = 'dict') -> Any:
+        """
+        执行自定义 SQL 语句
+        
+        Args:
+            sql: SQL 语句
+            params: SQL 参数
+            row_format: SELECT 结果的行格式 (dict/tuple/columnar/row)
+        
+        Returns:
+            查询结果（如果是 SELECT）或受影响的行数
+        """
+        check_row_format(row_format)
+        started = time.perf_counter()
+        is_select = sql.strip().upper().startswith('SELECT')
+        key = stamp = None
+        if is_select:
+            key, stamp, results = self._cache_lookup(sql, params, row_format)
+            if results is not None:
+                count = result_count(results, row_format)
+                self._record_statement('execute', sql, params, started, count)
+                self.reporter.report('execute_cached', rows=count)
+                return results
+        cursor = self._cursor_for(row_format)
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        
+        # 如果是 SELECT 语句，返回结果（只读语句无需提交）
+        if is_select:
+            results = fetch_results(cursor, row_format)
+            self._cache_store(key, stamp, results)
+            count = result_count(results, row_format)
+            self._record_statement('execute', sql, params, started, count)
+            self.reporter.report('execute', rows=count)
+            return results
+        else:
+            count = cursor.rowcount
+            # 无法确定任意语句修改了哪些表（也可能修改了表结构），让全部缓存失效
+            self._cache_epoch += 1
+            self._after_write(count)
+            self._record_statement('execute', sql, params, started, count)
+            self.reporter.report('execute_write', rows=count)
+            return count
+    
+    def _load_key_table(self, table_name: str, columns: tuple, key_count: int,
+                        rows: Iterable[tuple], chunk_size: int) -> tuple:
+        """
+        创建临时表并分批写入键（及新值），供 update_many / delete_many 做集合操作
+        
+        临时表的列沿用目标表声明的类型（比较时的类型转换与目标表一致），
+        以键列为主键，重复的键以最后一次出现的为准。
+        
+        Returns:
+            (临时表名, 写入的行数)
+        """
+        declared = {info['name']: info['type'] for info in self.get_table_info(table_name)}
+        if not declared:
+            raise ValueError(f"表不存在: {table_name}")
+        missing = [column for column in columns if column not in declared]
+        if missing:
+            raise ValueError(f"表 {table_name} 没有这些列: {', '.join(missing)}")
+        self._bulk_serial += 1
+        temp_name = re.sub(r'\W', '_', f"_bulk_{table_name}_{self._bulk_serial}")
+        definitions = ', '.join(f"{column} {declared[column]}" for column in columns)
+        self.conn.execute(f"CREATE TEMP TABLE {temp_name} ({definitions}, "
+                          f"PRIMARY KEY ({', '.join(columns[:key_count])}))")
+        sql = (f"INSERT OR REPLACE INTO temp.{temp_name} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        total = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            self.conn.executemany(sql, chunk)
+            total += len(chunk)
+        return temp_name, total
+    
+    def update_many(self, table_name: str, rows: Iterable[Dict[str, Any]], key_columns: Any,
+                    update_columns: Any = None,
+                    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE) -> int:
+        """
+        按键批量更新：把键和新值分批写入临时表，再用一条 UPDATE ... FROM 完成更新
+        
+        全部操作在一个事务中执行，不受 SQLite 参数个数上限的限制。
+        
+        Args:
+            table_name: 表名
+            rows: 数据字典列表或迭代器，每行包含键列和要更新的列
+            key_columns: 键列，列表或逗号分隔的字符串
+            update_columns: 要更新的列，默认为第一行中除键列以外的全部列
+            chunk_size: 每次 executemany 写入临时表的行数
+        
+        Returns:
+            受影响的行数
+        """
+        started = time.perf_counter()
+        keys = _column_tuple(key_columns)
+        if not keys:
+            raise ValueError("update_many 需要至少一个键列")
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            self.reporter.report('update_many', table=table_name, keys=0, rows=0)
+            return 0
+        updates = _column_tuple(update_columns)
+        if updates is None:
+            updates = tuple(column for column in first if column not in keys)
+        if not updates:
+            raise ValueError("update_many 需要至少一个要更新的列")
+        columns = keys + updates
+        
+        def values():
+            for number, row in enumerate(chain([first], rows), 1):
+                try:
+                    yield tuple(row[column] for column in columns)
+                except KeyError as e:
+                    raise ValueError(f"第 {number} 行缺少列: {e.args[0]}") from None
+        
+        match = ' AND '.join(f"{table_name}.{key} = s.{key}" for key in keys)
+        temp_name = None
+        try:
+            with self.transaction():
+                temp_name, total = self._load_key_table(table_name, columns, len(keys),
+                                                        values(), chunk_size)
+                if sqlite3.sqlite_version_info >= (3, 33, 0):
+                    set_clause = ', '.join(f"{column} = s.{column}" for column in updates)
+                    sql = (f"UPDATE {table_name} SET {set_clause} "
+                           f"FROM temp.{temp_name} AS s WHERE {match}")
+                else:
+                    # 3.33 之前没有 UPDATE ... FROM，改用相关子查询
+                    set_clause = ', '.join(
+                        f"{column} = (SELECT s.{column} FROM temp.{temp_name} AS s WHERE {match})"
+                        for column in updates)
+                    sql = (f"UPDATE {table_name} SET {set_clause} WHERE EXISTS "
+                           f"(SELECT 1 FROM temp.{temp_name} AS s WHERE {match})")
+                self.cursor.execute(sql)
+                count = self.cursor.rowcount
+                self._touch_table(table_name, count)
+        finally:
+            if temp_name:
+                self.conn.execute(f"DROP TABLE IF EXISTS temp.{temp_name}")
+        self._record_statement('update_many', sql, None, started, count)
+        self.reporter.report('update_many', table=table_name, keys=total, rows=count)
+        return count
+    
+    def delete_many(self, table_name: str, keys: Iterable[Any], key_columns: Any,
+                    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE) -> int:
+        """
+        按键批量删除：把键分批写入临时表，再用一条 DELETE ... WHERE 键 IN (SELECT ...) 完成删除
+        
+        Args:
+            table_name: 表名
+            keys: 键的列表或迭代器；单个键列时可以是值本身，多个键列时为元组或字典
+            key_columns: 键列，列表或逗号分隔的字符串
+            chunk_size: 每次 executemany 写入临时表的行数
+        
+        Returns:
+            删除的行数
+        """
+        started = time.perf_counter()
+        columns = _column_tuple(key_columns)
+        if not columns:
+            raise ValueError("delete_many 需要至少一个键列")
+        
+        def values():
+            for key in keys:
+                if isinstance(key, dict):
+                    yield tuple(key[column] for column in columns)
+                elif isinstance(key, (tuple, list)):
+                    yield tuple(key)
+                else:
+                    yield (key,)
+        
+        target = columns[0] if len(columns) == 1 else f"({', '.join(columns)})"
+        temp_name = None
+        try:
+            with self.transaction():
+                temp_name, total = self._load_key_table(table_name, columns, len(columns),
+                                                        values(), chunk_size)
+                sql = (f"DELETE FROM {table_name} WHERE {target} IN "
+                       f"(SELECT {', '.join(columns)} FROM temp.{temp_name})")
+                self.cursor.execute(sql)
+                count = self.cursor.rowcount
+                self._touch_table(table_name, count)
+        finally:
+            if temp_name:
+                self.conn.execute(f"DROP TABLE IF EXISTS temp.{temp_name}")
+        self._record_statement('delete_many', sql, None, started, count)
+        self.reporter.report('delete_many', table=table_name, keys=total, rows=count)
+        return count
+    
+    def _database_bytes(self) -> int:
+        """数据库当前大小（页数 × 页大小）"""
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+    
+    def _end_implicit_transaction(self, operation: str):
+        """维护操作前提交批量提交模式下累积的写入；显式事务中不允许执行"""
+        if self._tx_depth:
+            raise ValueError(f"{operation} 不能在显式事务中执行")
+        if self.conn.in_transaction:
+            self.commit()
+    
+    def backup(self, dest: str, pages: int = BACKUP_PAGES_PER_STEP,
+               sleep: float = BACKUP_STEP_SLEEP) -> Dict[str, Any]:
+        """
+        在线备份到另一个数据库文件
+        
+        使用 SQLite 的在线备份接口，每步只复制 pages 页。WAL 模式下备份在
+        一个读事务中进行，得到开始时刻的一致快照，其他连接照常写入；其他
+        日志模式下步与步之间释放锁，其他连接的写入会让备份从头开始。备份先
+        写入 <dest>.tmp，完成后再替换 dest，中途失败不会留下不完整的备份。
+        
+        Args:
+            dest: 备份文件路径，已存在时覆盖
+            pages: 每步复制的页数，-1 表示一步复制全部
+            sleep: 源数据库被锁定时，重试前等待的秒数
+        
+        Returns:
+            {'path', 'bytes', 'pages', 'seconds'}
+        """
+        self._end_implicit_transaction('backup')
+        started = time.perf_counter()
+        tmp_path = f"{dest}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        state = {'pages': 0, 'reported': started}
+        
+        def progress(status, remaining, total):
+            state['pages'] = total
+            now = time.perf_counter()
+            if remaining and now - state['reported'] >= BACKUP_PROGRESS_INTERVAL:
+                state['reported'] = now
+                self.reporter.report('backup_progress', copied=total - remaining, total=total)
+        
+        # WAL 模式下持有读事务固定快照，其他连接的写入不会让备份重新开始
+        snapshot = self.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        target = sqlite3.connect(tmp_path)
+        try:
+            if snapshot:
+                self.conn.execute("BEGIN")
+                self.conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()
+            self.conn.backup(target, pages=pages, progress=progress, sleep=sleep)
+            target.close()
+            os.replace(tmp_path, dest)
+        except BaseException:
+            target.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            if snapshot:
+                self.conn.commit()
+        
+        result = {'path': dest, 'bytes': os.path.getsize(dest), 'pages': state['pages'],
+                  'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('backup', path=dest, mb=result['bytes'] / 1048576,
+                             pages=result['pages'], seconds=result['seconds'])
+        return result
+    
+    def vacuum_into(self, dest: str) -> Dict[str, Any]:
+        """
+        把数据库压缩整理后写入一个新文件（VACUUM INTO）
+        
+        得到的副本没有空闲页、页面按顺序排列，适合做快照或归档；
+        执行期间持有读事务，不阻塞其他连接的读写（WAL 模式）。
+        
+        Args:
+            dest: 目标文件路径，不能已存在
+        
+        Returns:
+            {'path', 'source_bytes', 'bytes', 'seconds'}
+        """
+        if os.path.exists(dest):
+            raise ValueError(f"目标文件已存在: {dest}")
+        self._end_implicit_transaction('vacuum_into')
+        started = time.perf_counter()
+        source_bytes = self._database_bytes()
+        self.conn.execute("VACUUM INTO ?", (dest,))
+        result = {'path': dest, 'source_bytes': source_bytes, 'bytes': os.path.getsize(dest),
+                  'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('vacuum_into', path=dest, source_mb=source_bytes / 1048576,
+                             mb=result['bytes'] / 1048576, seconds=result['seconds'])
+        return result
+    
+    def analyze(self, table_name: Optional[str] = None,
+                analysis_limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        收集表和索引的统计信息（ANALYZE），供查询优化器选择索引
+        
+        Args:
+            table_name: 只分析该表（或索引），默认分析全部
+            analysis_limit: 每个索引最多扫描的行数（PRAGMA analysis_limit），
+                            大表上用近似统计代替全表扫描
+        
+        Returns:
+            {'table', 'seconds'}
+        """
+        self._end_implicit_transaction('analyze')
+        started = time.perf_counter()
+        if analysis_limit is not None:
+            self.conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}").fetchall()
+        self.conn.execute(f"ANALYZE {table_name}" if table_name else "ANALYZE")
+        self.conn.commit()
+        result = {'table': table_name, 'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('analyze', target=f"表 '{table_name}' " if table_name else '全部表',
+                             seconds=result['seconds'])
+        return result
+    
+    def optimize(self) -> Dict[str, Any]:
+        """
+        执行 PRAGMA optimize：只对统计信息可能过期的表重新分析，
+        适合在长连接关闭前或定期执行，代价通常很小
+        
+        Returns:
+            {'seconds'}
+        """
+        self._end_implicit_transaction('optimize')
+        started = time.perf_counter()
+        self.conn.execute("PRAGMA optimize").fetchall()
+        self.conn.commit()
+        result = {'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('optimize', seconds=result['seconds'])
+        return result
+    
+    def _fts_meta(self, fts_name: str) -> Dict[str, Any]:
+        """读取全文索引的元数据（源表、列、同步方式、已索引到的 rowid）"""
+        row = None
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_META_TABLE,)).fetchone():
+            row = self.conn.execute(
+                f"SELECT source, columns, triggers, last_rowid FROM {FTS_META_TABLE} WHERE name = ?",
+                (fts_name,)).fetchone()
+        if row is None:
+            raise ValueError(f"全文索引不存在: {fts_name}（先执行 fts_create）")
+        return {'source': row[0], 'columns': row[1].split(','), 'triggers': bool(row[2]),
+                'last_rowid': row[3]}
+    
+    def fts_create(self, table_name: str, columns: Any, fts_name: Optional[str] = None,
+                   tokenizer: Optional[str] = None, triggers: bool = True) -> str:
+        """
+        为已有表的文本列创建 FTS5 全文索引
+        
+        索引是外部内容（external content）表：只保存倒排索引，不复制文本，
+        命中的行通过 rowid 回源表读取。创建后立即为现有数据建立索引。
+        
+        Args:
+            table_name: 源表名（需要有 rowid，不支持 WITHOUT ROWID 表）
+            columns: 要索引的文本列，列表或逗号分隔的字符串
+            fts_name: 全文索引表名，默认为 <表名>_fts
+            tokenizer: FTS5 分词器，如 "unicode61"（默认）、"porter unicode61"，
+                       中文等没有空格分词的文本可用 "trigram"（按三字符子串匹配）
+            triggers: 是否创建触发器，让源表的增删改自动同步到索引；
+                      设为 False 时由调用方用 fts_index 重建或追加，适合批量写入的日志表
+        
+        Returns:
+            全文索引表名
+        """
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+        if not columns:
+            raise ValueError("fts_create 需要至少一个文本列")
+        fts_name = fts_name or f"{table_name}_fts"
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f"new.{column}" for column in columns)
+        old_values = ', '.join(f"old.{column}" for column in columns)
+        options = f", tokenize = '{tokenizer}'" if tokenizer else ''
+        
+        with self.transaction():
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {FTS_META_TABLE} ("
+                              "name TEXT PRIMARY KEY, source TEXT NOT NULL, columns TEXT NOT NULL, "
+                              "triggers INTEGER NOT NULL, last_rowid INTEGER)")
+            self.conn.execute(f"CREATE VIRTUAL TABLE {fts_name} USING fts5("
+                              f"{column_list}, content = '{table_name}', content_rowid = 'rowid'{options})")
+            if triggers:
+                self.conn.execute(
+                    f"CREATE TRIGGER {fts_name}_ai AFTER INSERT ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name} (rowid, {column_list}) VALUES (new.rowid, {new_values}); END")
+                self.conn.execute(
+                    f"CREATE TRIGGER {fts_name}_ad AFTER DELETE ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name} ({fts_name}, rowid, {column_list}) "
+                    f"VALUES ('delete', old.rowid, {old_values}); END")
+                self.conn.execute(
+                    f"CREATE TRIGGER {fts_name}_au AFTER UPDATE OF {column_list} ON {table_name} BEGIN "
+                    f"INSERT INTO {fts_name} ({fts_name}, rowid, {column_list}) "
+                    f"VALUES ('delete', old.rowid, {old_values}); "
+                    f"INSERT INTO {fts_name} (rowid, {column_list}) VALUES (new.rowid, {new_values}); END")
+            self.conn.execute(f"INSERT INTO {fts_name} ({fts_name}) VALUES ('rebuild')")
+            last_rowid = self.conn.execute(f"SELECT MAX(rowid) FROM {table_name}").fetchone()[0]
+            self.conn.execute(f"INSERT INTO {FTS_META_TABLE} VALUES (?, ?, ?, ?, ?)",
+                              (fts_name, table_name, ','.join(columns), int(triggers), last_rowid))
+        self.reporter.report('fts_create', fts=fts_name, table=table_name, columns=column_list)
+        return fts_name
+    
+    def fts_index(self, fts_name: str, mode: str = 'rebuild') -> Dict[str, Any]:
         """
-        初始化数据库连接
+        维护全文索引
+        
+        Args:
+            fts_name: 全文索引表名
+            mode: rebuild 按源表全部重建；append 只索引上次之后新增的行
+                  （rowid 大于上次记录的最大值，适合只追加的表，仅用于未创建触发器的索引）；
+                  optimize 把索引的多个段合并为一个，加快后续查询
+        
+        Returns:
+            {'fts', 'mode', 'rows', 'seconds'}，rows 为本次新索引的行数（optimize 为 0）
+        """
+        if mode not in FTS_INDEX_MODES:
+            raise ValueError(f"未知的模式: {mode}，可选: {', '.join(FTS_INDEX_MODES)}")
+        meta = self._fts_meta(fts_name)
+        if mode == 'append' and meta['triggers']:
+            raise ValueError(f"{fts_name} 已由触发器同步，不需要 append")
+        started = time.perf_counter()
+        source, column_list = meta['source'], ', '.join(meta['columns'])
+        rows = 0
+        with self.transaction():
+            last_rowid = self.conn.execute(f"SELECT MAX(rowid) FROM {source}").fetchone()[0]
+            if mode == 'rebuild':
+                self.conn.execute(f"INSERT INTO {fts_name} ({fts_name}) VALUES ('rebuild')")
+                rows = self.conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+            elif mode == 'append':
+                cursor = self.conn.execute(
+                    f"INSERT INTO {fts_name} (rowid, {column_list}) "
+                    f"SELECT rowid, {column_list} FROM {source} WHERE rowid > ? AND rowid <= ?",
+                    (meta['last_rowid'] if meta['last_rowid'] is not None else -(1 << 63), last_rowid))
+                rows = cursor.rowcount
+            else:
+                self.conn.execute(f"INSERT INTO {fts_name} ({fts_name}) VALUES ('optimize')")
+            if mode != 'optimize':
+                self.conn.execute(f"UPDATE {FTS_META_TABLE} SET last_rowid = ? WHERE name = ?",
+                                  (last_rowid, fts_name))
+        result = {'fts': fts_name, 'mode': mode, 'rows': rows,
+                  'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('fts_index', **result)
+        return result
+    
+    def search(self, fts_name: str, text: str, columns: str = "*",
+               limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0,
+               fts_syntax: bool = False, snippet_tokens: int = 16,
+               highlight: tuple = ('[', ']'), where: Optional[str] = None,
+               params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        全文搜索，按 bm25 相关度排序，返回源表的行以及 rank、snippet
+        
+        Args:
+            fts_name: 全文索引表名
+            text: 搜索内容。默认按空白拆分为多个词，每个词作为短语匹配，全部命中才返回；
+                  fts_syntax=True 时按 FTS5 查询语法解析（AND/OR/NOT、"短语"、前缀*、NEAR、列名:词）
+            columns: 返回的源表列（列名带 t. 前缀也可以），默认全部
+            limit: 每页行数
+            offset: 跳过的行数，用于翻页
+            fts_syntax: 是否把 text 作为 FTS5 查询语法
+            snippet_tokens: 摘要最多包含的词数，0 表示不生成摘要
+            highlight: 摘要中命中词前后插入的标记
+            where: 对源表的额外过滤条件（源表别名为 t）
+            params: where 的参数
+        
+        Returns:
+            字典列表，每行包含请求的列、snippet 和 rank（FTS5 内置的 bm25 得分，越小越相关）
+        """
+        meta = self._fts_meta(fts_name)
+        if not fts_syntax:
+            terms = text.split()
+            if not terms:
+                raise ValueError("搜索内容不能为空")
+            text = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        started = time.perf_counter()
+        names = [column.strip() for column in columns.split(',') if column.strip()]
+        select = ', '.join(name if name.startswith('t.') else f"t.{name}" for name in names)
+        if snippet_tokens:
+            select += (f", snippet({fts_name}, -1, ?, ?, '…', {int(snippet_tokens)}) AS snippet")
+        sql = (f"SELECT {select}, {fts_name}.rank AS rank FROM {fts_name} "
+               f"JOIN {meta['source']} AS t ON t.rowid = {fts_name}.rowid "
+               f"WHERE {fts_name} MATCH ?{f' AND ({where})' if where else ''} "
+               f"ORDER BY {fts_name}.rank LIMIT ? OFFSET ?")
+        bind = (tuple(highlight) if snippet_tokens else ()) + (text,) + tuple(params or ()) + (limit, offset)
+        cursor = self._cursor_for('dict')
+        cursor.execute(sql, bind)
+        results = fetch_results(cursor, 'dict')
+        self._record_statement('search', sql, bind, started, len(results))
+        self.reporter.report('search', fts=fts_name, rows=len(results))
+        return results
+    
+    def _matview_meta(self, view_name: str) -> Dict[str, Any]:
+        """读取物化视图的定义和水位"""
+        row = None
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (MATVIEW_META_TABLE,)).fetchone():
+            row = self.conn.execute(f"SELECT * FROM {MATVIEW_META_TABLE} WHERE name = ?",
+                                    (view_name,)).fetchone()
+        if row is None:
+            raise ValueError(f"物化视图不存在: {view_name}（先执行 create_matview）")
+        meta = dict(row)
+        meta['group_by'] = tuple(json.loads(meta['group_by']))
+        meta['aggregates'] = tuple(json.loads(meta['aggregates']))
+        meta['params'] = json.loads(meta['params'])
+        return meta
+    
+    def _matview_select(self, meta: Dict[str, Any], lower: Any = None, upper: Any = None) -> tuple:
+        """生成物化视图的 SELECT 语句和参数，lower/upper 为水位列的范围 (lower, upper]"""
+        if meta['sql']:
+            return meta['sql'], meta['params']
+        conditions = [f"({meta['where_clause']})"] if meta['where_clause'] else []
+        params = list(meta['params'])
+        watermark_column = meta['watermark_column']
+        if watermark_column:
+            conditions.append(f"{watermark_column} <= ?")
+            params.append(upper)
+            if lower is not None:
+                conditions.append(f"{watermark_column} > ?")
+                params.append(lower)
+        sql = build_aggregate_sql(meta['source'], meta['group_by'], meta['aggregates'],
+                                  ' AND '.join(conditions) or None)
+        return sql, params
+    
+    def create_matview(self, view_name: str, table_name: Optional[str] = None,
+                       group_by: Any = None, aggregates: Any = ('count',),
+                       where: Optional[str] = None, params: Optional[list] = None,
+                       watermark_column: Optional[str] = 'rowid',
+                       sql: Optional[str] = None) -> Dict[str, Any]:
+        """
+        创建物化视图：把聚合查询的结果保存为一张普通的表，并立即计算一次
+        
+        定义方式与 aggregate 相同（分组列 + 聚合规格）。聚合全部为
+        count/sum/total/min/max 时，refresh 只处理水位列大于上次水位的新行，
+        把新行的聚合结果合并进已有的分组；包含 avg、count_distinct、分位数，
+        或者用 sql 直接给出 SELECT 时，refresh 总是全部重算。
+        
+        Args:
+            view_name: 物化视图（结果表）名
+            table_name: 源表名
+            group_by: 分组列，列表或逗号分隔的字符串；表达式需要别名，如 "day=date(ts)"
+            aggregates: 聚合规格，见 parse_aggregate_spec
+            where: 源表的过滤条件
+            params: where 的参数
+            watermark_column: 水位列，新行的值必须比已有行都大（如自增主键、rowid、
+                              插入时间戳），值为 NULL 的行不会被统计；None 表示只能全部重算
+            sql: 直接指定 SELECT 语句（代替 table_name/group_by/aggregates/where），只能全部重算
+        
+        Returns:
+            第一次计算的结果，同 refresh_matview
+        """
+        if not sql and not table_name:
+            raise ValueError("create_matview 需要源表或 SELECT 语句")
+        group_by = _column_tuple(group_by) or ()
+        if isinstance(aggregates, str):
+            aggregates = [spec for spec in aggregates.split(',') if spec.strip()]
+        keys = [parse_group_item(item)[0] for item in group_by]
+        for key in keys:
+            if not re.match(r'^[A-Za-z_]\w*$', key):
+                raise ValueError(f"分组表达式 {key} 需要别名，如 day=date(ts)")
+        
+        with self.transaction():
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {MATVIEW_META_TABLE} ("
+                              "name TEXT PRIMARY KEY, source TEXT, group_by TEXT NOT NULL, "
+                              "aggregates TEXT NOT NULL, where_clause TEXT, params TEXT NOT NULL, "
+                              "sql TEXT, watermark_column TEXT, watermark, refreshed_at REAL)")
+            if self.conn.execute(f"SELECT 1 FROM {MATVIEW_META_TABLE} WHERE name = ?", (view_name,)).fetchone():
+                raise ValueError(f"物化视图已存在: {view_name}")
+            self.conn.execute(f"INSERT INTO {MATVIEW_META_TABLE} (name, source, group_by, aggregates, "
+                              "where_clause, params, sql, watermark_column) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (view_name, table_name, json.dumps(list(group_by)), json.dumps(list(aggregates)),
+                               where, json.dumps(list(params or [])), sql,
+                               None if sql else watermark_column))
+            select_sql, select_params = self._matview_select(self._matview_meta(view_name))
+            self.conn.execute(f"CREATE TABLE {view_name} AS SELECT * FROM ({select_sql}) WHERE 0",
+                              select_params)
+            if keys and not sql:
+                self.conn.execute(f"CREATE UNIQUE INDEX {index_name_for(view_name, keys)} "
+                                  f"ON {view_name} ({', '.join(keys)})")
+            result = self.refresh_matview(view_name, full=True)
+        self.reporter.report('create_matview', view=view_name)
+        return result
+    
+    def refresh_matview(self, view_name: str, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新物化视图
+        
+        可以增量刷新时，只聚合水位列在 (上次水位, 当前最大值] 之间的新行，按分组合并
+        （count/sum/total 相加，min/max 取较小/较大者），代价与新增的行数成正比；
+        否则（或 full=True）清空结果表后全部重算。整个刷新在一个事务中完成。
+        
+        Args:
+            view_name: 物化视图名
+            full: 强制全部重算（源表有更新或删除后使用）
+        
+        Returns:
+            {'view', 'mode', 'groups', 'watermark', 'seconds'}，mode 为 incremental 或 full，
+            groups 为本次写入或合并的分组数
+        """
+        started = time.perf_counter()
+        meta = self._matview_meta(view_name)
+        merge_rules = [aggregate_merge_rule(spec) for spec in meta['aggregates']]
+        incremental = (not full and not meta['sql'] and meta['watermark_column'] is not None
+                       and meta['watermark'] is not None and all(merge_rules))
+        
+        with self.transaction():
+            watermark = None
+            if meta['watermark_column']:
+                watermark = self.conn.execute(
+                    f"SELECT MAX({meta['watermark_column']}) FROM {meta['source']}").fetchone()[0]
+            if incremental:
+                groups = 0
+                if watermark is not None and watermark != meta['watermark']:
+                    groups = self._merge_matview(view_name, meta, merge_rules, watermark)
+            else:
+                self.conn.execute(f"DELETE FROM {view_name}")
+                select_sql, select_params = self._matview_select(meta, upper=watermark)
+                groups = self.conn.execute(f"INSERT INTO {view_name} {select_sql}", select_params).rowcount
+            self.conn.execute(f"UPDATE {MATVIEW_META_TABLE} SET watermark = ?, refreshed_at = ? WHERE name = ?",
+                              (watermark, time.time(), view_name))
+        
+        result = {'view': view_name, 'mode': 'incremental' if incremental else 'full', 'groups': groups,
+                  'watermark': watermark, 'seconds': round(time.perf_counter() - started, 3)}
+        self.reporter.report('refresh_matview', **result)
+        return result
+    
+    def _merge_matview(self, view_name: str, meta: Dict[str, Any], merge_rules: List[str],
+                       watermark: Any) -> int:
+        """
+        把 (上次水位, watermark] 之间新行的聚合结果合并进结果表，返回合并的分组数
+        
+        新行的聚合结果先写入临时表，已有的分组用 UPDATE ... FROM（SQLite 3.33 之前用相关子查询）
+        合并，其余作为新分组插入。
+        分组键用 IS 匹配：唯一索引把 NULL 视为互不相同，ON CONFLICT 不会合并 NULL 分组。
+        """
+        select_sql, select_params = self._matview_select(meta, meta['watermark'], watermark)
+        keys = [parse_group_item(item)[0] for item in meta['group_by']]
+        aliases = [parse_aggregate_spec(spec)[0] for spec in meta['aggregates']]
+        delta = f"temp._matview_delta_{view_name}"
+        self.conn.execute(f"DROP TABLE IF EXISTS {delta}")
+        self.conn.execute(f"CREATE TABLE {delta} AS {select_sql}", select_params)
+        try:
+            # 不分组时结果表只有一行，条件为空，直接合并到这一行
+            match = ' AND '.join(f"{view_name}.{key} IS d.{key}" for key in keys) or '1'
+            merged = [(alias, rule.format(old=f"{view_name}.{alias}", new=f"d.{alias}"))
+                      for alias, rule in zip(aliases, merge_rules)]
+            if sqlite3.sqlite_version_info >= (3, 33, 0):
+                assignments = ', '.join(f"{alias} = {expression}" for alias, expression in merged)
+                sql = f"UPDATE {view_name} SET {assignments} FROM {delta} AS d WHERE {match}"
+            else:
+                # 3.33 之前没有 UPDATE ... FROM，改用相关子查询；子查询按分组键查找新行，需要索引
+                if keys:
+                    self.conn.execute(f"CREATE INDEX {delta}_keys ON _matview_delta_{view_name} "
+                                      f"({', '.join(keys)})")
+                assignments = ', '.join(f"{alias} = (SELECT {expression} FROM {delta} AS d WHERE {match})"
+                                        for alias, expression in merged)
+                sql = (f"UPDATE {view_name} SET {assignments} "
+                       f"WHERE EXISTS (SELECT 1 FROM {delta} AS d WHERE {match})")
+            groups = self.conn.execute(sql).rowcount
+            columns = ', '.join(keys + aliases)
+            groups += self.conn.execute(
+                f"INSERT INTO {view_name} ({columns}) SELECT {columns} FROM {delta} AS d "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {view_name} WHERE {match})").rowcount
+        finally:
+            self.conn.execute(f"DROP TABLE {delta}")
+        return groups
+    
+    def list_matviews(self) -> List[Dict[str, Any]]:
+        """
+        列出物化视图
+        
+        Returns:
+            [{'name', 'source', 'group_by', 'aggregates', 'where', 'sql', 'watermark_column',
+              'watermark', 'refreshed_at', 'incremental'}]
+        """
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (MATVIEW_META_TABLE,)).fetchone():
+            return []
+        views = []
+        for (name,) in self.conn.execute(f"SELECT name FROM {MATVIEW_META_TABLE} ORDER BY name").fetchall():
+            meta = self._matview_meta(name)
+            views.append({
+                'name': name, 'source': meta['source'], 'group_by': list(meta['group_by']),
+                'aggregates': list(meta['aggregates']), 'where': meta['where_clause'], 'sql': meta['sql'],
+                'watermark_column': meta['watermark_column'], 'watermark': meta['watermark'],
+                'refreshed_at': meta['refreshed_at'],
+                'incremental': bool(not meta['sql'] and meta['watermark_column']
+                                    and all(aggregate_merge_rule(spec) for spec in meta['aggregates'])),
+            })
+        return views
+    
+    def drop_matview(self, view_name: str):
+        """删除物化视图（结果表和定义）"""
+        self._matview_meta(view_name)
+        with self.transaction():
+            self.conn.execute(f"DROP TABLE IF EXISTS {view_name}")
+            self.conn.execute(f"DELETE FROM {MATVIEW_META_TABLE} WHERE name = ?", (view_name,))
+        self.reporter.report('drop_matview', view=view_name)
+    
+    def sql_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取 SQL 字符串缓存的命中统计，见 sql_cache_info()"""
+        return sql_cache_info()
+    
+    def _tables_read(self, sql: str, params: Any) -> tuple:
+        """
+        语句读取的表名（小写），通过授权回调在编译 EXPLAIN 时收集，按 SQL 缓存
+        
+        视图会展开为其底层表，子查询和 JOIN 中的表也都包含在内。
+        """
+        tables = self._sql_tables.get(sql)
+        if tables is not None:
+            return tables
+        found = set()
+        
+        def authorizer(action, arg1, arg2, db_name, source):
+            if action == sqlite3.SQLITE_READ and arg1 and not arg1.startswith('sqlite_'):
+                found.add(arg1.lower())
+            return sqlite3.SQLITE_OK
+        
+        self.conn.set_authorizer(authorizer)
+        try:
+            self.conn.execute(f"EXPLAIN {sql}", params).fetchall()
+        finally:
+            self.conn.set_authorizer(None)
+        tables = self._sql_tables[sql] = tuple(sorted(found))
+        return tables
+    
+    def _touch_table(self, table_name: str, rows: int):
+        """
+        记录对某个表的写入，使读取该表的缓存结果失效
+        
+        total_changes 的增量与本次写入的行数不一致时（触发器、其他
+        途径的写入），无法确定受影响的表，让全部缓存失效。
+        """
+        if self.result_cache is None:
+            return
+        table = table_name.lower()
+        self._table_versions[table] = self._table_versions.get(table, 0) + 1
+        if self.conn.total_changes != self._seen_changes + max(rows, 0):
+            self._cache_epoch += 1
+        self._seen_changes = self.conn.total_changes
+    
+    def _cache_lookup(self, sql: str, params: Optional[tuple], row_format: str) -> tuple:
+        """
+        查找缓存的查询结果
+        
+        Returns:
+            (缓存键, 数据状态, 结果)；结果为 None 表示未命中，未开启缓存时缓存键也为 None
+        """
+        if self.result_cache is None or row_format == 'row':
+            return None, None, None
+        normalized = ' '.join(sql.split())
+        params = params or ()
+        bound = tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params)
+        key = (self._cache_database, normalized, bound, row_format)
+        if self.conn.total_changes != self._seen_changes:
+            self._cache_epoch += 1
+            self._seen_changes = self.conn.total_changes
+        # data_version 在其他连接提交后变化，本连接的写入由表版本号和 epoch 反映
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        try:
+            tables = self._tables_read(normalized, params)
+        except sqlite3.Error:
+            return None, None, None
+        stamp = (data_version, self._cache_epoch,
+                 tuple((table, self._table_versions.get(table, 0)) for table in tables))
+        blob = self.result_cache.get(key, stamp, self._cache_fingerprint())
+        return key, stamp, (pickle.loads(blob) if blob is not None else None)
+    
+    def _cache_store(self, key: Optional[tuple], stamp: tuple, results: Any):
+        """把查询结果写入缓存（未开启缓存时 key 为 None）"""
+        if key is None:
+            return
+        blob = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        self.result_cache.put(key, stamp, blob, self._cache_fingerprint(), self._cache_database)
+    
+    def _cache_fingerprint(self) -> Optional[str]:
+        """磁盘缓存使用的数据库文件指纹；有未提交的写入时不使用磁盘缓存"""
+        if self.result_cache.path is None or self.conn.in_transaction:
+            return None
+        return file_fingerprint(self.db_path)
+    
+    def result_cache_stats(self) -> Dict[str, int]:
+        """查询结果缓存的统计，未开启缓存时返回空字典"""
+        return self.result_cache.stats() if self.result_cache is not None else {}
+    
+    def _record_statement(self, operation: str, sql: str, params: Any,
+                          started: float, rows: int):
+        """
+        记录一条语句的耗时和行数（未开启 instrument 时直接返回）
+        
+        相同操作和 SQL 的语句合并统计；执行计划只在第一次遇到时获取。
+        """
+        if not self.instrument:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        key = (operation, sql)
+        stat = self._stats.get(key)
+        if stat is None:
+            plan = None
+            if self.explain_plans and not sql.lstrip().upper().startswith('EXPLAIN'):
+                try:
+                    plan = self.explain(sql, tuple(params) if params else None)
+                except sqlite3.Error:
+                    plan = []
+            stat = self._stats[key] = {'operation': operation, 'sql': sql, 'count': 0,
+                                       'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'plan': plan}
+        stat['count'] += 1
+        stat['total_ms'] += elapsed_ms
+        stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+        stat['rows'] += max(rows, 0)
+        if self._stats_fp:
+            record = {'ts': time.time(), 'operation': operation, 'sql': sql,
+                      'ms': round(elapsed_ms, 3), 'rows': rows}
+            if stat['plan'] is not None:
+                record['plan'] = stat['plan']
+            self._stats_fp.write(json_dumps(record))
+            self._stats_fp.write('\n')
+    
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """
+        获取语句统计（需要开启 instrument）
+        
+        Returns:
+            按总耗时降序排列的列表，每项包含 operation、sql、count、total_ms、
+            avg_ms、max_ms、rows 和 plan（未开启 explain_plans 时为 None）
+        """
+        stats = [dict(stat, avg_ms=stat['total_ms'] / stat['count']) for stat in self._stats.values()]
+        return sorted(stats, key=lambda item: item['total_ms'], reverse=True)
+    
+    def reset_stats(self):
+        """清空语句统计"""
+        self._stats.clear()
+    
+    def _record_shape(self, operation: str, table_name: str, columns: Optional[str],
+                      where: Optional[str], order_by: Optional[str], params: Optional[tuple]):
+        """记录一次调用的查询形态（表、列、WHERE、ORDER BY），同一形态只累加次数"""
+        if not self.record_workload or not (where or order_by):
+            return
+        key = (table_name, columns, where, order_by)
+        shape = self.workload.get(key)
+        if shape is None:
+            if len(self.workload) >= WORKLOAD_MAX_SHAPES:
+                return
+            shape = self.workload[key] = {'count': 0, 'params': list(params or ()), 'operations': []}
+        shape['count'] += 1
+        if operation not in shape['operations']:
+            shape['operations'].append(operation)
+    
+    def save_workload(self, path: str):
+        """把记录的查询形态保存为 JSON 文件，供之后的进程分析"""
+        shapes = [{'table': table, 'columns': columns, 'where': where, 'order_by': order_by, **shape}
+                  for (table, columns, where, order_by), shape in self.workload.items()]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json_dumps(shapes, pretty=True))
+            f.write('\n')
+    
+    def load_workload(self, path: str):
+        """从 JSON 文件加载查询形态，与当前记录合并"""
+        with open(path, 'r', encoding='utf-8') as f:
+            shapes = json.load(f)
+        for item in shapes:
+            key = (item['table'], item.get('columns'), item.get('where'), item.get('order_by'))
+            shape = self.workload.setdefault(key, {'count': 0, 'params': item.get('params') or [],
+                                                   'operations': []})
+            shape['count'] += item.get('count', 1)
+            for operation in item.get('operations', []):
+                if operation not in shape['operations']:
+                    shape['operations'].append(operation)
+    
+    def explain(self, sql: str, params: Optional[tuple] = None) -> List[str]:
+        """
+        获取语句的执行计划
+        
+        Args:
+            sql: SQL 语句
+            params: SQL 参数，未提供时按占位符个数绑定 NULL
+        
+        Returns:
+            EXPLAIN QUERY PLAN 每一步的描述
+        """
+        if params is None:
+            params = [None] * sql.count('?')
+        rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[3] for row in rows]
+    
+    def create_index(self, table_name: str, columns: Any, index_name: Optional[str] = None,
+                     unique: bool = False) -> str:
+        """
+        创建索引
+        
+        Args:
+            table_name: 表名
+            columns: 索引列，列表或逗号分隔的字符串（可带 ASC/DESC）
+            index_name: 索引名，默认为 idx_<表名>_<列名>
+            unique: 是否为唯一索引
+        
+        Returns:
+            索引名
+        """
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+        if not columns:
+            raise ValueError("create_index 需要至少一个索引列")
+        index_name = index_name or index_name_for(table_name, [column.split()[0] for column in columns])
+        unique_clause = 'UNIQUE ' if unique else ''
+        sql = (f"CREATE {unique_clause}INDEX IF NOT EXISTS {index_name} "
+               f"ON {table_name} ({', '.join(columns)})")
+        self.cursor.execute(sql)
+        self._after_write()
+        self.reporter.report('create_index', table=table_name, index=index_name)
+        return index_name
+    
+    def list_indexes(self, table_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        列出索引
+        
+        Args:
+            table_name: 只列出该表的索引，默认列出全部
+        
+        Returns:
+            [{'table', 'name', 'unique', 'origin', 'columns'}]，origin 为
+            c（CREATE INDEX 创建）、u（UNIQUE 约束）或 pk（主键）
+        """
+        tables = self.schema_catalog()['tables']
+        names = [table_name] if table_name is not None else sorted(tables)
+        return [{'table': name, 'name': index['name'], 'unique': index['unique'],
+                 'origin': index['origin'], 'columns': list(index['columns'])}
+                for name in names if name in tables for index in tables[name]['indexes']]
+    
+    def advise_indexes(self, apply: bool = False) -> List[Dict[str, Any]]:
+        """
+        分析记录的查询形态，找出全表扫描和临时排序，给出索引建议
+        
+        对每种形态执行 EXPLAIN QUERY PLAN；有问题的形态根据 WHERE 和
+        ORDER BY 推断索引列（查询指定了列时尽量建成覆盖索引），
+        已有索引能覆盖的建议会被跳过。
+        
+        Args:
+            apply: 是否直接创建建议的索引
+        
+        Returns:
+            索引建议列表 [{'table', 'columns', 'covering', 'sql', 'count',
+            'operations', 'plan', 'example', 'applied'}]
+        """
+        suggestions: Dict[tuple, Dict[str, Any]] = {}
+        table_columns: Dict[str, List[str]] = {}
+        existing: Dict[str, List[List[str]]] = {}
+        analyzed = 0
+        
+        for (table, columns, where, order_by), shape in self.workload.items():
+            if table not in table_columns:
+                table_columns[table] = [info['name'] for info in self.get_table_info(table)]
+                existing[table] = [index['columns'] for index in self.list_indexes(table)]
+            if not table_columns[table]:
+                continue
+            sql = build_select_sql(table, columns or "*", where, order_by)
+            params = shape['params'] if len(shape['params']) == sql.count('?') else None
+            try:
+                plan = self.explain(sql, params)
+            except sqlite3.Error:
+                continue
+            analyzed += 1
+            issues = plan_issues(plan)
+            if not issues:
+                continue
+            
+            index_columns = suggest_index_columns(where, order_by, table_columns[table])
+            if not index_columns:
+                continue
+            covering = False
+            if columns and columns.strip() != '*':
+                selected = suggest_index_columns(None, columns, table_columns[table])
+                extra = [column for column in selected if column not in index_columns]
+                if len(selected) == len([c for c in columns.split(',') if c.strip()]) and \
+                        len(index_columns) + len(extra) <= COVERING_INDEX_MAX_COLUMNS:
+                    index_columns += extra
+                    covering = True
+            if any(cols[:len(index_columns)] == index_columns for cols in existing[table]):
+                continue
+            
+            key = (table, tuple(index_columns))
+            suggestion = suggestions.get(key)
+            if suggestion is None:
+                name = index_name_for(table, index_columns)
+                suggestion = suggestions[key] = {
+                    'table': table, 'columns': index_columns, 'covering': covering,
+                    'sql': f"CREATE INDEX {name} ON {table} ({', '.join(index_columns)})",
+                    'count': 0, 'operations': [], 'plan': issues, 'example': sql,
+                    'applied': False}
+            suggestion['count'] += shape['count']
+            for operation in shape['operations']:
+                if operation not in suggestion['operations']:
+                    suggestion['operations'].append(operation)
+        
+        # 一个索引是另一个索引的前缀时，只保留较长的那个
+        for key, suggestion in list(suggestions.items()):
+            table, columns = key
+            wider = next((other for (other_table, other_columns), other in suggestions.items()
+                          if other_table == table and len(other_columns) > len(columns)
+                          and other_columns[:len(columns)] == columns), None)
+            if wider is not None:
+                wider['count'] += suggestion['count']
+                wider['operations'] += [op for op in suggestion['operations']
+                                        if op not in wider['operations']]
+                wider['plan'] += [step for step in suggestion['plan'] if step not in wider['plan']]
+                del suggestions[key]
+        
+        results = sorted(suggestions.values(), key=lambda item: item['count'], reverse=True)
+        self.reporter.report('advise_indexes', shapes=analyzed, suggestions=len(results))
+        if apply:
+            for suggestion in results:
+                self.create_index(suggestion['table'], suggestion['columns'])
+                suggestion['applied'] = True
+        return results
+    
+    def schema_catalog(self) -> Dict[str, Any]:
+        """
+        获取数据库结构目录：全部表和视图的列、索引和外键
+        
+        目录一次加载后缓存在连接上，之后每次调用只读取 PRAGMA schema_version，
+        本连接或其他连接修改了结构时才重新加载。返回的目录是共享的，不要修改。
+        
+        Returns:
+            {'schema_version', 'tables': {表名: {'type', 'sql', 'columns',
+            'indexes', 'foreign_keys'}}}。columns 的每一项同 PRAGMA table_xinfo
+            （hidden 非 0 的是虚拟表的隐藏列或生成列），indexes 的每一项为
+            {'name', 'unique', 'origin', 'partial', 'columns'}，foreign_keys
+            的每一项同 PRAGMA foreign_key_list
+        """
+        version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+        if self._schema is None or self._schema['schema_version'] != version:
+            self._load_schema(version)
+        return self._schema
+    
+    def _load_schema(self, version: int):
+        """用三条语句读取全部表的列、索引和外键，并建立不区分大小写的名称索引"""
+        tables: Dict[str, Dict[str, Any]] = {}
+        for row in self.conn.execute(
+                "SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view')"):
+            tables[row['name']] = {'type': row['type'], 'sql': row['sql'],
+                                   'columns': [], 'indexes': [], 'foreign_keys': []}
+        
+        for kind, template in SCHEMA_QUERIES.items():
+            try:
+                rows = self.conn.execute(template.format(tables=SCHEMA_ALL_TABLES)).fetchall()
+            except sqlite3.Error:
+                # 视图引用了已删除的表、虚拟表的模块未加载时整条语句会失败，改为逐表读取并跳过出错的表
+                rows = []
+                for name in tables:
+                    try:
+                        rows += self.conn.execute(template.format(tables="(SELECT ? AS name)"),
+                                                  (name,)).fetchall()
+                    except sqlite3.Error:
+                        continue
+            for row in rows:
+                entry = tables[row['table_name']]
+                if kind == 'indexes':
+                    if not entry['indexes'] or entry['indexes'][-1]['name'] != row['index_name']:
+                        entry['indexes'].append({
+                            'name': row['index_name'], 'unique': bool(row['is_unique']),
+                            'origin': row['origin'], 'partial': bool(row['partial']), 'columns': []})
+                    entry['indexes'][-1]['columns'].append(row['column_name'])
+                else:
+                    item = dict(row)
+                    del item['table_name']
+                    entry[kind].append(item)
+        
+        self._schema = {'schema_version': version, 'tables': tables}
+        self._schema_names = {
+            name.lower(): (name, frozenset(column['name'].lower() for column in entry['columns']))
+            for name, entry in tables.items()}
+    
+    def _check_identifiers(self, table_name: str, columns: Iterable[str] = ()):
+        """
+        构建 SQL 之前检查表名和列名是否存在
+        
+        先用缓存的目录检查，不读取 schema_version；只有找不到名称时才确认目录
+        是否过期并重新检查，所以热路径上只是几次字典查找。带引号的表名和列名
+        （"..."、`...`、[...]）按去掉引号后的名称检查。只检查目录中描述的表
+        （main 库的表和视图）的列：目录中没有的表（sqlite_master 等系统表、
+        临时表、ATTACH 的库中的表、真正不存在的表）、带库名的表名、JOIN
+        以及不是标识符的列都不检查，交给 SQLite 处理。
+        
+        Raises:
+            ValueError: 目录中的表没有该列
+        """
+        table_name = unquote_identifier(table_name)
+        if table_name is None:
+            return
+        columns = tuple(name for name in map(unquote_identifier, columns) if name is not None)
+        if self._schema is None:
+            self.schema_catalog()
+        if self._identifier_error(table_name, columns) is None:
+            return
+        self.schema_catalog()
+        error = self._identifier_error(table_name, columns)
+        if error:
+            raise ValueError(error)
+    
+    def _identifier_error(self, table_name: str, columns: tuple) -> Optional[str]:
+        """
+        按缓存的目录返回第一个不存在的列的错误信息，全部存在时返回 None
+        
+        目录中没有该表时返回空字符串：无法判断，由调用方决定是否重新加载目录
+        """
+        entry = self._schema_names.get(table_name.lower())
+        if entry is None:
+            return ''
+        name, known = entry
+        for column in columns:
+            lowered = column.lower()
+            if lowered not in known and lowered not in ROWID_ALIASES:
+                return f"列不存在: {name}.{column}"
+        return None
+    
+    @staticmethod
+    def _selected_columns(columns: str) -> tuple:
+        """查询的列全部是列名（可带引号）时返回这些列名，含表达式、别名或 * 时返回空元组（不检查）"""
+        names = [column.strip() for column in columns.split(',')]
+        if not all(unquote_identifier(name) is not None for name in names):
+            return ()
+        return tuple(name for name in names if name.lower() not in SQL_LITERAL_WORDS)
+    
+    def describe(self, table_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        导出数据库结构，可直接序列化为 JSON
+        
+        Args:
+            table_name: 只导出该表，默认导出全部表和视图
+        
+        Returns:
+            {'database', 'schema_version', 'tables': {...}}，tables 的格式见 schema_catalog
+        
+        Raises:
+            ValueError: 指定的表不存在
+        """
+        catalog = self.schema_catalog()
+        tables = catalog['tables']
+        if table_name is not None:
+            name = self._schema_names.get(table_name.lower(), (None,))[0]
+            if name is None:
+                raise ValueError(f"表不存在: {table_name}")
+            tables = {name: tables[name]}
+        return {'database': self.db_path, 'schema_version': catalog['schema_version'],
+                'tables': json.loads(json.dumps(tables))}
+    
+    def get_tables(self) -> List[str]:
+        """获取数据库中所有表名"""
+        return [name for name, entry in self.schema_catalog()['tables'].items() if entry['type'] == 'table']
+    
+    def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
+        """获取表结构信息（同 PRAGMA table_info，不包含隐藏列和生成列）"""
+        entry = self.schema_catalog()['tables'].get(table_name)
+        if entry is None:
+            # 临时表、带库名的表不在目录中
+            self.cursor.execute(f"PRAGMA table_info({table_name})")
+            return [dict(row) for row in self.cursor.fetchall()]
+        return [{key: value for key, value in column.items() if key != 'hidden'}
+                for column in entry['columns'] if not column['hidden']]
+
+
+class SQLiteDBPool:
+    """
+    线程安全的 SQLite 连接池
+    
+    持有 N 个只读连接供多个线程并发查询，以及一个加锁串行化的写连接。
+    数据库会被切换为 WAL 模式，读操作不会阻塞写操作，也不会被写操作阻塞。
+    
+    示例:
+        with SQLiteDBPool('data.db', readers=8) as pool:
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(lambda w: pool.query('t', where=w), wheres))
+            with pool.writer() as db:
+                db.insert('t', {'name': 'x'})
+    """
+    
+    # 只读连接不能修改日志模式，其余 PRAGMA 对只读连接同样有效
+    READER_PRAGMAS = ('busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+    
+    def __init__(self, db_path: str, readers: int = 4, profile: Optional[str] = 'balanced',
+                 pragmas: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                 reporter: Any = None):
+        """
+        初始化连接池
         
         Args:
             db_path: 数据库文件路径
+            readers: 只读连接数
+            profile: 性能配置档名称，见 PRAGMA_PROFILES
+            pragmas: 额外的 PRAGMA 设置
+            timeout: 等待空闲只读连接的超时时间（秒），默认一直等待
+            reporter: 状态信息的输出方式，同 SQLiteDB，读写连接共用
         """
+        if readers < 1:
+            raise ValueError("readers 至少为 1")
         self.db_path = db_path
-        self.conn: Optional[sqlite3.Connection] = None
-        self.cursor: Optional[sqlite3.Cursor] = None
+        self.readers = readers
+        self.timeout = timeout
+        pragmas = dict(pragmas or {})
+        pragmas['journal_mode'] = 'WAL'
+        self.reporter = make_reporter(reporter)
+        self._writer = SQLiteDB(db_path, profile=profile, pragmas=pragmas, check_same_thread=False,
+                                reporter=self.reporter)
+        self._write_lock = threading.RLock()
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._connections: List[sqlite3.Connection] = []
+    
+    def connect(self) -> "SQLiteDBPool":
+        """打开写连接（确保数据库文件存在并处于 WAL 模式）和全部只读连接"""
+        self._writer.connect()
+        uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        for _ in range(self.readers):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=DEFAULT_CACHED_STATEMENTS)
+            conn.row_factory = sqlite3.Row
+            for name in self.READER_PRAGMAS:
+                if name in self._writer.pragmas:
+                    conn.execute(f"PRAGMA {name} = {self._writer.pragmas[name]}").fetchall()
+            self._connections.append(conn)
+            self._pool.put(conn)
+        return self
+    
+    def close(self):
+        """关闭全部连接"""
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self._pool = queue.Queue()
+        with self._write_lock:
+            self._writer.close()
+    
+    def __enter__(self):
+        """上下文管理器入口"""
+        return self.connect()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """上下文管理器退出"""
+        self.close()
+    
+    @contextmanager
+    def reader(self):
+        """
+        借出一个只读连接，退出时归还
+        
+        Raises:
+            TimeoutError: 超时仍没有空闲连接
+        """
+        try:
+            conn = self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待空闲只读连接超时（{self.timeout} 秒）")
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+    
+    @contextmanager
+    def writer(self):
+        """
+        独占写连接，块内的操作与其他线程的写操作串行执行
+        
+        Yields:
+            写连接对应的 SQLiteDB 实例
+        """
+        with self._write_lock:
+            yield self._writer
+    
+    def query(self, table_name: str, columns: str = "*",
+              where: Optional[str] = None, params: Optional[tuple] = None,
+              order_by: Optional[str] = None, limit: Optional[int] = None,
+              row_format: str = 'dict') -> Any:
+        """
+        在只读连接上查询数据，可从多个线程并发调用
+        
+        参数同 SQLiteDB.query。
+        
+        Returns:
+            查询结果，默认为字典列表
+        """
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        return self.execute_sql(sql, params, row_format)
+    
+    def iter_query(self, table_name: str, columns: str = "*",
+                   where: Optional[str] = None, params: Optional[tuple] = None,
+                   order_by: Optional[str] = None, limit: Optional[int] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE, row_format: str = 'dict',
+                   header: bool = False) -> Iterator[Any]:
+        """
+        在只读连接上流式查询数据，迭代结束（或生成器关闭）时归还连接
+        
+        参数同 SQLiteDB.iter_query。
+        
+        Yields:
+            每行数据（默认为字典）
+        """
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        yield from self.iter_sql(sql, params, batch_size, row_format, header)
+    
+    def iter_sql(self, sql: str, params: Optional[tuple] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, row_format: str = 'dict',
+                 header: bool = False) -> Iterator[Any]:
+        """
+        在只读连接上流式执行 SELECT 语句
+        
+        Yields:
+            每行数据（默认为字典）
+        """
+        check_row_format(row_format, streaming=True)
+        with self.reader() as conn:
+            cursor = open_cursor(conn, row_format)
+            try:
+                cursor.execute(sql, params or ())
+                yield from iter_cursor_rows(cursor, batch_size, row_format, header)
+            finally:
+                cursor.close()
+    
+    def execute_sql(self, sql: str, params: Optional[tuple] = None,
+                    row_format: str = 'dict') -> Any:
+        """
+        执行自定义 SQL 语句
+        
+        SELECT 语句在只读连接上并发执行，其他语句通过写连接串行执行。
+        
+        Returns:
+            查询结果（如果是 SELECT）或受影响的行数
+        """
+        if not sql.strip().upper().startswith('SELECT'):
+            with self.writer() as db:
+                return db.execute_sql(sql, params, row_format)
+        check_row_format(row_format)
+        with self.reader() as conn:
+            cursor = open_cursor(conn, row_format)
+            try:
+                cursor.execute(sql, params or ())
+                results = fetch_results(cursor, row_format)
+            finally:
+                cursor.close()
+        self.reporter.report('query', rows=result_count(results, row_format))
+        return results
+
+
+class AsyncSQLiteDB:
+    """
+    asyncio 版本的 SQLiteDB，数据库操作在后台线程中执行，不阻塞事件循环
+    
+    写操作（以及 readers=0 时的全部操作）在该连接专用的单线程执行器中串行执行，
+    连接只在这一个线程中使用。readers > 0 时数据库切换为 WAL 模式，查询通过
+    SQLiteDBPool 的只读连接在另一个线程池中并发执行，不会被写操作阻塞。
+    
+    示例:
+        async with AsyncSQLiteDB('data.db', readers=4) as db:
+            users = await db.query('users', where='age > ?', params=(18,))
+            await db.insert_many('logs', rows)
+            async for batch in db.iter_query('events', batch_size=5000):
+                ...
+    """
+    
+    def __init__(self, db_path: str, readers: int = 0, profile: Optional[str] = None,
+                 reporter: Any = None, **options):
+        """
+        Args:
+            db_path: 数据库文件路径
+            readers: 并发查询的只读连接数，0 表示全部操作共用一个连接
+            profile: 性能配置档名称，见 PRAGMA_PROFILES；readers > 0 时默认为 balanced
+            reporter: 状态信息的输出方式，同 SQLiteDB
+            **options: readers=0 时传给 SQLiteDB 的其他参数（如 result_cache），
+                       readers > 0 时传给 SQLiteDBPool（如 pragmas、timeout）
+        """
+        self.db_path = db_path
+        self.readers = readers
+        if readers:
+            self._pool: Optional[SQLiteDBPool] = SQLiteDBPool(
+                db_path, readers, profile or 'balanced', reporter=reporter, **options)
+            self._db = self._pool._writer
+        else:
+            self._pool = None
+            self._db = SQLiteDB(db_path, profile=profile, reporter=reporter, **options)
+        self._writer_executor: Optional[ThreadPoolExecutor] = None
+        self._reader_executor: Optional[ThreadPoolExecutor] = None
+    
+    async def _write(self, func, *args, **kwargs) -> Any:
+        """在写线程中执行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer_executor, partial(func, *args, **kwargs))
+    
+    async def _read(self, func, *args, **kwargs) -> Any:
+        """在读线程池中执行；没有只读连接时在写线程中执行"""
+        loop = asyncio.get_running_loop()
+        executor = self._reader_executor or self._writer_executor
+        return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+    
+    async def connect(self) -> "AsyncSQLiteDB":
+        """在写线程中打开连接（readers > 0 时同时打开只读连接）"""
+        self._writer_executor = ThreadPoolExecutor(1, thread_name_prefix='sqlite-writer')
+        if self._pool is not None:
+            self._reader_executor = ThreadPoolExecutor(self.readers, thread_name_prefix='sqlite-reader')
+            await self._write(self._pool.connect)
+        else:
+            await self._write(self._db.connect)
+        return self
+    
+    async def close(self):
+        """关闭连接并停止后台线程"""
+        if self._writer_executor is None:
+            return
+        await self._write(self._pool.close if self._pool is not None else self._db.close)
+        self._writer_executor.shutdown()
+        self._writer_executor = None
+        if self._reader_executor is not None:
+            self._reader_executor.shutdown()
+            self._reader_executor = None
+    
+    async def __aenter__(self):
+        return await self.connect()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def run(self, func, *args, **kwargs) -> Any:
+        """
+        在写线程中调用 func(db, *args, **kwargs)，db 为底层的 SQLiteDB
+        
+        用于需要在同一事务中完成的多个操作，或其他没有异步版本的方法:
+        
+            def transfer(db, amount):
+                with db.transaction():
+                    db.execute_sql('UPDATE accounts SET balance = balance - ? WHERE id = 1', (amount,))
+                    db.execute_sql('UPDATE accounts SET balance = balance + ? WHERE id = 2', (amount,))
+            
+            await adb.run(transfer, 100)
+        """
+        return await self._write(func, self._db, *args, **kwargs)
+    
+    async def query(self, table_name: str, columns: str = "*",
+                    where: Optional[str] = None, params: Optional[tuple] = None,
+                    order_by: Optional[str] = None, limit: Optional[int] = None,
+                    row_format: str = 'dict') -> Any:
+        """查询数据，参数同 SQLiteDB.query"""
+        target = self._pool if self._pool is not None else self._db
+        return await self._read(target.query, table_name, columns, where, params,
+                                order_by, limit, row_format)
+    
+    async def execute_sql(self, sql: str, params: Optional[tuple] = None,
+                          row_format: str = 'dict') -> Any:
+        """执行自定义 SQL，SELECT 语句在只读连接上执行，其他语句在写线程中执行"""
+        if self._pool is not None and sql.strip().upper().startswith('SELECT'):
+            return await self._read(self._pool.execute_sql, sql, params, row_format)
+        return await self._write(self._db.execute_sql, sql, params, row_format)
+    
+    async def insert(self, table_name: str, data: Dict[str, Any]) -> int:
+        """插入单条数据，返回行 ID"""
+        return await self._write(self._db.insert, table_name, data)
+    
+    async def insert_many(self, table_name: str, data_list: List[Dict[str, Any]]) -> int:
+        """批量插入数据，返回插入的行数"""
+        return await self._write(self._db.insert_many, table_name, data_list)
+    
+    async def update(self, table_name: str, data: Dict[str, Any],
+                     where: str, params: Optional[tuple] = None) -> int:
+        """更新数据，返回受影响的行数"""
+        return await self._write(self._db.update, table_name, data, where, params)
+    
+    async def delete(self, table_name: str, where: str, params: Optional[tuple] = None) -> int:
+        """删除数据，返回受影响的行数"""
+        return await self._write(self._db.delete, table_name, where, params)
+    
+    async def iter_query(self, table_name: str, columns: str = "*",
+                         where: Optional[str] = None, params: Optional[tuple] = None,
+                         order_by: Optional[str] = None, limit: Optional[int] = None,
+                         batch_size: int = DEFAULT_BATCH_SIZE,
+                         row_format: str = 'dict') -> AsyncIterator[List[Any]]:
+        """
+        流式查询数据，用 async for 按批取得结果
+        
+        Yields:
+            每批最多 batch_size 行的列表
+        """
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        async for batch in self.iter_sql(sql, params, batch_size, row_format):
+            yield batch
+    
+    async def iter_sql(self, sql: str, params: Optional[tuple] = None,
+                       batch_size: int = DEFAULT_BATCH_SIZE,
+                       row_format: str = 'dict') -> AsyncIterator[List[Any]]:
+        """
+        流式执行 SELECT 语句，每读一批让出一次事件循环
+        
+        readers > 0 时每个流在自己的线程中读取：流从第一批起一直占用一个只读连接，
+        如果在共用的读线程池中取批，流的数量超过 readers 时等待连接的任务会占满
+        全部读线程，已持有连接的流再也取不到下一批（死锁）。流多于只读连接时，
+        多出的流在自己的线程中等待连接释放，不影响其他流和查询。
+        
+        提前结束迭代时游标（以及借出的只读连接）在生成器关闭时释放，
+        可以配合 contextlib.aclosing 立即释放。
+        
+        Yields:
+            每批最多 batch_size 行的列表
+        """
+        loop = asyncio.get_running_loop()
+        if self._pool is not None:
+            rows = self._pool.iter_sql(sql, params, batch_size, row_format)
+            executor = ThreadPoolExecutor(1, thread_name_prefix='sqlite-stream')
+        else:
+            rows = self._db.iter_sql(sql, params, batch_size, row_format)
+            executor = self._writer_executor
+        try:
+            while True:
+                batch = await loop.run_in_executor(executor, lambda: list(islice(rows, batch_size)))
+                if not batch:
+                    break
+                yield batch
+        finally:
+            await loop.run_in_executor(executor, rows.close)
+            if executor is not self._writer_executor:
+                executor.shutdown(wait=False)
+
+
+# 分片查询中每个分片的结果队列最多缓存的批数
+SHARD_QUEUE_BATCHES = 4
+
+
+def _sort_value(value: Any) -> tuple:
+    """按 SQLite 的排序规则（NULL < 数值 < 文本 < BLOB）生成可比较的值"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+class _MergeKey:
+    """分片结果归并时的排序键，支持每列独立的升降序"""
+    
+    __slots__ = ('values', 'descending')
+    
+    def __init__(self, values: tuple, descending: tuple):
+        self.values = values
+        self.descending = descending
     
-    def connect(self) -> "SQLiteDB":
-        """连接到数据库"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
-        self.cursor = self.conn.cursor()
-        return self
+    def __lt__(self, other: "_MergeKey") -> bool:
+        for a, b, desc in zip(self.values, other.values, self.descending):
+            if a != b:
+                return a > b if desc else a < b
+        return False
+
+
+def open_shard(path: str, pragmas: Optional[Dict[str, Any]] = None) -> sqlite3.Connection:
+    """以只读方式打开一个分片数据库文件"""
+    uri = Path(path).resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+    return conn
+
+
+def fetch_shard(path: str, sql: str, params: Any = None,
+                pragmas: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    在一个分片上执行查询并读取全部结果（进程池模式下在子进程中执行）
     
-    def close(self):
-        """关闭数据库连接"""
-        if self.conn:
-            self.conn.commit()
-            self.conn.close()
+    Returns:
+        (列名列表, 行元组列表)
+    """
+    conn = open_shard(path, pragmas)
+    try:
+        cursor = conn.execute(sql, params or ())
+        names = [description[0] for description in cursor.description or ()]
+        return names, cursor.fetchall()
+    finally:
+        conn.close()
+
+
+class ShardedSQLiteDB:
+    """
+    对多个表结构相同的 SQLite 文件并行执行同一个 SELECT，并流式合并结果
     
-    def __enter__(self):
-        """上下文管理器入口"""
-        return self.connect()
+    线程模式下每个分片由一个线程执行查询，按批把结果放入有界队列，
+    主线程边读边产出；指定 order_by 时对各分片（已在分片内排序）的结果
+    做归并排序；指定 limit 时把 LIMIT 下推到每个分片，达到全局行数后
+    中断其余分片。进程模式下每个分片在子进程中一次读完，适合结果小、
+    分片内计算重的查询。
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """上下文管理器退出"""
-        self.close()
+    示例:
+        shards = ShardedSQLiteDB('data/events_*.db', max_workers=8)
+        for row in shards.iter_query('events', where='type = ?', params=('login',),
+                                     order_by='ts DESC', limit=100):
+            print(row)
+    """
     
-    def create_table(self, table_name: str, columns: Dict[str, str]):
+    EXECUTORS = ('thread', 'process')
+    
+    def __init__(self, shards: Any, max_workers: Optional[int] = None, executor: str = 'thread',
+                 profile: Optional[str] = 'read-heavy', shard_column: Optional[str] = None,
+                 reporter: Any = None):
         """
-        创建表
-        
         Args:
-            table_name: 表名
-            columns: 列定义字典，格式 {'列名': '类型和约束'}
-                    例如: {'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
-                           'name': 'TEXT NOT NULL',
-                           'age': 'INTEGER'}
+            shards: 分片文件的 glob 模式（如 "data/*.db"），或路径列表
+            max_workers: 并发执行的分片数，默认为分片数（进程模式默认为 CPU 数）
+            executor: 执行方式，thread（线程，流式合并）或 process（进程）
+            profile: 分片连接使用的配置档，只应用对只读连接有效的 PRAGMA
+            shard_column: 在每行末尾附加分片名（文件名去掉扩展名）的列名，默认不附加
+            reporter: 状态信息的输出方式，同 SQLiteDB
         """
-        column_defs = ', '.join([f"{name} {definition}" for name, definition in columns.items()])
-        sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({column_defs})"
-        self.cursor.execute(sql)
-        self.conn.commit()
-        print(f"✓ 表 '{table_name}' 创建成功")
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"未知的执行方式: {executor}，可选: {', '.join(self.EXECUTORS)}")
+        if profile is not None and profile not in PRAGMA_PROFILES:
+            raise ValueError(f"未知的配置档: {profile}，可选: {', '.join(PRAGMA_PROFILES)}")
+        paths = sorted(glob.glob(shards)) if isinstance(shards, str) else list(shards)
+        if not paths:
+            raise ValueError(f"没有找到分片数据库文件: {shards}")
+        self.paths: List[str] = paths
+        self.max_workers = max_workers
+        self.executor = executor
+        self.shard_column = shard_column
+        self.reporter = make_reporter(reporter)
+        profile_pragmas = PRAGMA_PROFILES.get(profile, {})
+        self.pragmas = {name: profile_pragmas[name] for name in SQLiteDBPool.READER_PRAGMAS
+                        if name in profile_pragmas}
     
-    def insert(self, table_name: str, data: Dict[str, Any]) -> int:
+    def query(self, table_name: str, columns: str = "*",
+              where: Optional[str] = None, params: Optional[tuple] = None,
+              order_by: Optional[str] = None, limit: Optional[int] = None,
+              row_format: str = 'dict') -> Any:
         """
-        插入单条数据
+        在全部分片上查询数据并合并
         
-        Args:
-            table_name: 表名
-            data: 数据字典，格式 {'列名': 值}
+        参数同 SQLiteDB.query；order_by 只能是列名加方向（同 paginate），
+        排序列需要出现在查询结果中。
         
         Returns:
-            插入数据的行 ID
+            合并后的结果，格式同 SQLiteDB.query（不支持 row 格式）
         """
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['?' for _ in data])
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        self.cursor.execute(sql, list(data.values()))
-        self.conn.commit()
-        row_id = self.cursor.lastrowid
-        print(f"✓ 插入成功，行 ID: {row_id}")
-        return row_id
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        return self.execute_sql(sql, params, row_format, order_by, limit)
     
-    def insert_many(self, table_name: str, data_list: List[Dict[str, Any]]) -> int:
+    def execute_sql(self, sql: str, params: Optional[tuple] = None, row_format: str = 'dict',
+                    order_by: Optional[str] = None, limit: Optional[int] = None) -> Any:
         """
-        批量插入数据
+        在全部分片上执行 SELECT 语句并合并结果
         
         Args:
-            table_name: 表名
-            data_list: 数据字典列表
+            sql: SELECT 语句（应自带 ORDER BY，order_by 只决定合并方式）
+            params: SQL 参数
+            row_format: 行格式 (dict/tuple/columnar)
+            order_by: 按这些列归并各分片的结果，如 "ts DESC, id"
+            limit: 全局最多返回的行数
         
         Returns:
-            插入的行数
+            合并后的结果，格式同 fetch_results
         """
-        if not data_list:
-            print("⚠ 没有数据需要插入")
-            return 0
-        
-        columns = ', '.join(data_list[0].keys())
-        placeholders = ', '.join(['?' for _ in data_list[0]])
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        check_row_format(row_format)
+        if row_format == 'row':
+            raise ValueError("分片查询不支持 row 行格式")
+        rows = self.iter_sql(sql, params, order_by, limit, row_format='tuple', header=True)
+        columns = next(rows)
+        data = list(rows)
+        self.reporter.report('query', rows=len(data), shards=len(self.paths))
+        if row_format == 'dict':
+            return [dict(zip(columns, row)) for row in data]
+        if row_format == 'tuple':
+            return {'columns': columns, 'rows': data}
+        return {name: _compact_column(list(values))
+                for name, values in zip(columns, zip(*data) if data else [()] * len(columns))}
+    
+    def iter_query(self, table_name: str, columns: str = "*",
+                   where: Optional[str] = None, params: Optional[tuple] = None,
+                   order_by: Optional[str] = None, limit: Optional[int] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE, row_format: str = 'dict',
+                   header: bool = False) -> Iterator[Any]:
+        """
+        在全部分片上流式查询数据，参数同 SQLiteDB.iter_query
         
-        values_list = [list(data.values()) for data in data_list]
-        self.cursor.executemany(sql, values_list)
-        self.conn.commit()
-        count = self.cursor.rowcount
-        print(f"✓ 批量插入成功，共 {count} 条记录")
-        return count
+        Yields:
+            每行数据（默认为字典）
+        """
+        sql = build_select_sql(table_name, columns, where, order_by, limit)
+        yield from self.iter_sql(sql, params, order_by, limit, batch_size, row_format, header)
     
-    def query(self, table_name: str, columns: str = "*", 
-              where: Optional[str] = None, params: Optional[tuple] = None,
-              order_by: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def iter_sql(self, sql: str, params: Optional[tuple] = None, order_by: Optional[str] = None,
+                 limit: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 row_format: str = 'dict', header: bool = False) -> Iterator[Any]:
         """
-        查询数据
+        在全部分片上流式执行 SELECT 语句
+        
+        未指定 order_by 时按各分片产出的先后交错返回；指定时做归并排序。
+        达到 limit 行或生成器被关闭时，中断仍在执行的分片。
         
         Args:
-            table_name: 表名
-            columns: 要查询的列，默认 "*"
-            where: WHERE 子句（不包含 WHERE 关键字）
-            params: WHERE 子句的参数
-            order_by: ORDER BY 子句（不包含 ORDER BY 关键字）
-            limit: 限制返回的行数
+            sql: SELECT 语句
+            params: SQL 参数
+            order_by: 归并排序的列，如 "ts DESC, id"
+            limit: 全局最多返回的行数
+            batch_size: 每个分片每批读取的行数
+            row_format: 行格式，dict 或 tuple
+            header: tuple 格式下是否先产出列名列表
         
-        Returns:
-            查询结果列表
+        Yields:
+            每行数据
         """
-        sql = f"SELECT {columns} FROM {table_name}"
-        
-        if where:
-            sql += f" WHERE {where}"
-        if order_by:
-            sql += f" ORDER BY {order_by}"
-        if limit:
-            sql += f" LIMIT {limit}"
-        
-        if params:
-            self.cursor.execute(sql, params)
+        if row_format not in ('dict', 'tuple'):
+            raise ValueError(f"分片流式查询只支持 dict 和 tuple 行格式: {row_format}")
+        if not sql.strip().upper().startswith('SELECT'):
+            raise ValueError("分片查询只支持 SELECT 语句")
+        keys = parse_order_by(order_by) if order_by else None
+        if self.executor == 'process':
+            names, rows = self._run_processes(sql, params, keys)
         else:
-            self.cursor.execute(sql)
+            names, rows = self._run_threads(sql, params, keys, batch_size)
         
-        rows = self.cursor.fetchall()
-        results = [dict(row) for row in rows]
-        print(f"✓ 查询成功，返回 {len(results)} 条记录")
-        return results
+        count = 0
+        try:
+            if row_format == 'tuple' and header:
+                yield names
+            if limit is not None and limit <= 0:
+                return
+            for row in rows:
+                yield dict(zip(names, row)) if row_format == 'dict' else row
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            rows.close()
     
-    def update(self, table_name: str, data: Dict[str, Any], 
-               where: str, params: Optional[tuple] = None) -> int:
-        """
-        更新数据
+    def _shard_rows(self, index: int, rows: Iterable[tuple]) -> Iterator[tuple]:
+        """给每行附加分片名"""
+        if not self.shard_column:
+            return iter(rows)
+        shard = (Path(self.paths[index]).stem,)
+        return (row + shard for row in rows)
+    
+    def _merge(self, shard_rows: List[Iterator[tuple]], names: List[str],
+               keys: Optional[List[tuple]]) -> Iterator[tuple]:
+        """按排序键归并各分片的结果；没有排序键时依次连接"""
+        if not keys:
+            return chain.from_iterable(shard_rows)
+        try:
+            positions = [names.index(column) for column, _ in keys]
+        except ValueError:
+            missing = [column for column, _ in keys if column not in names]
+            raise ValueError(f"排序列必须出现在查询结果中: {', '.join(missing)}")
+        descending = tuple(desc for _, desc in keys)
+        return heapq.merge(*shard_rows, key=lambda row: _MergeKey(
+            tuple(_sort_value(row[i]) for i in positions), descending))
+    
+    def _column_names(self, names: List[str]) -> List[str]:
+        return names + [self.shard_column] if self.shard_column else names
+    
+    def _run_processes(self, sql: str, params: Any, keys: Optional[List[tuple]]) -> tuple:
+        """进程模式：每个分片在子进程中一次读完，再在本进程中合并"""
+        results: List[Optional[tuple]] = [None] * len(self.paths)
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            futures = {executor.submit(fetch_shard, path, sql, params, self.pragmas): index
+                       for index, path in enumerate(self.paths)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        names = self._column_names(results[0][0])
+        shard_rows = [self._shard_rows(index, rows) for index, (_, rows) in enumerate(results)]
         
-        Args:
-            table_name: 表名
-            data: 要更新的数据字典
-            where: WHERE 子句（不包含 WHERE 关键字）
-            params: WHERE 子句的参数
+        def generate():
+            yield from self._merge(shard_rows, names, keys)
+        return names, generate()
+    
+    def _run_threads(self, sql: str, params: Any, keys: Optional[List[tuple]],
+                     batch_size: int) -> tuple:
+        """
+        线程模式：每个分片由一个线程按批读取，结果通过有界队列交给调用方
         
-        Returns:
-            受影响的行数
+        归并排序需要所有分片同时产出，此时每个分片一个线程、一个队列；
+        否则最多 max_workers 个线程共用一个队列，先到先出。
         """
-        set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
-        sql = f"UPDATE {table_name} SET {set_clause} WHERE {where}"
+        shard_count = len(self.paths)
+        stop = threading.Event()
+        connections: Dict[int, sqlite3.Connection] = {}
+        connections_lock = threading.Lock()
+        names_ready: List[Optional[List[str]]] = [None] * shard_count
+        if keys:
+            queues = [queue.Queue(SHARD_QUEUE_BATCHES) for _ in range(shard_count)]
+            workers = shard_count
+        else:
+            shared = queue.Queue(SHARD_QUEUE_BATCHES * min(shard_count, self.max_workers or shard_count))
+            queues = [shared] * shard_count
+            workers = self.max_workers or shard_count
         
-        # 合并 SET 和 WHERE 的参数
-        all_params = list(data.values())
-        if params:
-            all_params.extend(params)
+        def put(out: queue.Queue, item: tuple) -> bool:
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
         
-        self.cursor.execute(sql, all_params)
-        self.conn.commit()
-        count = self.cursor.rowcount
-        print(f"✓ 更新成功，影响 {count} 条记录")
-        return count
+        def produce(index: int):
+            out = queues[index]
+            conn = None
+            try:
+                if stop.is_set():
+                    return
+                conn = open_shard(self.paths[index], self.pragmas)
+                with connections_lock:
+                    connections[index] = conn
+                cursor = conn.execute(sql, params or ())
+                names = [description[0] for description in cursor.description or ()]
+                if not put(out, ('names', index, names)):
+                    return
+                while not stop.is_set():
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows or not put(out, ('rows', index, rows)):
+                        break
+            except Exception as e:
+                if not stop.is_set():
+                    put(out, ('error', index, e))
+            finally:
+                with connections_lock:
+                    connections.pop(index, None)
+                if conn is not None:
+                    conn.close()
+                put(out, ('done', index, None))
+        
+        executor = ThreadPoolExecutor(workers, thread_name_prefix='shard')
+        for index in range(shard_count):
+            executor.submit(produce, index)
+        
+        def shutdown():
+            stop.set()
+            with connections_lock:
+                for conn in connections.values():
+                    conn.interrupt()
+            executor.shutdown(wait=True)
+        
+        def receive(out: queue.Queue) -> tuple:
+            kind, index, payload = out.get()
+            if kind == 'error':
+                raise payload
+            if kind == 'names':
+                names_ready[index] = payload
+            return kind, index, payload
+        
+        pending: List[tuple] = []
+        try:
+            if keys:
+                # 先读取每个分片的列名，再逐个分片按需取批
+                for index in range(shard_count):
+                    kind, _, _ = receive(queues[index])
+                    if kind == 'done':
+                        raise RuntimeError(f"分片 {self.paths[index]} 没有返回结果")
+            else:
+                # 等到任意一个分片返回列名，期间收到的其他消息留给后面处理
+                while not any(names_ready):
+                    pending.append(receive(shared))
+        except BaseException:
+            shutdown()
+            raise
+        names = next(n for n in names_ready if n is not None)
+        columns = self._column_names(names)
+        
+        def shard_stream(index: int) -> Iterator[tuple]:
+            while True:
+                kind, _, payload = receive(queues[index])
+                if kind == 'done':
+                    return
+                if kind == 'rows':
+                    yield from self._shard_rows(index, payload)
+        
+        def unordered() -> Iterator[tuple]:
+            done = sum(1 for item in pending if item[0] == 'done')
+            for kind, index, payload in pending:
+                if kind == 'rows':
+                    yield from self._shard_rows(index, payload)
+            while done < shard_count:
+                kind, index, payload = receive(shared)
+                if kind == 'done':
+                    done += 1
+                elif kind == 'rows':
+                    yield from self._shard_rows(index, payload)
+        
+        def generate():
+            try:
+                if keys:
+                    yield from self._merge([shard_stream(i) for i in range(shard_count)], names, keys)
+                else:
+                    yield from unordered()
+            finally:
+                shutdown()
+        return columns, generate()
+
+
+def stream_rows(rows: Iterable[Any], output: Optional[str] = None, header: bool = False,
+                output_format: str = 'ndjson', reporter: Optional[Reporter] = None):
+    """
+    将流式查询结果写到标准输出或文件，默认为 NDJSON
     
-    def delete(self, table_name: str, where: str, params: Optional[tuple] = None) -> int:
+    写到标准输出时，状态信息输出到标准错误，避免混入数据。
+    header 为 True 表示第一行是列名，不计入记录数。
+    """
+    reporter = reporter or PrintReporter()
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            count = write_rows(rows, f, output_format) - header
+        reporter.report('stream', rows=count, output=output)
+        reporter.report('saved', path=output)
+    else:
+        count = write_rows(rows, sys.stdout, output_format) - header
+        if output_format != 'ndjson':
+            sys.stdout.write('\n')
+        sys.stdout.flush()
+        reporter.report('stream', rows=count, output='-')
+
+
+def emit_result(result: Any, output: Optional[str] = None, output_format: str = 'pretty',
+                reporter: Optional[Reporter] = None):
+    """
+    把查询结果序列化一次，写到文件（指定 output 时）或标准输出
+    """
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            write_result(result, f, output_format)
+        (reporter or PrintReporter()).report('saved', path=output)
+    else:
+        write_result(result, sys.stdout, output_format)
+        if output_format != 'ndjson':
+            sys.stdout.write('\n')
+        sys.stdout.flush()
+
+
+def _json_option(value: Any) -> Any:
+    """命令行传入的 JSON 字符串需要解析，服务模式下已经是解析后的对象"""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def run_operation(db: SQLiteDB, operation: str, options: Dict[str, Any]) -> Any:
+    """
+    执行一个操作并返回结果，命令行和服务模式共用
+    
+    Args:
+        db: 已连接的数据库
+        operation: 操作名，同命令行的 operation 参数
+        options: 操作参数，键名同命令行参数（如 table、where、order_by），
+                 data、params、columns（create_table）、types 可以是 JSON 字符串或已解析的对象
+    
+    Returns:
+        操作结果（查询结果、影响的行数、导出摘要等），没有结果的操作返回 None
+    
+    Raises:
+        ValueError: 缺少必需的参数或操作未知
+    """
+    get = options.get
+    table = get('table')
+    params = _json_option(get('params'))
+    row_format = get('row_format') or 'dict'
+    
+    if operation == 'create_table':
+        if not table or not get('columns'):
+            raise ValueError("create_table 需要 --table 和 --columns 参数")
+        db.create_table(table, _json_option(get('columns')))
+        return None
+    
+    if operation == 'insert':
+        if not table or not get('data'):
+            raise ValueError("insert 需要 --table 和 --data 参数")
+        data = _json_option(get('data'))
+        if isinstance(data, list):
+            return db.insert_many(table, data)
+        return db.insert(table, data)
+    
+    if operation == 'import':
+        if not table or not get('file'):
+            raise ValueError("import 需要 --table 和 --file 参数")
+        if get('file') == '-' and not get('format'):
+            raise ValueError("从标准输入导入时需要 --format 参数")
+        return db.import_file(table, get('file'), get('format'), _json_option(get('types')),
+                              get('delimiter'), get('batch_size') or DEFAULT_IMPORT_CHUNK_SIZE,
+                              get('commit_rows') or DEFAULT_IMPORT_COMMIT_ROWS,
+                              get('conflict'), get('update_columns'))
+    
+    if operation == 'query':
+        if not table:
+            raise ValueError("query 需要 --table 参数")
+        return db.query(table, get('columns') or "*", get('where'), params,
+                        get('order_by'), get('limit'), row_format)
+    
+    if operation == 'paginate':
+        if not table or not get('order_by'):
+            raise ValueError("paginate 需要 --table 和 --order-by 参数")
+        return db.paginate(table, get('order_by'), get('page_size') or DEFAULT_PAGE_SIZE,
+                           get('after'), get('columns') or "*", get('where'), params,
+                           'tuple' if row_format == 'tuple' else 'dict')
+    
+    if operation == 'export':
+        if not table and not get('sql'):
+            raise ValueError("export 需要 --table 或 --sql 参数")
+        if get('format') == 'json':
+            raise ValueError("export 支持的格式为 csv、tsv、ndjson、columnar")
+        max_part_bytes = int(get('max_part_mb') * 1048576) if get('max_part_mb') else None
+        output = get('output') or '-'
+        export_format = get('format') or ('csv' if output == '-' else None)
+        batch_size = get('batch_size') or DEFAULT_EXPORT_BATCH_SIZE
+        if get('sql'):
+            return db.export(output, sql=get('sql'), params=params, export_format=export_format,
+                             batch_size=batch_size, max_part_bytes=max_part_bytes)
+        return db.export(output, table, get('columns') or "*", get('where'), params,
+                         get('order_by'), get('limit'), export_format=export_format,
+                         batch_size=batch_size, max_part_bytes=max_part_bytes)
+    
+    if operation == 'upsert':
+        if not table or not get('data') or not get('conflict'):
+            raise ValueError("upsert 需要 --table、--data 和 --conflict 参数")
+        data = _json_option(get('data'))
+        if isinstance(data, list):
+            return db.upsert_many(table, data, get('conflict'), get('update_columns'),
+                                  get('update_where'), get('batch_size') or DEFAULT_IMPORT_CHUNK_SIZE)
+        return db.upsert(table, data, get('conflict'), get('update_columns'), get('update_where'))
+    
+    if operation == 'update':
+        if not table or not get('data') or not get('where'):
+            raise ValueError("update 需要 --table、--data 和 --where 参数")
+        return db.update(table, _json_option(get('data')), get('where'), params)
+    
+    if operation in ('update_many', 'delete_many'):
+        if not table or not get('key') or not (get('data') or get('file')):
+            raise ValueError(f"{operation} 需要 --table、--key 以及 --data 或 --file 参数")
+        rows = _json_option(get('data')) if get('data') else iter_file_rows(
+            get('file'), get('format'), get('delimiter'))
+        batch_size = get('batch_size') or DEFAULT_IMPORT_CHUNK_SIZE
+        if operation == 'update_many':
+            return db.update_many(table, rows, get('key'), get('update_columns'), batch_size)
+        return db.delete_many(table, rows, get('key'), batch_size)
+    
+    if operation == 'delete':
+        if not table or not get('where'):
+            raise ValueError("delete 需要 --table 和 --where 参数")
+        return db.delete(table, get('where'), params)
+    
+    if operation == 'execute':
+        if not get('sql'):
+            raise ValueError("execute 需要 --sql 参数")
+        return db.execute_sql(get('sql'), params, row_format)
+    
+    if operation == 'list_tables':
+        return db.get_tables()
+    
+    if operation == 'table_info':
+        if not table:
+            raise ValueError("table_info 需要 --table 参数")
+        return db.get_table_info(table)
+    
+    if operation == 'describe':
+        return db.describe(table)
+    
+    if operation == 'create_index':
+        if not table or not get('columns'):
+            raise ValueError("create_index 需要 --table 和 --columns 参数")
+        return db.create_index(table, get('columns'), get('index_name'), bool(get('unique')))
+    
+    if operation == 'list_indexes':
+        return db.list_indexes(table)
+    
+    if operation == 'advise_indexes':
+        if table:
+            # 临时分析一种查询形态，与 --workload-log 中记录的形态一起处理
+            db._record_shape('query', table, get('columns'), get('where'), get('order_by'), params)
+        return db.advise_indexes(bool(get('apply')))
+    
+    if operation in ('backup', 'vacuum_into'):
+        if not get('dest'):
+            raise ValueError(f"{operation} 需要 --dest 参数")
+        if operation == 'backup':
+            return db.backup(get('dest'), get('pages') or BACKUP_PAGES_PER_STEP)
+        return db.vacuum_into(get('dest'))
+    
+    if operation == 'analyze':
+        return db.analyze(table, get('analysis_limit'))
+    
+    if operation == 'optimize':
+        return db.optimize()
+    
+    if operation == 'aggregate':
+        if not table:
+            raise ValueError("aggregate 需要 --table 参数")
+        return db.aggregate(table, get('group_by'), get('agg') or 'count', get('where'), params,
+                            get('having'), get('order_by'), get('top'), row_format)
+    
+    if operation in ('create_matview', 'refresh', 'drop_matview'):
+        if not get('view'):
+            raise ValueError(f"{operation} 需要 --view 参数")
+        if operation == 'create_matview':
+            if not table and not get('sql'):
+                raise ValueError("create_matview 需要 --table 或 --sql 参数")
+            watermark = get('watermark') or 'rowid'
+            return db.create_matview(get('view'), table, get('group_by'), get('agg') or 'count',
+                                     get('where'), params, None if watermark == 'none' else watermark,
+                                     get('sql'))
+        if operation == 'refresh':
+            return db.refresh_matview(get('view'), bool(get('full')))
+        return db.drop_matview(get('view'))
+    
+    if operation == 'list_matviews':
+        return db.list_matviews()
+    
+    if operation in ('fts_create', 'fts_index', 'search'):
+        fts_name = get('fts') or (f"{table}_fts" if table else None)
+        if operation == 'fts_create':
+            if not table or not get('columns'):
+                raise ValueError("fts_create 需要 --table 和 --columns 参数")
+            return db.fts_create(table, get('columns'), fts_name, get('tokenizer'), not get('no_triggers'))
+        if not fts_name:
+            raise ValueError(f"{operation} 需要 --table 或 --fts 参数")
+        if operation == 'fts_index':
+            return db.fts_index(fts_name, get('mode') or 'rebuild')
+        if not get('match'):
+            raise ValueError("search 需要 --match 参数")
+        return db.search(fts_name, get('match'), get('columns') or "*",
+                         get('limit') or DEFAULT_SEARCH_LIMIT, get('offset') or 0,
+                         bool(get('fts_syntax')), where=get('where'), params=params)
+    
+    raise ValueError(f"未知的操作: {operation}")
+
+
+def print_operation_result(args: argparse.Namespace, result: Any, reporter: Reporter):
+    """按命令行的约定输出操作结果"""
+    operation = args.operation
+    if operation in ('query', 'paginate', 'search', 'aggregate') or (operation == 'execute' and not isinstance(result, int)):
+        emit_result(result, args.output, args.output_format or 'pretty', reporter)
+        return
+    
+    if operation == 'list_tables':
+        print("数据库中的表：")
+        for table in result:
+            print(f"  - {table}")
+    elif operation == 'table_info':
+        print(f"表 '{args.table}' 的结构：")
+        print(json_dumps(result, pretty=True))
+    elif operation == 'describe' and not args.output:
+        print(json_dumps(result, pretty=True))
+    elif operation == 'list_indexes':
+        print("数据库中的索引：")
+        for index in result:
+            unique = '（唯一）' if index['unique'] else ''
+            print(f"  - {index['name']}{unique}: {index['table']}({', '.join(index['columns'])})")
+    elif operation == 'list_matviews':
+        print("数据库中的物化视图：")
+        for view in result:
+            mode = '增量刷新' if view['incremental'] else '全部重算'
+            print(f"  - {view['name']}（{mode}，水位 {view['watermark']}）: "
+                  f"{view['sql'] or view['source']}")
+    elif operation == 'advise_indexes':
+        for suggestion in result:
+            status = '已创建' if suggestion['applied'] else '建议'
+            print(f"  [{status}] {suggestion['sql']}  -- {suggestion['count']} 次，"
+                  f"{'; '.join(suggestion['plan'])}")
+    
+    # 如果指定了输出文件，保存结果
+    if args.output and result is not None and operation in (
+            'execute', 'list_tables', 'table_info', 'describe', 'list_indexes', 'advise_indexes',
+            'list_matviews'):
+        emit_result(result, args.output, reporter=reporter)
+
+
+class RPCError(Exception):
+    """服务端返回的 JSON-RPC 错误"""
+    
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def rpc_error_code(error: Exception) -> int:
+    """异常对应的 JSON-RPC 错误码：参数错误、数据库错误或内部错误"""
+    if isinstance(error, ValueError):
+        return RPC_INVALID_PARAMS
+    if isinstance(error, sqlite3.Error):
+        return RPC_DATABASE_ERROR
+    return RPC_INTERNAL_ERROR
+
+
+class _RPCRequestHandler(socketserver.StreamRequestHandler):
+    """一个客户端连接：逐行读取请求，逐行写回响应，连接保持到客户端关闭"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.app.handle_line(line)
+            if response is not None:
+                self.wfile.write(response.encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+
+class _UnixRPCServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SQLiteDBServer:
+    """
+    常驻服务模式：在 Unix 套接字上接收 JSON-RPC 2.0 请求
+    
+    每个数据库文件保持一个已连接的 SQLiteDB（连接、PRAGMA、预编译语句缓存、
+    SQL 缓存都是热的），短小的请求不再付出进程启动和建立连接的开销。
+    同一数据库的请求串行执行，不同数据库的请求并行执行。
+    
+    请求为一行 JSON：{"jsonrpc": "2.0", "id": 1, "method": "query",
+    "params": {"db": "app.db", "table": "users", "where": "age > ?", "params": [18]}}，
+    method 与命令行的 operation 相同，params 的键名同命令行参数（去掉 -- 并把 - 换成 _），
+    另外支持 ping、stats、shutdown 三个管理方法。
+    """
+    
+    METHODS = frozenset(OPERATIONS) | {'ping', 'stats', 'shutdown'}
+    
+    def __init__(self, socket_path: str, default_db: Optional[str] = None,
+                 max_databases: int = SERVER_MAX_DATABASES, reporter: Any = None,
+                 **db_options):
         """
-        删除数据
-        
         Args:
-            table_name: 表名
-            where: WHERE 子句（不包含 WHERE 关键字）
-            params: WHERE 子句的参数
+            socket_path: Unix 套接字路径
+            default_db: 请求中没有 db 参数时使用的数据库
+            max_databases: 最多同时保持打开的数据库数量，超过后关闭最久未使用的
+            reporter: 服务启动、停止等状态信息的输出方式
+            **db_options: 传给 SQLiteDB 的其他参数（如 profile、instrument）。
+                          默认不设置配置档：打开数据库不应改变它的日志模式
+        """
+        self.socket_path = socket_path
+        self.default_db = default_db
+        self.max_databases = max_databases
+        self.reporter = make_reporter(reporter)
+        self.db_options = dict(db_options)
+        self._databases: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'errors': 0}
+        self._started = time.time()
+        self._server: Optional[_UnixRPCServer] = None
+    
+    def _database(self, db_path: str) -> tuple:
+        """返回数据库对应的 (SQLiteDB, 锁)，第一次使用时连接"""
+        key = os.path.abspath(db_path)
+        with self._lock:
+            entry = self._databases.get(key)
+            if entry is not None:
+                self._databases.move_to_end(key)
+                return entry
+            db = SQLiteDB(key, check_same_thread=False, reporter='silent', **self.db_options).connect()
+            entry = self._databases[key] = (db, threading.Lock())
+            evicted = self._databases.popitem(last=False) if len(self._databases) > self.max_databases else None
+        if evicted is not None:
+            old_db, old_lock = evicted[1]
+            with old_lock:
+                old_db.close()
+        return entry
+    
+    def call(self, method: str, params: Dict[str, Any]) -> Any:
+        """
+        执行一个请求
         
-        Returns:
-            删除的行数
+        Raises:
+            ValueError: 参数错误或方法不存在
+            sqlite3.Error: 数据库错误
         """
-        sql = f"DELETE FROM {table_name} WHERE {where}"
+        if method == 'ping':
+            return {'pid': os.getpid(), 'uptime': round(time.time() - self._started, 3),
+                    'databases': list(self._databases)}
+        if method == 'stats':
+            # SQL 字符串缓存是进程级的，只报告一次；语句统计和结果缓存按数据库报告
+            with self._lock:
+                databases = {path: {'statements': entry[0].get_stats() if entry[0].instrument else None,
+                                    'result_cache': entry[0].result_cache_stats()}
+                             for path, entry in self._databases.items()}
+            return dict(self._stats, sql_cache=sql_cache_info(), databases=databases)
+        if method == 'shutdown':
+            # shutdown() 会等待 serve_forever 退出，不能在处理请求的线程中直接调用
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return True
+        if method not in OPERATIONS:
+            raise ValueError(f"未知的方法: {method}")
         
-        if params:
-            self.cursor.execute(sql, params)
+        db_path = params.get('db') or self.default_db
+        if not db_path:
+            raise ValueError("缺少 db 参数")
+        if params.get('row_format') == 'row':
+            raise ValueError("服务模式不支持 row 行格式")
+        if method == 'import' and params.get('file') == '-':
+            raise ValueError("服务模式不支持从标准输入导入")
+        if method == 'export' and params.get('output') in (None, '-'):
+            raise ValueError("服务模式下 export 需要 output 参数（文件路径）")
+        db, lock = self._database(db_path)
+        with lock:
+            try:
+                return run_operation(db, method, params)
+            except Exception:
+                if db.conn.in_transaction:
+                    db.rollback()
+                raise
+    
+    def handle_line(self, line: bytes) -> Optional[str]:
+        """处理一行请求，返回响应行；通知请求（没有 id）返回 None"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self._response(None, error=(RPC_PARSE_ERROR, f"JSON 解析错误：{e}"))
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return self._response(None, error=(RPC_INVALID_REQUEST, "请求需要是带 method 的 JSON 对象"))
+        request_id = request.get('id')
+        params = request.get('params') or {}
+        with self._lock:
+            self._stats['requests'] += 1
+        method = request['method']
+        response, error = None, None
+        if method not in self.METHODS:
+            error = (RPC_METHOD_NOT_FOUND, f"未知的方法: {method}")
+        elif not isinstance(params, dict):
+            error = (RPC_INVALID_PARAMS, "params 需要是 JSON 对象")
         else:
-            self.cursor.execute(sql)
-        
-        self.conn.commit()
-        count = self.cursor.rowcount
-        print(f"✓ 删除成功，影响 {count} 条记录")
-        return count
+            try:
+                response = self._response(request_id, result=self.call(method, params))
+            except Exception as e:
+                # 结果无法序列化（TypeError）也作为内部错误返回
+                error = (rpc_error_code(e), str(e))
+        if error is not None:
+            response = self._response(request_id, error=error)
+            with self._lock:
+                self._stats['errors'] += 1
+        return response if 'id' in request else None
     
-    def execute_sql(self, sql: str, params: Optional[tuple] = None) -> Any:
+    @staticmethod
+    def _response(request_id: Any, result: Any = None, error: Optional[tuple] = None) -> str:
+        if error is not None:
+            return json_dumps({'jsonrpc': '2.0', 'id': request_id,
+                               'error': {'code': error[0], 'message': error[1]}})
+        return json_dumps({'jsonrpc': '2.0', 'id': request_id, 'result': result})
+    
+    def serve_forever(self):
+        """监听套接字并处理请求，直到收到 shutdown 请求或调用 shutdown()"""
+        if os.path.exists(self.socket_path):
+            # 上次异常退出留下的套接字文件；仍有服务在监听时拒绝启动
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                probe.close()
+                raise RuntimeError(f"套接字 {self.socket_path} 已有服务在监听")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+        self._server = _UnixRPCServer(self.socket_path, _RPCRequestHandler)
+        self._server.app = self
+        os.chmod(self.socket_path, 0o600)
+        self.reporter.report('serve_start', socket=self.socket_path, pid=os.getpid())
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+    
+    def shutdown(self):
+        """停止监听（从其他线程调用）"""
+        if self._server is not None:
+            self._server.shutdown()
+    
+    def close(self):
+        """关闭套接字和全部数据库连接"""
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        with self._lock:
+            databases = list(self._databases.values())
+            self._databases.clear()
+        for db, lock in databases:
+            with lock:
+                db.close()
+        self.reporter.report('serve_stop', requests=self._stats['requests'], errors=self._stats['errors'])
+
+
+class SQLiteDBClient:
+    """
+    常驻服务的客户端，保持一个套接字连接，逐个发送请求
+    
+    示例:
+        with SQLiteDBClient('/tmp/db.sock') as client:
+            users = client.call('query', db='app.db', table='users', limit=10)
+    """
+    
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._fp = None
+        self._next_id = 0
+    
+    def connect(self) -> "SQLiteDBClient":
+        """连接到服务"""
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self.timeout)
+        self._sock.connect(self.socket_path)
+        self._fp = self._sock.makefile('rwb')
+        return self
+    
+    def close(self):
+        """断开连接"""
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+    
+    def __enter__(self):
+        return self.connect()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def call(self, method: str, **params) -> Any:
         """
-        执行自定义 SQL 语句
+        发送一个请求并等待结果
         
         Args:
-            sql: SQL 语句
-            params: SQL 参数
+            method: 操作名（同命令行的 operation）或 ping、stats、shutdown
+            **params: 操作参数，键名同命令行参数，数据库用 db 指定
         
         Returns:
-            查询结果（如果是 SELECT）或受影响的行数
-        """
-        if params:
-            self.cursor.execute(sql, params)
-        else:
-            self.cursor.execute(sql)
+            操作结果
         
-        self.conn.commit()
-        
-        # 如果是 SELECT 语句，返回结果
-        if sql.strip().upper().startswith('SELECT'):
-            rows = self.cursor.fetchall()
-            results = [dict(row) for row in rows]
-            print(f"✓ SQL 执行成功，返回 {len(results)} 条记录")
-            return results
-        else:
-            count = self.cursor.rowcount
-            print(f"✓ SQL 执行成功，影响 {count} 条记录")
-            return count
+        Raises:
+            RPCError: 服务端返回错误
+        """
+        if self._fp is None:
+            self.connect()
+        self._next_id += 1
+        request = {'jsonrpc': '2.0', 'id': self._next_id, 'method': method, 'params': params}
+        self._fp.write(json_dumps(request).encode('utf-8') + b'\n')
+        self._fp.flush()
+        line = self._fp.readline()
+        if not line:
+            raise ConnectionError("服务端关闭了连接")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RPCError(response['error']['code'], response['error']['message'])
+        return response['result']
+
+
+# 客户端模式下转发给服务端的命令行参数
+RPC_OPTIONS = ('table', 'columns', 'data', 'where', 'params', 'order_by', 'limit', 'page_size',
+               'after', 'sql', 'key', 'conflict', 'update_columns', 'update_where', 'index_name',
+               'unique', 'apply', 'row_format', 'file', 'format', 'delimiter', 'types',
+               'commit_rows', 'batch_size', 'max_part_mb', 'dest', 'pages', 'analysis_limit',
+               'fts', 'tokenizer', 'no_triggers', 'mode', 'match', 'offset', 'fts_syntax',
+               'group_by', 'agg', 'having', 'top', 'view', 'watermark', 'full')
+
+
+def run_client(args: argparse.Namespace, reporter: Reporter):
+    """命令行的客户端模式：把操作发给 --connect 指定的服务执行，按同样的格式输出结果"""
+    if args.stream:
+        raise ValueError("客户端模式不支持 --stream")
+    params = {name: getattr(args, name) for name in RPC_OPTIONS
+              if getattr(args, name) not in (None, False)}
+    # 服务端的工作目录可能不同，路径一律转为绝对路径
+    params['db'] = os.path.abspath(args.db_path)
+    if args.file and args.file != '-':
+        params['file'] = os.path.abspath(args.file)
+    if args.dest:
+        params['dest'] = os.path.abspath(args.dest)
+    if args.operation == 'export':
+        if not args.output or args.output == '-':
+            raise ValueError("客户端模式下 export 需要 --output 参数")
+        params['output'] = os.path.abspath(args.output)
     
-    def get_tables(self) -> List[str]:
-        """获取数据库中所有表名"""
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in self.cursor.fetchall()]
-        return tables
+    started = time.perf_counter()
+    with SQLiteDBClient(args.connect) as client:
+        try:
+            result = client.call(args.operation, **params)
+        except RPCError as e:
+            if e.code == RPC_DATABASE_ERROR:
+                raise sqlite3.DatabaseError(str(e)) from e
+            raise
+    reporter.report('remote', operation=args.operation,
+                    ms=(time.perf_counter() - started) * 1000)
+    if args.operation != 'export':
+        print_operation_result(args, result, reporter)
+
+
+def run_server(args: argparse.Namespace, reporter: Reporter):
+    """命令行的服务模式：db_path 作为默认数据库，在 --socket 上接收请求直到收到 shutdown"""
+    if not args.socket:
+        raise ValueError("serve 需要 --socket 参数")
+    server = SQLiteDBServer(args.socket, default_db=args.db_path, reporter=reporter,
+                            profile=args.profile, instrument=args.profile_sql)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def stream_operation(db: SQLiteDB, args: argparse.Namespace, reporter: Reporter):
+    """命令行的流式查询：query 或 SELECT 类 execute，结果边读边写出"""
+    if args.operation == 'query' and not args.table:
+        raise ValueError("query 需要 --table 参数")
+    params = json.loads(args.params) if args.params else None
+    header = args.row_format == 'tuple'
+    batch_size = args.batch_size or DEFAULT_BATCH_SIZE
+    if args.operation == 'query':
+        rows = db.iter_query(args.table, args.columns or "*", args.where, params,
+                             args.order_by, args.limit, batch_size, args.row_format, header)
+    else:
+        rows = db.iter_sql(args.sql, params, batch_size, args.row_format, header)
+    stream_rows(rows, args.output, header, args.output_format or 'ndjson', reporter)
+
+
+def run_sharded(args: argparse.Namespace, reporter: Reporter):
+    """命令行的分片查询：db_path 为分片文件的 glob 模式，支持 query 和 SELECT 类 execute"""
+    if args.operation not in ('query', 'execute'):
+        print("错误：--sharded 只支持 query 和 execute 操作")
+        sys.exit(1)
+    if args.operation == 'query' and not args.table:
+        print("错误：query 需要 --table 参数")
+        sys.exit(1)
+    if args.operation == 'execute' and not args.sql:
+        print("错误：execute 需要 --sql 参数")
+        sys.exit(1)
     
-    def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
-        """获取表结构信息"""
-        self.cursor.execute(f"PRAGMA table_info({table_name})")
-        rows = self.cursor.fetchall()
-        columns = [dict(row) for row in rows]
-        return columns
+    shards = ShardedSQLiteDB(args.db_path, max_workers=args.workers,
+                             executor=args.executor, profile=args.profile or 'read-heavy',
+                             shard_column=args.shard_column, reporter=reporter)
+    params = json.loads(args.params) if args.params else None
+    if args.operation == 'query':
+        sql = build_select_sql(args.table, args.columns or "*", args.where, args.order_by, args.limit)
+    else:
+        sql = args.sql
+    
+    if args.stream:
+        header = args.row_format == 'tuple'
+        rows = shards.iter_sql(sql, params, args.order_by, args.limit,
+                               args.batch_size or DEFAULT_BATCH_SIZE,
+                               'tuple' if header else 'dict', header)
+        stream_rows(rows, args.output, header, args.output_format or 'ndjson', reporter)
+        return
+    result = shards.execute_sql(sql, params, args.row_format, args.order_by, args.limit)
+    emit_result(result, args.output, args.output_format or 'pretty', reporter)
 
 
 def main():
     """命令行入口"""
     parser = argparse.ArgumentParser(description='SQLite 数据库操作工具')
     parser.add_argument('db_path', help='数据库文件路径')
-    parser.add_argument('operation', choices=['create_table', 'insert', 'query', 'update', 'delete', 'execute', 'list_tables', 'table_info'],
-                       help='操作类型')
+    parser.add_argument('operation', choices=list(OPERATIONS) + ['serve'],
+                       help='操作类型；serve 启动常驻服务')
     parser.add_argument('--table', help='表名')
     parser.add_argument('--columns', help='列定义（JSON 格式）或查询的列名')
     parser.add_argument('--data', help='数据（JSON 格式）')
@@ -261,87 +5046,124 @@ def main():
     parser.add_argument('--params', help='SQL 参数（JSON 数组格式）')
     parser.add_argument('--order-by', help='ORDER BY 子句')
     parser.add_argument('--limit', type=int, help='限制返回的行数')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                       help=f'paginate 每页行数（默认 {DEFAULT_PAGE_SIZE}）')
+    parser.add_argument('--after', help='paginate 的分页令牌（上一页返回的 next）')
     parser.add_argument('--sql', help='自定义 SQL 语句')
-    parser.add_argument('--output', help='输出文件（JSON 格式）')
+    parser.add_argument('--key', help='update_many/delete_many 的键列（逗号分隔）')
+    parser.add_argument('--conflict', help='upsert/import 的冲突目标列（逗号分隔），需要有对应的主键或唯一约束')
+    parser.add_argument('--update-columns',
+                       help='upsert/import 冲突时更新的列，或 update_many 更新的列（逗号分隔），默认为除冲突列/键列以外的全部列；'
+                            '传空字符串表示冲突时保留原行')
+    parser.add_argument('--update-where', help='upsert 冲突时只在满足该条件时更新，可用 excluded.列名 引用新值')
+    parser.add_argument('--index-name', help='create_index 的索引名，默认为 idx_<表名>_<列名>')
+    parser.add_argument('--unique', action='store_true', help='create_index 创建唯一索引')
+    parser.add_argument('--apply', action='store_true', help='advise_indexes 直接创建建议的索引')
+    parser.add_argument('--workload-log',
+                       help='查询形态记录文件（JSON）：运行前加载、运行后保存，供 advise_indexes 分析')
+    parser.add_argument('--profile-sql', action='store_true',
+                       help='统计每条语句的耗时、行数和执行计划，结束时把汇总表打印到标准错误')
+    parser.add_argument('--stats-log', help='把每条语句的耗时、行数（和执行计划）以 JSON 行追加写入该文件')
+    parser.add_argument('--result-cache',
+                       help='query/execute 的结果缓存文件；数据库文件未变化时，相同的查询直接返回缓存结果')
+    parser.add_argument('--reporter', choices=list(REPORTERS), default='print',
+                       help='状态信息的输出方式：print 打印（默认）、silent 不输出、'
+                            'logging 以 JSON 日志写到标准错误、counter 结束时输出一条汇总')
+    parser.add_argument('--quiet', action='store_true', help='不输出状态信息，等同于 --reporter silent')
+    parser.add_argument('--sharded', action='store_true',
+                       help='把 db_path 当作分片文件的 glob 模式（如 "data/*.db"），'
+                            '在全部分片上并行执行 query 或 SELECT 类 execute 并合并结果')
+    parser.add_argument('--workers', type=int, help='分片查询的并发数，默认为分片数')
+    parser.add_argument('--executor', choices=list(ShardedSQLiteDB.EXECUTORS), default='thread',
+                       help='分片查询的执行方式：thread 线程流式合并（默认）、process 子进程')
+    parser.add_argument('--shard-column', help='分片查询时在每行附加分片名的列名')
+    parser.add_argument('--dest', help='backup/vacuum_into 的目标文件路径')
+    parser.add_argument('--pages', type=int,
+                       help=f'backup 每步复制的页数（默认 {BACKUP_PAGES_PER_STEP}），-1 表示一步完成')
+    parser.add_argument('--analysis-limit', type=int,
+                       help='analyze 时每个索引最多扫描的行数，大表上用近似统计代替全表扫描')
+    parser.add_argument('--fts', help='全文索引表名，默认为 <表名>_fts')
+    parser.add_argument('--tokenizer', help='fts_create 的 FTS5 分词器，如 unicode61、"porter unicode61"、trigram（中文）')
+    parser.add_argument('--no-triggers', action='store_true',
+                       help='fts_create 不创建同步触发器，之后用 fts_index --mode rebuild/append 更新索引')
+    parser.add_argument('--mode', choices=list(FTS_INDEX_MODES),
+                       help='fts_index 的模式：rebuild 全部重建（默认）、append 只索引新增的行、optimize 合并索引段')
+    parser.add_argument('--match', help='search 的搜索内容（默认按空白分词，全部命中才返回）')
+    parser.add_argument('--fts-syntax', action='store_true',
+                       help='把 --match 作为 FTS5 查询语法（AND/OR/NOT、"短语"、前缀*、NEAR）')
+    parser.add_argument('--offset', type=int, help='search 跳过的行数，用于翻页')
+    parser.add_argument('--group-by', help='aggregate 的分组列（逗号分隔）')
+    parser.add_argument('--agg', help='aggregate 的聚合函数（逗号分隔），如 "count,sum:amount,avg:amount,p95:latency"，'
+                                      '可加别名 "total=sum:amount"；默认 count')
+    parser.add_argument('--having', help='aggregate 聚合后的过滤条件，可引用聚合别名，如 "count > 10"')
+    parser.add_argument('--top', type=int, help='aggregate 只返回前 N 个分组（默认按第一个聚合降序）')
+    parser.add_argument('--view', help='物化视图名（create_matview/refresh/drop_matview）')
+    parser.add_argument('--watermark',
+                       help='create_matview 的水位列，新行的值比已有行都大（默认 rowid）；none 表示只能全部重算')
+    parser.add_argument('--full', action='store_true', help='refresh 时清空后全部重算')
+    parser.add_argument('--socket', help='serve 监听的 Unix 套接字路径')
+    parser.add_argument('--connect', metavar='SOCKET',
+                       help='客户端模式：把操作发给在该套接字上监听的常驻服务执行')
+    parser.add_argument('--profile', choices=list(PRAGMA_PROFILES),
+                       help='连接性能配置档（设置 WAL、synchronous、cache_size、mmap_size 等）')
+    parser.add_argument('--output', help='输出文件（JSON 格式；流式模式下默认为 NDJSON）。'
+                                         'query/execute 指定后结果只写入文件，不再打印')
+    parser.add_argument('--row-format', choices=['dict', 'tuple', 'columnar'], default='dict',
+                       help='query/execute 结果的行格式：dict 每行一个对象（默认）；'
+                            'tuple 列名加数组行；columnar 每列一个数组（不支持 --stream）')
+    parser.add_argument('--output-format', choices=list(OUTPUT_FORMATS),
+                       help='query/execute 结果的 JSON 输出格式：pretty 缩进（默认）、compact 单行、'
+                            'ndjson 每行一条记录（--stream 时默认）')
+    parser.add_argument('--stream', action='store_true',
+                       help='流式输出查询结果（NDJSON，每行一条记录），适用于 query 和 SELECT 类 execute')
+    parser.add_argument('--batch-size', type=int,
+                       help=f'流式模式下每批读取的行数（默认 {DEFAULT_BATCH_SIZE}）；'
+                            f'import/upsert 时每批写入的行数（默认 {DEFAULT_IMPORT_CHUNK_SIZE}）；'
+                            f'export 时每批导出的行数（默认 {DEFAULT_EXPORT_BATCH_SIZE}）')
+    parser.add_argument('--file', help='import/update_many/delete_many 的输入文件路径，"-" 表示标准输入')
+    parser.add_argument('--format', choices=['csv', 'tsv', 'ndjson', 'json', 'columnar'],
+                       help='import 的文件格式 (csv/tsv/ndjson/json) 或 export 的导出格式 '
+                            '(csv/tsv/ndjson/columnar)，默认按扩展名判断')
+    parser.add_argument('--max-part-mb', type=float,
+                       help='export 时单个文件的大小上限（MB），超过后切分为多个文件')
+    parser.add_argument('--types', help='import 时指定列类型（JSON 格式），覆盖自动推断')
+    parser.add_argument('--delimiter', help='import CSV 文件的分隔符')
+    parser.add_argument('--commit-rows', type=int, default=DEFAULT_IMPORT_COMMIT_ROWS,
+                       help=f'import 时每个事务提交的行数（默认 {DEFAULT_IMPORT_COMMIT_ROWS}）')
     
     args = parser.parse_args()
     
+    reporter = make_reporter('silent' if args.quiet else args.reporter)
+    if isinstance(reporter, LoggingReporter):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonLogFormatter())
+        reporter.logger.addHandler(handler)
+        reporter.logger.setLevel(logging.INFO)
+    
+    db = None
     try:
-        with SQLiteDB(args.db_path) as db:
-            result = None
-            
-            if args.operation == 'create_table':
-                if not args.table or not args.columns:
-                    print("错误：create_table 需要 --table 和 --columns 参数")
-                    sys.exit(1)
-                columns = json.loads(args.columns)
-                db.create_table(args.table, columns)
-            
-            elif args.operation == 'insert':
-                if not args.table or not args.data:
-                    print("错误：insert 需要 --table 和 --data 参数")
-                    sys.exit(1)
-                data = json.loads(args.data)
-                if isinstance(data, list):
-                    db.insert_many(args.table, data)
-                else:
-                    db.insert(args.table, data)
-            
-            elif args.operation == 'query':
-                if not args.table:
-                    print("错误：query 需要 --table 参数")
-                    sys.exit(1)
-                columns = args.columns or "*"
-                params = json.loads(args.params) if args.params else None
-                result = db.query(args.table, columns, args.where, 
-                                params, args.order_by, args.limit)
-                print(json.dumps(result, ensure_ascii=False, indent=2))
-            
-            elif args.operation == 'update':
-                if not args.table or not args.data or not args.where:
-                    print("错误：update 需要 --table、--data 和 --where 参数")
-                    sys.exit(1)
-                data = json.loads(args.data)
-                params = json.loads(args.params) if args.params else None
-                db.update(args.table, data, args.where, params)
-            
-            elif args.operation == 'delete':
-                if not args.table or not args.where:
-                    print("错误：delete 需要 --table 和 --where 参数")
-                    sys.exit(1)
-                params = json.loads(args.params) if args.params else None
-                db.delete(args.table, args.where, params)
-            
-            elif args.operation == 'execute':
-                if not args.sql:
-                    print("错误：execute 需要 --sql 参数")
-                    sys.exit(1)
-                params = json.loads(args.params) if args.params else None
-                result = db.execute_sql(args.sql, params)
-                if isinstance(result, list):
-                    print(json.dumps(result, ensure_ascii=False, indent=2))
-            
-            elif args.operation == 'list_tables':
-                tables = db.get_tables()
-                print("数据库中的表：")
-                for table in tables:
-                    print(f"  - {table}")
-                result = tables
-            
-            elif args.operation == 'table_info':
-                if not args.table:
-                    print("错误：table_info 需要 --table 参数")
-                    sys.exit(1)
-                info = db.get_table_info(args.table)
-                print(f"表 '{args.table}' 的结构：")
-                print(json.dumps(info, ensure_ascii=False, indent=2))
-                result = info
-            
-            # 如果指定了输出文件，保存结果
-            if args.output and result is not None:
-                with open(args.output, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-                print(f"✓ 结果已保存到 {args.output}")
+        if args.sharded:
+            run_sharded(args, reporter)
+            return
+        if args.operation == 'serve':
+            run_server(args, reporter)
+            return
+        if args.connect:
+            run_client(args, reporter)
+            return
+        db = SQLiteDB(args.db_path, profile=args.profile, workload_log=args.workload_log,
+                      instrument=args.profile_sql, explain_plans=args.profile_sql,
+                      stats_log=args.stats_log,
+                      result_cache=ResultCache(path=args.result_cache) if args.result_cache else None,
+                      reporter=reporter)
+        with db:
+            if args.stream and (args.operation == 'query' or (
+                    args.operation == 'execute' and args.sql
+                    and args.sql.strip().upper().startswith('SELECT'))):
+                stream_operation(db, args, reporter)
+                return
+            result = run_operation(db, args.operation, vars(args))
+            print_operation_result(args, result, reporter)
     
     except json.JSONDecodeError as e:
         print(f"JSON 解析错误：{e}")
@@ -352,6 +5174,12 @@ def main():
     except Exception as e:
         print(f"错误：{e}")
         sys.exit(1)
+    finally:
+        if args.profile_sql and db is not None:
+            print(format_stats(db.get_stats()), file=sys.stderr)
+        summary = reporter.summary()
+        if summary:
+            print(summary, file=sys.stderr)
 
 
 if __name__ == '__main__':